@@ -0,0 +1,65 @@
+"""
+Compares single inserts awaited one by one, gathered, and collected by BulkWriter
+
+Usage: python -m benchmarks.bench_bulk
+"""
+import asyncio
+import time
+
+from benchmarks.server import start_server
+from src.aiomongowire import OpMsg, MongoWireMessage, MongoWireProtocol, BulkWriter
+
+PORT = 27097
+COUNT = 100000
+
+
+def _insert(i: int) -> MongoWireMessage:
+    body = OpMsg.Insert('test', 'metrics')
+    return MongoWireMessage(operation=OpMsg(sections=[body, OpMsg.Document(0, 'documents', [{'_id': i, 'v': 1.0}])]))
+
+
+async def _sequential(protocol: MongoWireProtocol):
+    for i in range(COUNT):
+        await protocol.send_data(_insert(i))
+
+
+async def _gathered(protocol: MongoWireProtocol):
+    for start in range(0, COUNT, 1000):
+        await asyncio.gather(*(protocol.send_data(_insert(i)) for i in range(start, start + 1000)))
+
+
+async def _bulk(protocol: MongoWireProtocol):
+    writer = BulkWriter(protocol.send_data, 'test', 'metrics', max_documents=1000, max_in_flight=2)
+    for i in range(COUNT):
+        writer.add({'_id': i, 'v': 1.0})
+        if i % 1000 == 0:
+            await writer.drain()
+    await writer.close()
+
+
+async def _run(func) -> float:
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_connection(MongoWireProtocol, '127.0.0.1', PORT)
+    started = time.monotonic()
+    await func(protocol)
+    elapsed = time.monotonic() - started
+    transport.close()
+    await asyncio.sleep(0.1)
+    return COUNT / elapsed
+
+
+def main():
+    server = start_server(PORT)
+    try:
+        for name, func in (('sequential', _sequential), ('gathered', _gathered), ('bulk', _bulk)):
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            rate = loop.run_until_complete(_run(func))
+            loop.close()
+            print(f"{name:>12}: {rate:10.0f} inserts/s")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
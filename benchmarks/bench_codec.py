@@ -0,0 +1,48 @@
+"""
+Reports ns per message for decoding and encoding with the compiled codec and the pure Python one
+
+Usage: python -m benchmarks.bench_codec
+"""
+import io
+import os
+import subprocess
+import sys
+import timeit
+
+COUNT = 100000
+
+
+def _measure():
+    from src.aiomongowire import _codec, MongoWireMessage, OpMsg, OpReply
+
+    small = bytes(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'ok': 1.0})])))
+    insert = bytes(MongoWireMessage(operation=OpMsg(sections=[
+        OpMsg.Insert('test', 'coll'), OpMsg.Document(0, 'documents', [{'_id': i} for i in range(10)])])))
+    reply = bytes(MongoWireMessage(operation=OpReply(cursor_id=0, starting_from=0, number_returned=1,
+                                                     documents=[{'ok': 1.0}])))
+    message = MongoWireMessage.from_data(io.BytesIO(small))
+    cases = {
+        'walk OP_MSG sections': lambda: _codec.walk_sections(insert, 20, len(insert)),
+        'decode small OP_MSG': lambda: MongoWireMessage.from_data(io.BytesIO(small), verify_checksum=False),
+        'decode 10 docs OP_MSG': lambda: MongoWireMessage.from_data(io.BytesIO(insert), verify_checksum=False),
+        'decode OP_REPLY': lambda: MongoWireMessage.from_data(io.BytesIO(reply)),
+        'encode small OP_MSG': lambda: bytes(message),
+    }
+    name = 'compiled' if _codec._speedups is not None else 'python'
+    for case, func in cases.items():
+        elapsed = min(timeit.repeat(func, number=COUNT, repeat=3))
+        print(f"{name:>8} {case:>22}: {elapsed / COUNT * 1e9:8.0f} ns/message")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        _measure()
+        return
+    # The implementation is chosen at import, so each one is measured in its own process
+    for disabled in ('', '1'):
+        env = dict(os.environ, AIOMONGOWIRE_NO_EXTENSIONS=disabled)
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_codec', '--run'], env=env, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares columnar decoding of a cursor batch with decoding it to dicts and copying them into NumPy arrays
+
+Usage: python -m benchmarks.bench_columnar
+"""
+import datetime
+import time
+import tracemalloc
+
+import numpy
+
+from src.aiomongowire import OpMsg, MongoWireMessage, RawFrame, ColumnarBatch
+
+DOCUMENTS = 100000
+BATCH = 10000
+SCHEMA = {'price': 'double', 'quantity': 'int64', 'created': 'date', 'meta.score': 'double'}
+
+
+def _frames() -> list:
+    documents = [{'_id': i, 'name': f'item {i}', 'price': i * 0.5, 'quantity': i, 'tags': ['a', 'b', 'c'],
+                  'created': datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=i),
+                  'meta': {'score': i / 3, 'source': 'bench'}, 'description': 'x' * 100}
+                 for i in range(DOCUMENTS)]
+    frames = []
+    for start in range(0, DOCUMENTS, BATCH):
+        body = {'cursor': {'id': 0, 'ns': 'test.coll', 'firstBatch': documents[start:start + BATCH]}, 'ok': 1}
+        frames.append(RawFrame(bytes(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(body)])))))
+    return frames
+
+
+def from_dicts(frames: list) -> dict:
+    columns = {path: [] for path in SCHEMA}
+    for frame in frames:
+        for document in frame.message.operation.sections[0].data['cursor']['firstBatch']:
+            for path in SCHEMA:
+                value = document
+                for name in path.split('.'):
+                    value = value.get(name) if isinstance(value, dict) else None
+                columns[path].append(value)
+        frame._message = None
+    return {path: numpy.array(values) for path, values in columns.items()}
+
+
+def columnar(frames: list) -> dict:
+    batch = ColumnarBatch(SCHEMA)
+    for frame in frames:
+        batch.add_frame(frame)
+    return batch.columns
+
+
+def main():
+    frames = _frames()
+    for name, func in (('dicts', from_dicts), ('columnar', columnar)):
+        started = time.perf_counter()
+        func(frames)
+        elapsed = time.perf_counter() - started
+        # Tracing slows allocations down a lot, so memory is measured in a separate run
+        tracemalloc.start()
+        func(frames)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>10}: {DOCUMENTS / elapsed:10.0f} docs/s, peak memory {peak / 1e6:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
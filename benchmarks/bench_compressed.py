@@ -0,0 +1,35 @@
+"""
+Reports µs per OP_COMPRESSED reply for passing it through undecoded and for decoding the wrapped OP_MSG,
+with each available compressor
+
+Usage: python -m benchmarks.bench_compressed
+"""
+import io
+import timeit
+
+COUNT = 200
+
+
+def main():
+    from src.aiomongowire import _compressor, MongoWireMessage, OpCompressed, OpMsg
+
+    documents = [{'_id': i, 'name': f"user {i}", 'tags': ['a', 'b', 'c'], 'score': i * 0.5} for i in range(10000)]
+    operation = OpMsg(sections=[OpMsg.Body({'cursor': {'id': 0, 'ns': 'test.coll', 'firstBatch': documents},
+                                            'ok': 1.0})])
+    for name in sorted(_compressor.Compressor.compressor_names()):
+        compressor = _compressor.Compressor.by_name(name)
+        data = bytes(MongoWireMessage(operation=OpCompressed(compressor, operation)))
+
+        def pass_through():
+            return bytes(MongoWireMessage.from_data(io.BytesIO(data)))
+
+        def decode():
+            return MongoWireMessage.from_data(io.BytesIO(data)).operation.original_msg
+
+        for case, func in (('pass through', pass_through), ('decode', decode)):
+            elapsed = min(timeit.repeat(func, number=COUNT, repeat=3))
+            print(f"{name:>7} {case:>12}: {elapsed / COUNT * 1e6:10.1f} µs/reply ({len(data)} bytes compressed)")
+
+
+if __name__ == '__main__':
+    main()
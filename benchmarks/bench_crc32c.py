@@ -0,0 +1,25 @@
+"""
+Measures CRC-32C cost per MB for the available implementations
+
+Usage: python -m benchmarks.bench_crc32c
+"""
+import os
+import timeit
+
+from src.aiomongowire._crc32c import crc32c_python, crc32c_accelerated
+
+SIZE = 1024 * 1024
+
+
+def main():
+    data = memoryview(os.urandom(SIZE))
+    implementations = [('python', crc32c_python, 3)]
+    if crc32c_accelerated is not None:
+        implementations.append(('accelerated', crc32c_accelerated, 1000))
+    for name, func, number in implementations:
+        seconds = min(timeit.repeat(lambda: func(data), number=number, repeat=3)) / number
+        print(f"{name:>12}: {seconds * 1000:10.3f} ms/MB, {1 / seconds:10.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
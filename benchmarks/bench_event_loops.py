@@ -0,0 +1,66 @@
+"""
+Request throughput of MongoWireProtocol on the default asyncio loop and uvloop, for small and large requests
+
+Usage: python -m benchmarks.bench_event_loops
+"""
+import asyncio
+import time
+
+from benchmarks.server import start_server
+from src.aiomongowire import OpMsg, MongoWireMessage, MongoWireProtocol
+
+PORT = 27099
+CONCURRENCY = 100
+DURATION = 3.0
+MIXES = {
+    'small': {'ping': 1, '$db': 'admin'},
+    'large': {'insert': 'coll', 'documents': [{'x': 'x' * 1024}] * 64, '$db': 'test'},
+}
+
+
+async def _run(body: dict) -> float:
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_connection(MongoWireProtocol, '127.0.0.1', PORT)
+    count = 0
+    deadline = time.monotonic() + DURATION
+
+    async def worker():
+        nonlocal count
+        while time.monotonic() < deadline:
+            await protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(body)])))
+            count += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    elapsed = time.monotonic() - started
+    transport.close()
+    await asyncio.sleep(0.1)  # let the protocol handle the connection loss
+    return count / elapsed
+
+
+def _loop_factories() -> dict:
+    factories = {'asyncio': asyncio.new_event_loop}
+    try:
+        import uvloop
+        factories['uvloop'] = uvloop.new_event_loop
+    except ImportError:
+        pass
+    return factories
+
+
+def main():
+    server = start_server(PORT)
+    try:
+        for loop_name, factory in _loop_factories().items():
+            for mix_name, body in MIXES.items():
+                loop = factory()
+                asyncio.set_event_loop(loop)
+                rate = loop.run_until_complete(_run(body))
+                loop.close()
+                print(f"{loop_name:>8} {mix_name:>6}: {rate:10.0f} req/s")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
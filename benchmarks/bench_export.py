@@ -0,0 +1,49 @@
+"""
+Reports documents per second for dumping cursor batches to a file: decoding the reply and re-encoding
+every document, as a plain loop would, against writing the undecoded batch with BsonFileSink,
+and converting it with JsonLinesSink
+
+Usage: python -m benchmarks.bench_export
+"""
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+BATCHES = 50
+BATCH_SIZE = 2000
+
+
+async def main():
+    from src.aiomongowire import MongoWireMessage, OpMsg, RawFrame, BsonFileSink, JsonLinesSink, get_bson_parser
+
+    documents = [{'_id': i, 'name': f"user {i}", 'tags': ['a', 'b', 'c'], 'score': i * 0.5}
+                 for i in range(BATCH_SIZE)]
+    data = bytes(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(
+        {'cursor': {'id': 1, 'ns': 'test.coll', 'nextBatch': documents}, 'ok': 1.0})])))
+    parser = get_bson_parser()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dump')
+        started = time.perf_counter()
+        with open(path, 'wb') as file:
+            for _ in range(BATCHES):
+                reply = MongoWireMessage.from_data(io.BytesIO(data)).operation
+                for document in reply.sections[0].data['cursor']['nextBatch']:
+                    file.write(parser.encode_object(document))
+        results = [('decode and re-encode', time.perf_counter() - started)]
+
+        for name, sink_class in (('BsonFileSink', BsonFileSink), ('JsonLinesSink', JsonLinesSink)):
+            started = time.perf_counter()
+            async with sink_class(path) as sink:
+                for _ in range(BATCHES):
+                    await sink.write_frame(RawFrame(data))
+            results.append((name, time.perf_counter() - started))
+
+    for name, elapsed in results:
+        print(f"{name:>20}: {BATCHES * BATCH_SIZE / elapsed:12,.0f} documents/s")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
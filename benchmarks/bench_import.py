@@ -0,0 +1,47 @@
+"""
+Measures cold import time with -X importtime, for the bare package import and for a typical first use
+
+Usage: python -m benchmarks.bench_import
+"""
+import subprocess
+import sys
+
+CASES = {
+    'import': 'import src.aiomongowire',
+    'encode and decode': 'import io; from src.aiomongowire import MongoWireMessage, OpMsg; '
+                         'MongoWireMessage.from_data(io.BytesIO(bytes(MongoWireMessage('
+                         'operation=OpMsg(sections=[OpMsg.Body({"ping": 1})])))))',
+    'protocol': 'from src.aiomongowire import MongoWireProtocol',
+}
+REPEAT = 5
+TOP = 5
+
+
+def _importtime(code: str) -> dict:
+    """
+    Cumulative import time in microseconds of every module imported by the code
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name[1:]] = int(cumulative)  # nested imports keep their indent
+    return times
+
+
+def main():
+    for case, code in CASES.items():
+        runs = [_importtime(code) for _ in range(REPEAT)]
+        # Sum of the top level imports, the fastest run
+        totals = [sum(t for name, t in times.items() if not name.startswith(' ')) for times in runs]
+        best = runs[totals.index(min(totals))]
+        print(f"{case}: {min(totals) / 1000:.1f} ms")
+        for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[:TOP]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name.strip()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Point read latency on a connection shared with large inserts, with one FIFO queue and with a priority lane for
+the reads and the inserts split into smaller commands
+
+Usage: python -m benchmarks.bench_lanes
+"""
+import asyncio
+import time
+
+from benchmarks.server import start_server
+from src.aiomongowire import OpMsg, MongoWireMessage, MongoWireProtocol, Lane, ReplayStats
+
+PORT = 27098
+READS = 2000
+INSERT_DOCUMENTS = 20000
+
+
+def _insert() -> MongoWireMessage:
+    body = OpMsg.Insert('test', 'metrics')
+    body.data['ordered'] = False
+    documents = [{'_id': i, 'payload': 'x' * 200} for i in range(INSERT_DOCUMENTS)]
+    return MongoWireMessage(operation=OpMsg(sections=[body, OpMsg.Document(0, 'documents', documents)]))
+
+
+def _read() -> MongoWireMessage:
+    return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', 'filter': {'_id': 1},
+                                                                  'limit': 1, '$db': 'test'})]))
+
+
+async def _run(protocol_factory) -> ReplayStats:
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_connection(protocol_factory, '127.0.0.1', PORT)
+    stats = ReplayStats()
+    done = False
+
+    async def insert():
+        while not done:
+            await protocol.send_data(_insert(), lane='bulk')
+
+    inserting = loop.create_task(insert())
+    started = time.monotonic()
+    for _ in range(READS):
+        sent_at = time.monotonic()
+        await protocol.send_data(_read(), lane='reads')
+        stats.latencies.append(time.monotonic() - sent_at)
+        stats.sent += 1
+        await asyncio.sleep(0.001)
+    stats.elapsed = time.monotonic() - started
+    done = True
+    await inserting
+    transport.close()
+    await asyncio.sleep(0.1)
+    return stats
+
+
+def main():
+    server = start_server(PORT)
+    cases = {
+        'fifo': MongoWireProtocol,
+        'lanes': lambda: MongoWireProtocol(lanes=[Lane('reads', priority=1)], split_size=256 * 1024),
+    }
+    try:
+        for name, factory in cases.items():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            stats = loop.run_until_complete(_run(factory))
+            loop.close()
+            print(f"{name:>6}: p50: {stats.percentile(50) * 1000:8.3f} ms, p99: {stats.percentile(99) * 1000:8.3f} ms")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Request throughput and GC activity of MongoWireProtocol with and without buffer and message pools
+
+Usage: python -m benchmarks.bench_pooling
+"""
+import asyncio
+import gc
+import time
+
+from benchmarks.server import start_server
+from src.aiomongowire import OpMsg, MongoWireProtocol, BufferedMongoWireProtocol, BufferPool, MessagePool
+
+PORT = 27098
+CONCURRENCY = 100
+DURATION = 3.0
+BODY = {'ping': 1, '$db': 'admin'}
+
+
+async def _run(pooled: bool) -> tuple:
+    loop = asyncio.get_event_loop()
+    buffer_pool = BufferPool() if pooled else None
+    message_pool = MessagePool()
+    if pooled:
+        factory = lambda: BufferedMongoWireProtocol(buffer_pool=buffer_pool, message_pool=message_pool)
+    else:
+        factory = MongoWireProtocol
+    transport, protocol = await loop.create_connection(factory, '127.0.0.1', PORT)
+    count = 0
+    deadline = time.monotonic() + DURATION
+
+    async def worker():
+        nonlocal count
+        while time.monotonic() < deadline:
+            # Replies are released too, so they are reused for the next requests
+            reply = await protocol.send_data(message_pool.acquire(OpMsg(sections=[OpMsg.Body(BODY)])))
+            if pooled:
+                message_pool.release(reply)
+            count += 1
+
+    collections = sum(stat['collections'] for stat in gc.get_stats())
+    started = time.monotonic()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    elapsed = time.monotonic() - started
+    collections = sum(stat['collections'] for stat in gc.get_stats()) - collections
+    transport.close()
+    await asyncio.sleep(0.1)  # let the protocol handle the connection loss
+    if pooled:
+        print(f"  {buffer_pool}\n  {message_pool}")
+    return count / elapsed, collections
+
+
+def main():
+    server = start_server(PORT)
+    try:
+        for pooled in (False, True):
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            rate, collections = loop.run_until_complete(_run(pooled))
+            loop.close()
+            print(f"{'pooled' if pooled else 'plain':>8}: {rate:10.0f} req/s, {collections} gc collections")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
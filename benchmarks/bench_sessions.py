@@ -0,0 +1,41 @@
+"""
+Reports µs per command for adding lsid, txnNumber and $clusterTime to an insert: merging them into the command
+dict and encoding it, against splicing the pre-encoded fields into the encoded command with Session
+
+Usage: python -m benchmarks.bench_sessions
+"""
+import timeit
+
+COUNT = 5000
+
+
+def main():
+    from bson import Binary, Timestamp
+    from src.aiomongowire import MongoWireMessage, OpMsg, RawFrame, Session, SessionPool, get_bson_parser
+
+    parser = get_bson_parser()
+    session = Session(SessionPool())
+    session.observe(RawFrame(bytes(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(
+        {'ok': 1.0, '$clusterTime': {'clusterTime': Timestamp(1, 1), 'signature': {'hash': Binary(b'\x00' * 20),
+                                                                                   'keyId': 0}}})])))))
+    lsid = {'id': Binary(session.server_session.id, 4)}
+    cluster_time = parser.decode_object(session.clock.element[len(b'\x03$clusterTime\x00'):])
+
+    for documents in (1, 20, 1000):
+        command = {'insert': 'coll', 'documents': [{'_id': i, 'name': f"user {i}"} for i in range(documents)],
+                   'ordered': True, '$db': 'test'}
+        encoded = OpMsg(sections=[OpMsg.RawBody(parser.encode_object(command))])
+
+        def merge():
+            return parser.encode_object(dict(command, lsid=lsid, txnNumber=1, **{'$clusterTime': cluster_time}))
+
+        def splice():
+            return session.prepare(encoded)
+
+        for case, func in (('merge and encode', merge), ('splice', splice)):
+            elapsed = min(timeit.repeat(func, number=COUNT, repeat=3))
+            print(f"{documents:>5} documents {case:>16}: {elapsed / COUNT * 1e6:8.1f} µs/command")
+
+
+if __name__ == '__main__':
+    main()
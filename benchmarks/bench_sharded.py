@@ -0,0 +1,62 @@
+"""
+Throughput of ProcessRunner and ThreadedRunner depending on the number of workers
+
+Usage: python -m benchmarks.bench_sharded
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.server import start_server
+from src.aiomongowire import OpMsg, MongoWireMessage, ConnectionPool, ProcessRunner, ThreadedRunner
+
+PORT = 27098
+REQUESTS_PER_JOB = 2000
+CONCURRENCY = 50
+BODY = {'insert': 'coll', 'documents': [{'x': i, 'y': 'y' * 100} for i in range(20)], '$db': 'test'}
+
+
+async def job(pool: ConnectionPool, requests: int) -> int:
+    """
+    Sends requests with limited concurrency, runs inside the worker loop
+    """
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await pool.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(BODY)])))
+
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    return requests
+
+
+async def _measure(runner, workers: int) -> float:
+    # Warm up, so process start and connection time are not measured
+    await asyncio.gather(*[runner.submit(job, 1) for _ in range(workers)])
+    started = time.monotonic()
+    done = await asyncio.gather(*[runner.submit(job, REQUESTS_PER_JOB) for _ in range(workers * 2)])
+    return sum(done) / (time.monotonic() - started)
+
+
+def main():
+    server = start_server(PORT)
+    try:
+        counts = sorted({1, 2, 4, os.cpu_count()})
+        for name, runner_class in (('threads', ThreadedRunner), ('processes', ProcessRunner)):
+            for workers in counts:
+                runner = runner_class('127.0.0.1', PORT, workers=workers)
+                if isinstance(runner, ThreadedRunner):
+                    runner.start()
+                loop = asyncio.new_event_loop()
+                rate = loop.run_until_complete(_measure(runner, workers))
+                loop.close()
+                runner.close()
+                print(f"{name:>10} x{workers:<3}: {rate:10.0f} req/s")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
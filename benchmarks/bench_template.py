@@ -0,0 +1,31 @@
+"""
+Compares encoding of OP_MSG body from dict and from the pre-encoded command template
+
+Usage: python -m benchmarks.bench_template
+"""
+import timeit
+
+from src.aiomongowire import OpMsg, CommandTemplate, Placeholder
+
+NUMBER = 100000
+
+
+def main():
+    template = CommandTemplate({'find': 'collection', 'filter': {'_id': Placeholder('id')}, 'limit': 1,
+                                'singleBatch': True, 'readConcern': {'level': 'majority'}, '$db': 'test'})
+
+    def from_dict():
+        return bytes(OpMsg.Body({'find': 'collection', 'filter': {'_id': 42}, 'limit': 1, 'singleBatch': True,
+                                 'readConcern': {'level': 'majority'}, '$db': 'test'}))
+
+    def from_template():
+        return bytes(template.render(id=42))
+
+    assert from_dict() == from_template()
+    for name, func in (('dict', from_dict), ('template', from_template)):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+        print(f"{name:>10}: {seconds / NUMBER * 1e9:8.0f} ns/op")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares w:0 inserts sent through send_data with send_unacknowledged
+
+Usage: python -m benchmarks.bench_unacknowledged
+"""
+import asyncio
+import time
+
+from benchmarks.server import start_server
+from src.aiomongowire import OpMsg, MongoWireMessage, MongoWireProtocol
+
+PORT = 27096
+COUNT = 200000
+
+
+def _insert(i: int) -> MongoWireMessage:
+    body = OpMsg.Insert('test', 'metrics')
+    body.data['writeConcern'] = {'w': 0}
+    return MongoWireMessage(operation=OpMsg(sections=[body, OpMsg.Document(0, 'documents', [{'_id': i, 'v': 1.0}])],
+                                            flag_bits=OpMsg.Flags.MORE_TO_COME))
+
+
+async def _send_data(protocol: MongoWireProtocol):
+    for i in range(COUNT):
+        await protocol.send_data(_insert(i))
+        if i % 1000 == 0:
+            await asyncio.sleep(0)  # let the sending loop run
+
+
+async def _send_unacknowledged(protocol: MongoWireProtocol):
+    for i in range(COUNT):
+        protocol.send_unacknowledged(_insert(i))
+        await protocol.drain()
+
+
+async def _run(func) -> float:
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_connection(MongoWireProtocol, '127.0.0.1', PORT)
+    started = time.monotonic()
+    await func(protocol)
+    # Round trip after the writes, so all of them have been sent
+    await protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'ping': 1, '$db': 'admin'})])))
+    elapsed = time.monotonic() - started
+    transport.close()
+    await asyncio.sleep(0.1)
+    return COUNT / elapsed
+
+
+def main():
+    server = start_server(PORT)
+    try:
+        for name, func in (('send_data', _send_data), ('unacknowledged', _send_unacknowledged)):
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            rate = loop.run_until_complete(_run(func))
+            loop.close()
+            print(f"{name:>15}: {rate:10.0f} writes/s")
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Replays the captured requests against the server and prints the latency stats
+
+Usage: python -m benchmarks.replay capture.bin [--host 127.0.0.1] [--port 27017] [--speed 1.0 | --max-speed]
+"""
+import argparse
+import asyncio
+
+from src.aiomongowire import ConnectionPool, CaptureReader, Replayer
+
+
+async def _replay(args: argparse.Namespace):
+    pool = ConnectionPool(args.host, args.port, size=args.connections)
+    await pool.connect()
+    try:
+        replayer = Replayer(CaptureReader(args.capture), speed=None if args.max_speed else args.speed,
+                            max_in_flight=args.max_in_flight)
+        print(await replayer.replay(pool.send_frame))
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('capture', help="Capture file written by CaptureWriter")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=27017)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--speed', type=float, default=1.0, help="Speed factor of the captured schedule")
+    parser.add_argument('--max-speed', action='store_true', help="Ignore the schedule, send as fast as possible")
+    parser.add_argument('--max-in-flight', type=int, default=1000)
+    asyncio.get_event_loop().run_until_complete(_replay(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
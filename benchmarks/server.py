@@ -0,0 +1,55 @@
+"""
+Benchmark server answering every OP_MSG with a canned reply, without decoding the requests
+"""
+import asyncio
+import multiprocessing
+
+from src.aiomongowire import OpMsg, MongoWireMessage, FrameBuffer, RawFrame
+
+
+class _CannedReplyProtocol(asyncio.Protocol):
+    def __init__(self, replies: dict):
+        self._replies = replies
+        self._frames = FrameBuffer()
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data: bytes):
+        out = bytearray()
+        for frame in self._frames.feed(data):
+            if not frame.has_reply:
+                continue
+            # Request body size selects the reply, so clients can ask for small or large replies
+            reply = RawFrame(self._replies['large' if len(frame) > 1024 else 'small'])
+            reply.response_to = frame.request_id
+            out += reply.data
+        if out:
+            self._transport.write(out)
+
+
+def make_replies(large_size: int = 256 * 1024) -> dict:
+    small = OpMsg(sections=[OpMsg.Body({'ok': 1.0})])
+    batch = [{'x': 'x' * 1024}] * (large_size // 1024)
+    large = OpMsg(sections=[OpMsg.Body({'ok': 1.0, 'cursor': {'id': 0, 'firstBatch': batch}})])
+    return {'small': bytes(MongoWireMessage(operation=small)), 'large': bytes(MongoWireMessage(operation=large))}
+
+
+def _serve(port: int, ready):
+    loop = asyncio.new_event_loop()
+    replies = make_replies()
+    server = loop.run_until_complete(loop.create_server(lambda: _CannedReplyProtocol(replies), '127.0.0.1', port))
+    ready.set()
+    loop.run_until_complete(server.serve_forever())
+
+
+def start_server(port: int) -> multiprocessing.Process:
+    """
+    Starts the server in a separate process, so it does not compete with the client for the event loop
+    """
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=_serve, args=(port, ready), daemon=True)
+    process.start()
+    ready.wait()
+    return process
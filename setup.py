@@ -5,7 +5,7 @@ MongoDB Wire Protocol for asyncio
 import pathlib
 
 from pkg_resources import get_distribution, DistributionNotFound
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
 
 here = pathlib.Path(__file__).parent.resolve()
 long_description = (here / 'README.md').read_text(encoding='utf-8')
@@ -37,7 +37,6 @@ setup(
         'Topic :: Software Development :: Libraries',
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
@@ -46,13 +45,17 @@ setup(
     keywords='development, mongo, mongodb, asyncio',
     package_dir={'': 'src'},
     packages=find_packages(where='src', exclude=['tests']),
-    python_requires='>=3.6, <4',
+    python_requires='>=3.7, <4',
     install_requires=install_requires,
+    # Optional, the pure Python implementation is used if it can't be built
+    ext_modules=[Extension('aiomongowire._speedups', sources=['src/aiomongowire/_speedups.c'], optional=True)],
     extras_require={
         'snappy': ['python-snappy~=0.6'],
         'zstd': ['zstandard~=0.15'],
         'pymongo': ['pymongo~=3.12'],
         'bson': ['bson~=0.5'],
+        'crc32c': ['crc32c~=2.2'],
+        'numpy': ['numpy>=1.19'],
     },
     project_urls={
         'Bug Reports': 'https://github.com/upcFrost/aiomongowire/issues',
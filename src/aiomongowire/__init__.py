@@ -1,18 +1,121 @@
-from ._bson import BsonTools, set_bson_parser, get_bson_parser
-from ._compressor import Compressor
-from ._message import MongoWireMessage
-from ._message_header import MessageHeader
-from ._op_compressed import OpCompressed
-from ._op_delete import OpDelete
-from ._op_get_more import OpGetMore
-from ._op_insert import OpInsert
-from ._op_kill_cursors import OpKillCursors
-from ._op_msg import OpMsg
-from ._op_query import OpQuery
-from ._op_reply import OpReply
-from ._op_update import OpUpdate
-from ._protocol import MongoWireProtocol
+"""
+Names are imported on the first access, so importing the package does not load asyncio, compressors or
+the BSON package until they are used
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ._buffer_pool import BufferPool, MessagePool
+    from ._batch_tuner import BatchSizeTuner
+    from ._bulk import BulkWriter, BulkWriteException
+    from ._bson import BsonTools, set_bson_parser, get_bson_parser
+    from ._cache import ReplyCache
+    from ._capture import CaptureWriter, CaptureReader, CapturedFrame, Direction, Replayer, ReplayStats, \
+        InvalidCaptureException
+    from ._columnar import ColumnarBatch
+    from ._compressor import Compressor
+    from ._crc32c import InvalidChecksumException
+    from ._cursors import Cursor, CursorRegistry
+    from ._export import FileSink, BsonFileSink, JsonLinesSink, ExportException, export
+    from ._incremental import DocumentStream, IncrementalReply
+    from ._frame import RawFrame, FrameBuffer, InvalidFrameException
+    from ._handshake import ConnectionSettings, HandshakeException
+    from ._message import MongoWireMessage
+    from ._message_header import MessageHeader
+    from ._op_compressed import OpCompressed
+    from ._op_delete import OpDelete
+    from ._op_get_more import OpGetMore
+    from ._op_insert import OpInsert
+    from ._op_kill_cursors import OpKillCursors
+    from ._op_msg import OpMsg
+    from ._op_query import OpQuery
+    from ._op_reply import OpReply
+    from ._op_update import OpUpdate
+    from ._pool import ConnectionPool
+    from ._protocol import MongoWireProtocol, BufferedMongoWireProtocol
+    from ._proxy import MongoWireProxy
+    from ._scheduler import SendScheduler, Lane, LaneStats
+    from ._sharded import ThreadedRunner, ProcessRunner
+    from ._spill import SpillFile
+    from ._sessions import Session, SessionPool, ServerSession, ClusterClock, SessionException
+    from ._single_flight import SingleFlight
+    from ._template import CommandTemplate, Placeholder
+    from ._topology import Topology, ServerDescription, ServerRole, ReadPreference, ServerSelectionException
+
+# Submodule: names it provides
+_SUBMODULES = {
+    "._buffer_pool": ["BufferPool", "MessagePool"],
+    "._bulk": ["BulkWriter", "BulkWriteException"],
+    "._bson": ["BsonTools", "set_bson_parser", "get_bson_parser"],
+    "._cache": ["ReplyCache"],
+    "._capture": ["CaptureWriter", "CaptureReader", "CapturedFrame", "Direction", "Replayer", "ReplayStats",
+                  "InvalidCaptureException"],
+    "._columnar": ["ColumnarBatch"],
+    "._compressor": ["Compressor"],
+    "._crc32c": ["InvalidChecksumException"],
+    "._cursors": ["Cursor", "CursorRegistry"],
+    "._batch_tuner": ["BatchSizeTuner"],
+    "._sessions": ["Session", "SessionPool", "ServerSession", "ClusterClock", "SessionException"],
+    "._export": ["FileSink", "BsonFileSink", "JsonLinesSink", "ExportException", "export"],
+    "._incremental": ["DocumentStream", "IncrementalReply"],
+    "._frame": ["RawFrame", "FrameBuffer", "InvalidFrameException"],
+    "._handshake": ["ConnectionSettings", "HandshakeException"],
+    "._message": ["MongoWireMessage"],
+    "._message_header": ["MessageHeader"],
+    "._op_compressed": ["OpCompressed"],
+    "._op_delete": ["OpDelete"],
+    "._op_get_more": ["OpGetMore"],
+    "._op_insert": ["OpInsert"],
+    "._op_kill_cursors": ["OpKillCursors"],
+    "._op_msg": ["OpMsg"],
+    "._op_query": ["OpQuery"],
+    "._op_reply": ["OpReply"],
+    "._op_update": ["OpUpdate"],
+    "._pool": ["ConnectionPool"],
+    "._protocol": ["MongoWireProtocol", "BufferedMongoWireProtocol"],
+    "._proxy": ["MongoWireProxy"],
+    "._scheduler": ["SendScheduler", "Lane", "LaneStats"],
+    "._sharded": ["ThreadedRunner", "ProcessRunner"],
+    "._spill": ["SpillFile"],
+    "._single_flight": ["SingleFlight"],
+    "._template": ["CommandTemplate", "Placeholder"],
+    "._topology": ["Topology", "ServerDescription", "ServerRole", "ReadPreference", "ServerSelectionException"],
+}
+_MODULE_BY_NAME = {name: module for module, names in _SUBMODULES.items() for name in names}
+
+
+def __getattr__(name: str):
+    module = _MODULE_BY_NAME.get(name)
+    if module is None:
+        if name.startswith('_') and not name.startswith('__'):
+            # Private submodules are accessed as attributes, e.g. aiomongowire._compressor
+            try:
+                return importlib.import_module(f'.{name}', __name__)
+            except ModuleNotFoundError as exc:
+                if exc.name != f'{__name__}.{name}':
+                    raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = ["OpMsg", "OpUpdate", "OpReply", "OpQuery", "OpKillCursors", "OpGetMore", "OpInsert", "OpDelete",
            "OpCompressed", "MessageHeader", "Compressor", "MongoWireProtocol", "MongoWireMessage",
-           "BsonTools", "set_bson_parser", "get_bson_parser"]
+           "BsonTools", "set_bson_parser", "get_bson_parser", "RawFrame", "FrameBuffer", "InvalidFrameException",
+           "ConnectionPool", "MongoWireProxy", "ReplyCache",
+           "SingleFlight", "CommandTemplate", "Placeholder",
+           "InvalidChecksumException", "Topology", "ServerDescription", "ServerRole", "ReadPreference",
+           "ServerSelectionException", "ThreadedRunner", "ProcessRunner", "BufferPool", "MessagePool",
+           "BufferedMongoWireProtocol", "ColumnarBatch", "DocumentStream",
+           "IncrementalReply", "SpillFile", "CaptureWriter", "CaptureReader", "CapturedFrame", "Direction",
+           "Replayer", "ReplayStats", "InvalidCaptureException", "BulkWriter", "BulkWriteException",
+           "ConnectionSettings", "HandshakeException", "SendScheduler", "Lane", "LaneStats",
+           "Cursor", "CursorRegistry", "BatchSizeTuner", "FileSink", "BsonFileSink", "JsonLinesSink",
+           "ExportException", "export", "Session", "SessionPool", "ServerSession", "ClusterClock",
+           "SessionException"]
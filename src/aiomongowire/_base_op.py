@@ -1,20 +1,36 @@
 import abc
+import importlib
 import io
 from typing import Dict, Type, SupportsBytes, ClassVar
 
 from ._op_code import OpCode, UnknownOpcodeException
 
 _OP_CLASSES_BY_CODE: Dict[OpCode, Type['BaseOp']] = {}
+# Modules of the op classes, imported when the op is parsed for the first time. Classes register themselves
+_OP_MODULES: Dict[OpCode, str] = {
+    OpCode.OP_REPLY: '._op_reply',
+    OpCode.OP_UPDATE: '._op_update',
+    OpCode.OP_INSERT: '._op_insert',
+    OpCode.OP_QUERY: '._op_query',
+    OpCode.OP_GET_MORE: '._op_get_more',
+    OpCode.OP_DELETE: '._op_delete',
+    OpCode.OP_KILL_CURSORS: '._op_kill_cursors',
+    OpCode.OP_COMPRESSED: '._op_compressed',
+    OpCode.OP_MSG: '._op_msg',
+}
 
 
 def parse_op(op_code: OpCode, data: io.BytesIO) -> 'BaseOp':
     """
     Deserialize operation from bytes
     """
-    try:
-        return _OP_CLASSES_BY_CODE[op_code].from_data(data)
-    except KeyError:
-        raise UnknownOpcodeException(op_code)
+    op_class = _OP_CLASSES_BY_CODE.get(op_code)
+    if op_class is None:
+        if op_code not in _OP_MODULES:
+            raise UnknownOpcodeException(op_code)
+        importlib.import_module(_OP_MODULES[op_code], __package__)
+        op_class = _OP_CLASSES_BY_CODE[op_code]
+    return op_class.from_data(data)
 
 
 class BaseOp(SupportsBytes):
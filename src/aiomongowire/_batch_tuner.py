@@ -0,0 +1,199 @@
+import struct
+import time
+from typing import Dict, Optional, Tuple, Callable, Awaitable
+
+from . import _bson_scanner as scanner
+from ._base_op import BaseOp
+from ._frame import RawFrame, HEADER_LENGTH
+from ._message import MongoWireMessage
+from ._op_code import OpCode
+from ._op_get_more import OpGetMore
+from ._op_msg import OpMsg
+from ._op_query import OpQuery
+
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+
+
+def reply_batch(frame: RawFrame) -> Tuple[int, int]:
+    """
+    Number of the batch documents and cursor id of the undecoded OP_REPLY, or OP_MSG reply to find, aggregate
+    or getMore. Documents are counted without decoding them
+
+    :return: (number of documents, cursor id)
+    """
+    if frame.op_code == OpCode.OP_REPLY:
+        # responseFlags, cursorID, startingFrom, numberReturned
+        cursor_id, = _INT64.unpack_from(frame.data, HEADER_LENGTH + 4)
+        return _INT32.unpack_from(frame.data, HEADER_LENGTH + 16)[0], cursor_id
+    if frame.op_code != OpCode.OP_MSG or frame.data[HEADER_LENGTH + 4] != OpMsg.PayloadType.BODY:
+        return 0, 0
+    cursor = scanner.find_element(frame.data, b'cursor', HEADER_LENGTH + 5)
+    if cursor is None or cursor[0] != scanner.DOCUMENT:
+        return 0, 0
+    documents = cursor_id = 0
+    for element_type, name, value_offset, _ in scanner.iter_elements(frame.data, cursor[1]):
+        if name == b'id':
+            cursor_id = scanner.read_int(frame.data, element_type, value_offset) or 0
+        elif name in (b'firstBatch', b'nextBatch') and element_type == scanner.ARRAY:
+            documents = sum(1 for _ in scanner.iter_elements(frame.data, value_offset))
+    return documents, cursor_id
+
+
+def cursor_namespace(operation: BaseOp) -> Optional[str]:
+    """
+    "db.collection" of find, aggregate and getMore commands, OP_QUERY and OP_GET_MORE, None for the other ops.
+    OP_QUERY commands, on the db.$cmd collection, have no cursor
+    """
+    if isinstance(operation, (OpQuery, OpGetMore)):
+        if operation.full_collection_name.endswith('.$cmd'):
+            return None
+        return operation.full_collection_name
+    if isinstance(operation, OpMsg) and operation.sections:
+        body = getattr(operation.sections[0], 'data', None)
+        if body:
+            command = next(iter(body))
+            if command in ('find', 'aggregate'):
+                return f"{body.get('$db')}.{body[command]}"
+            if command == 'getMore':
+                return f"{body.get('$db')}.{body.get('collection')}"
+    return None
+
+
+class BatchEstimate:
+    """
+    Observed document size and per-document round trip time of a namespace, smoothed over the past batches
+    """
+    __slots__ = ['batch_size', 'document_size', 'document_time', 'batches']
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.document_size: Optional[float] = None  # bytes
+        self.document_time: Optional[float] = None  # seconds
+        self.batches = 0
+
+    def __str__(self):
+        return f"BatchEstimate: batch size: {self.batch_size}, document size: {self.document_size}, " \
+               f"document time: {self.document_time}, batches: {self.batches}"
+
+
+class BatchSizeTuner:
+    """
+    Picks cursor batch sizes from the observed reply sizes and round trip times
+
+    Batch size of a namespace is chosen so the reply is about target_bytes, and the round trip is within
+    target_latency if it is set. Estimates are exponentially smoothed, batch size grows by at most growth times
+    per batch, so one batch of small documents does not make the next reply huge, and shrinks right away.
+    Reply never exceeds max_bytes by the estimate, whatever the targets
+    """
+
+    def __init__(self, target_bytes: int = 1024 * 1024, target_latency: Optional[float] = None,
+                 max_bytes: int = 16 * 1024 * 1024, initial_batch: int = 101, min_batch: int = 1,
+                 max_batch: int = 100000, growth: float = 2.0, smoothing: float = 0.3):
+        """
+        :param target_bytes: Reply size to aim for
+        :param target_latency: Round trip seconds to stay within, not limited if not set
+        :param max_bytes: Hard cap of the reply size, the memory held by a batch
+        :param initial_batch: Batch size before anything is observed, server default is 101
+        :param min_batch: Smallest batch size
+        :param max_batch: Largest batch size
+        :param growth: Max factor the batch size grows by per batch
+        :param smoothing: Weight of the latest batch in the estimates
+        """
+        self.target_bytes = target_bytes
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.initial_batch = initial_batch
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.growth = growth
+        self.smoothing = smoothing
+        self._estimates: Dict[str, BatchEstimate] = {}
+
+    def estimate(self, namespace: str) -> BatchEstimate:
+        estimate = self._estimates.get(namespace)
+        if estimate is None:
+            estimate = self._estimates[namespace] = BatchEstimate(self.initial_batch)
+        return estimate
+
+    def batch_size(self, namespace: str) -> int:
+        return self.estimate(namespace).batch_size
+
+    def observe(self, namespace: str, documents: int, size: int, round_trip: float) -> int:
+        """
+        Updates the estimates by the received batch
+
+        :param namespace: Namespace of the cursor
+        :param documents: Number of documents in the batch
+        :param size: Reply size in bytes
+        :param round_trip: Seconds from sending the request to receiving the reply
+        :return: Next batch size
+        """
+        estimate = self.estimate(namespace)
+        if documents <= 0:
+            return estimate.batch_size
+        document_size = size / documents
+        document_time = round_trip / documents
+        if estimate.document_size is None:
+            estimate.document_size, estimate.document_time = document_size, document_time
+        else:
+            alpha = self.smoothing
+            estimate.document_size += alpha * (document_size - estimate.document_size)
+            estimate.document_time += alpha * (document_time - estimate.document_time)
+        estimate.batches += 1
+
+        # Smallest of the limits, the hard memory cap included
+        limit = min(self.target_bytes, self.max_bytes) / estimate.document_size
+        if self.target_latency is not None and estimate.document_time > 0:
+            limit = min(limit, self.target_latency / estimate.document_time)
+        limit = min(limit, self.max_bytes / estimate.document_size, estimate.batch_size * self.growth)
+        estimate.batch_size = max(self.min_batch, min(self.max_batch, int(limit)))
+        return estimate.batch_size
+
+    def apply(self, operation: BaseOp, namespace: Optional[str] = None) -> BaseOp:
+        """
+        Sets the batch size of find, aggregate or getMore command, OP_QUERY or OP_GET_MORE in place.
+        OP_QUERY for a single document or a single batch, with number to return 1 or negative, is left as is.
+        Tuned OP_QUERY batch is at least 2, as the server closes the cursor of the query returning 1 document
+        """
+        namespace = namespace or cursor_namespace(operation)
+        if namespace is None:
+            return operation
+        batch_size = self.batch_size(namespace)
+        if isinstance(operation, OpQuery):
+            # 0 is the server default batch size
+            if operation.number_to_return == 0 or operation.number_to_return > 1:
+                operation.number_to_return = max(batch_size, 2)
+        elif isinstance(operation, OpGetMore):
+            if operation.number_to_return >= 0:
+                operation.number_to_return = batch_size
+        elif isinstance(operation, OpMsg):
+            body = operation.sections[0]
+            data = body.data
+            if 'aggregate' in data:
+                data['cursor'] = dict(data.get('cursor') or {}, batchSize=batch_size)
+            else:
+                data['batchSize'] = batch_size
+            if type(body) is OpMsg.RawBody:
+                body.data = data  # re-encoded by the setter
+        return operation
+
+    async def send(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]], message: MongoWireMessage,
+                   namespace: Optional[str] = None) -> RawFrame:
+        """
+        Sends the cursor request with the tuned batch size and observes the undecoded reply
+
+        :param send_frame: Sends undecoded frame, e.g. send_frame of MongoWireProtocol or ConnectionPool
+        :param message: find, aggregate or getMore request
+        :param namespace: Namespace of the cursor, taken from the request if not given
+        :return: Undecoded reply
+        """
+        namespace = namespace or cursor_namespace(message.operation)
+        self.apply(message.operation, namespace)
+        started = time.monotonic()
+        reply = await send_frame(RawFrame(bytes(message)))
+        round_trip = time.monotonic() - started
+        if namespace is not None:
+            documents, _ = reply_batch(reply)
+            self.observe(namespace, documents, len(reply), round_trip)
+        return reply
@@ -1,5 +1,43 @@
 import io
-from typing import Union
+from typing import Union, Optional
+
+from ._lazy import is_installed
+
+_BYTES_LIKE = (bytes, bytearray, memoryview)
+
+
+def read_cstring(data: io.BytesIO) -> str:
+    """
+    Reads null-terminated string from BytesIO or BufferReader, leaving it right after the terminator
+    """
+    start = data.tell()
+    chunks = []
+    while True:
+        chunk = data.read(64)
+        if not chunk:
+            raise ValueError(f"String at offset {start} is not terminated")
+        end = chunk.find(0)
+        if end >= 0:
+            chunks.append(chunk[:end])
+            break
+        chunks.append(chunk)
+    value = b''.join(chunks)
+    data.seek(start + len(value) + 1)
+    return value.decode()
+
+
+def read_document(data: io.BytesIO) -> bytes:
+    """
+    Reads encoded BSON document from BytesIO or BufferReader
+    """
+    length_bytes = data.read(4)
+    length = int.from_bytes(length_bytes, byteorder='little', signed=True)
+    if len(length_bytes) < 4 or length < 5:
+        raise ValueError(f"Invalid document length {length}")
+    document = length_bytes + data.read(length - 4)
+    if len(document) < length:
+        raise ValueError(f"Document of {length} bytes is cut at {len(document)}")
+    return document
 
 
 class BsonTools:
@@ -20,90 +58,89 @@ class BsonTools:
         raise NotImplementedError("Bson parser not installed/configured")
 
 
-_BSON_PARSER = BsonTools()
-
-
-def set_bson_parser(parser: BsonTools):
-    """
-    Set bson parser to a custom one
-    """
-    global _BSON_PARSER
-    _BSON_PARSER = parser
-
-
-def get_bson_parser() -> BsonTools:
+class PymongoBson(BsonTools):
     """
-    Set bson parser to a custom one
+    BsonTool implementation for pymongo package
     """
-    return _BSON_PARSER
 
+    def __init__(self):
+        import bson
+        self._bson = bson
 
-try:
-    # Pymongo and bson have name conflict, trying to check which one is installed
-    import pymongo
-    import bson
+    def encode_cstring(self, s: str) -> bytes:
+        return self._bson._make_c_string(s)
 
+    def decode_cstring(self, b: Union[io.BytesIO, bytes]) -> str:
+        if isinstance(b, _BYTES_LIKE):
+            return bytes(b).rstrip(b'\x00').decode()
+        return read_cstring(b)
 
-    class PymongoBson(BsonTools):
-        """
-        BsonTool implementation for pymongo package
-        """
+    def encode_object(self, d: Union[list, dict]) -> bytes:
+        return self._bson.encode(d)
 
-        def encode_cstring(self, s: str) -> bytes:
-            return bson._make_c_string(s)
+    def decode_object(self, b: Union[io.BytesIO, bytes]) -> Union[list, dict]:
+        if not isinstance(b, _BYTES_LIKE):
+            b = read_document(b)
+        return self._bson.decode(b)
 
-        def decode_cstring(self, b: Union[io.BytesIO, bytes]) -> str:
-            if isinstance(b, io.BytesIO):
-                length = int.from_bytes(b.read(4), byteorder='little', signed=False)
-                return b.read(length).decode()
-            else:
-                return b.decode()
 
-        def encode_object(self, d: Union[list, dict]) -> bytes:
-            return bson.encode(d)
+class PyBson(BsonTools):
+    """
+    BsonTool implementation for bson package
+    """
 
-        def decode_object(self, b: Union[io.BytesIO, bytes]) -> Union[list, dict]:
-            return bson.decode(b)
+    def __init__(self):
+        import bson
+        self._bson = bson
 
+    def encode_cstring(self, s: str) -> bytes:
+        return self._bson.encode_cstring(s)
 
-    _BSON_PARSER = PymongoBson()
-except ImportError:
-    pass
+    def decode_cstring(self, b: Union[io.BytesIO, bytes]) -> str:
+        if isinstance(b, _BYTES_LIKE):
+            return bytes(b).rstrip(b'\x00').decode()
+        return read_cstring(b)
 
-try:
-    try:
-        import pymongo
+    def encode_object(self, d: Union[list, dict]) -> bytes:
+        return self._bson.dumps(d)
 
-        raise FileExistsError
-    except ImportError:
-        pass
-    import bson
+    def decode_object(self, b: Union[io.BytesIO, bytes]) -> Union[list, dict]:
+        if not isinstance(b, _BYTES_LIKE):
+            b = read_document(b)
+        elif not isinstance(b, bytes):
+            # loads searches the data with bytes methods, memoryview, e.g. of a spilled document, has none
+            b = bytes(b)
+        return self._bson.loads(b)
 
 
-    class PyBson(BsonTools):
-        """
-        BsonTool implementation for bson package
-        """
+def _default_parser() -> BsonTools:
+    """
+    Picks the parser by the installed package, without importing it.
+    Pymongo and bson have name conflict, both install the bson module
+    """
+    if is_installed('pymongo'):
+        return PymongoBson()
+    if is_installed('bson'):
+        return PyBson()
+    return BsonTools()
 
-        def encode_cstring(self, s: str) -> bytes:
-            return bson.encode_cstring(s)
 
-        def decode_cstring(self, b: Union[io.BytesIO, bytes]) -> str:
-            if isinstance(b, io.BytesIO):
-                length = int.from_bytes(b.read(4), byteorder='little', signed=False)
-                return b.read(length).decode()
-            else:
-                return b.decode()
+_BSON_PARSER: Optional[BsonTools] = None  # default one is created on the first use
 
-        def encode_object(self, d: Union[list, dict]) -> bytes:
-            return bson.dumps(d)
 
-        def decode_object(self, b: Union[io.BytesIO, bytes]) -> Union[list, dict]:
-            return bson.loads(b)
+def set_bson_parser(parser: BsonTools):
+    """
+    Set bson parser to a custom one
+    """
+    global _BSON_PARSER
+    _BSON_PARSER = parser
 
 
-    _BSON_PARSER = PyBson()
-except ImportError:
-    pass
-except FileExistsError:
-    pass
+def get_bson_parser() -> BsonTools:
+    """
+    Get the configured bson parser, the installed package is imported on the first call
+    """
+    global _BSON_PARSER
+    if _BSON_PARSER is None:
+        _BSON_PARSER = _default_parser()
+    return _BSON_PARSER
@@ -0,0 +1,106 @@
+import struct
+from typing import Iterator, Tuple, Optional, Union
+
+Buffer = Union[bytes, bytearray]
+
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+
+# BSON element types
+DOUBLE = 0x01
+STRING = 0x02
+DOCUMENT = 0x03
+ARRAY = 0x04
+BINARY = 0x05
+UNDEFINED = 0x06
+OBJECT_ID = 0x07
+BOOLEAN = 0x08
+DATETIME = 0x09
+NULL = 0x0A
+REGEX = 0x0B
+DB_POINTER = 0x0C
+CODE = 0x0D
+SYMBOL = 0x0E
+CODE_WITH_SCOPE = 0x0F
+INT32 = 0x10
+TIMESTAMP = 0x11
+INT64 = 0x12
+DECIMAL128 = 0x13
+MIN_KEY = 0xFF
+MAX_KEY = 0x7F
+
+FIXED_SIZES = {
+    DOUBLE: 8, UNDEFINED: 0, OBJECT_ID: 12, BOOLEAN: 1, DATETIME: 8, NULL: 0, INT32: 4, TIMESTAMP: 8, INT64: 8,
+    DECIMAL128: 16, MIN_KEY: 0, MAX_KEY: 0,
+}
+
+
+class InvalidBsonException(Exception):
+    def __init__(self, element_type: int, offset: int) -> None:
+        super().__init__(f"Invalid BSON element type {element_type:#04x} at offset {offset}")
+
+
+def value_size(data: Buffer, element_type: int, offset: int) -> int:
+    """
+    Size of the element value starting at the offset
+
+    :raises InvalidBsonException: If element type is unknown
+    """
+    size = FIXED_SIZES.get(element_type)
+    if size is not None:
+        return size
+    if element_type in (STRING, CODE, SYMBOL):
+        return 4 + _INT32.unpack_from(data, offset)[0]
+    if element_type in (DOCUMENT, ARRAY, CODE_WITH_SCOPE):
+        return _INT32.unpack_from(data, offset)[0]
+    if element_type == BINARY:
+        return 5 + _INT32.unpack_from(data, offset)[0]
+    if element_type == REGEX:
+        pattern_end = data.index(b'\x00', offset)
+        return data.index(b'\x00', pattern_end + 1) + 1 - offset
+    if element_type == DB_POINTER:
+        return 4 + _INT32.unpack_from(data, offset)[0] + 12
+    raise InvalidBsonException(element_type, offset)
+
+
+def iter_elements(data: Buffer, offset: int = 0) -> Iterator[Tuple[int, bytes, int, int]]:
+    """
+    Walks the top level elements of the document without decoding them
+
+    :param data: Buffer holding the document
+    :param offset: Offset of the document in the buffer
+    :return: Iterator of (element type, name, value offset, value size)
+    """
+    end = offset + _INT32.unpack_from(data, offset)[0] - 1  # trailing zero
+    position = offset + 4
+    while position < end:
+        element_type = data[position]
+        name_end = data.index(b'\x00', position + 1)
+        name = bytes(data[position + 1:name_end])
+        position = name_end + 1
+        size = value_size(data, element_type, position)
+        yield element_type, name, position, size
+        position += size
+
+
+def find_element(data: Buffer, name: bytes, offset: int = 0) -> Optional[Tuple[int, int, int]]:
+    """
+    Finds top level element of the document by name
+
+    :return: (element type, value offset, value size), or None if there is no such element
+    """
+    for element_type, element_name, value_offset, size in iter_elements(data, offset):
+        if element_name == name:
+            return element_type, value_offset, size
+    return None
+
+
+def read_int(data: Buffer, element_type: int, offset: int) -> Optional[int]:
+    """
+    Reads int32 or int64 value, None for the other types
+    """
+    if element_type == INT64:
+        return _INT64.unpack_from(data, offset)[0]
+    if element_type == INT32:
+        return _INT32.unpack_from(data, offset)[0]
+    return None
@@ -0,0 +1,172 @@
+import random
+import time
+from typing import Dict, List, Optional
+
+from ._base_op import BaseOp
+from ._message import MongoWireMessage
+from ._message_header import MessageHeader
+
+
+class BufferPool:
+    """
+    Pool of reusable bytearrays grouped by power of two size classes
+
+    Buffers are handed out at their full class size, callers track the used length themselves.
+    Buffers kept above max_bytes are dropped. Free buffers not needed during idle_time are dropped as well,
+    so the pool shrinks back after a burst.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, min_size: int = 1024, max_size: int = 1024 * 1024,
+                 idle_time: float = 10.0):
+        """
+        :param max_bytes: Max total size of the free buffers kept in the pool
+        :param min_size: Smallest size class
+        :param max_size: Largest size class, bigger buffers are never pooled
+        :param idle_time: Seconds after which free buffers unused since the last check are dropped
+        """
+        self.max_bytes = max_bytes
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_time = idle_time
+
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+        self._free: Dict[int, List[bytearray]] = {}
+        self._low_water: Dict[int, int] = {}  # least number of free buffers in the class since the last check
+        self._retained = 0
+        self._last_shrink = time.monotonic()
+
+    @property
+    def retained_bytes(self) -> int:
+        """
+        Total size of the free buffers kept in the pool
+        """
+        return self._retained
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def size_class(self, size: int) -> int:
+        """
+        Size of the buffer handed out for the requested size
+        """
+        return max(self.min_size, 1 << (size - 1).bit_length())
+
+    def acquire(self, size: int) -> bytearray:
+        """
+        Returns buffer of at least the requested size. Contents are left from the previous user
+        """
+        size_class = self.size_class(size)
+        free = self._free.get(size_class)
+        if not free:
+            self.misses += 1
+            return bytearray(size_class if size_class <= self.max_size else size)
+        self.hits += 1
+        buffer = free.pop()
+        self._retained -= size_class
+        if len(free) < self._low_water[size_class]:
+            self._low_water[size_class] = len(free)
+        return buffer
+
+    def release(self, buffer: bytearray):
+        """
+        Returns buffer to the pool. Buffer must not be used by the caller afterwards
+        """
+        size_class = len(buffer)
+        if size_class > self.max_size or size_class != self.size_class(size_class) or \
+                self._retained + size_class > self.max_bytes:
+            self.dropped += 1
+        else:
+            free = self._free.setdefault(size_class, [])
+            self._low_water.setdefault(size_class, len(free))
+            free.append(buffer)
+            self._retained += size_class
+        if time.monotonic() - self._last_shrink >= self.idle_time:
+            self.shrink()
+
+    def shrink(self):
+        """
+        Drops free buffers which were not needed since the previous call
+        """
+        for size_class, free in self._free.items():
+            unused = self._low_water[size_class]
+            if unused:
+                del free[:unused]
+                self._retained -= unused * size_class
+                self.dropped += unused
+            self._low_water[size_class] = len(free)
+        self._last_shrink = time.monotonic()
+
+    def clear(self):
+        self._free.clear()
+        self._low_water.clear()
+        self._retained = 0
+
+    def __str__(self):
+        return f"BufferPool: hits: {self.hits}, misses: {self.misses}, dropped: {self.dropped}, " \
+               f"retained: {self._retained} bytes"
+
+
+class MessagePool:
+    """
+    Pool of reusable MongoWireMessage objects along with their headers
+
+    Messages from the pool get a new random request id. Released messages lose their operation,
+    so they must not be used by the caller afterwards.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        :param max_size: Max number of free messages kept in the pool
+        """
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+        self._free: List[MongoWireMessage] = []
+
+    def __len__(self):
+        return len(self._free)
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def acquire(self, operation: BaseOp, request_id: Optional[int] = None, response_to: int = 0) -> MongoWireMessage:
+        """
+        Returns message with the operation, reusing a released one if there is any
+        """
+        if not self._free:
+            self.misses += 1
+            return MongoWireMessage(operation=operation, header=MessageHeader(request_id, response_to))
+        self.hits += 1
+        message = self._free.pop()
+        header = message.header
+        header.request_id = random.randint(0, 1 << 31) if request_id is None else request_id
+        header.response_to = response_to
+        message.operation = operation
+        return message
+
+    def release(self, message: MongoWireMessage):
+        """
+        Returns message to the pool
+        """
+        if len(self._free) >= self.max_size:
+            self.dropped += 1
+            return
+        message.operation = None
+        self._free.append(message)
+
+    def clear(self):
+        self._free.clear()
+
+    def __str__(self):
+        return f"MessagePool: hits: {self.hits}, misses: {self.misses}, dropped: {self.dropped}, " \
+               f"retained: {len(self._free)}"
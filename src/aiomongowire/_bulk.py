@@ -0,0 +1,210 @@
+import asyncio
+from collections import deque
+from typing import Callable, Awaitable, Optional, List, Union, Deque, Set
+
+from ._bson import get_bson_parser
+from ._loop import bind_loop
+from ._message import MongoWireMessage
+from ._op_msg import OpMsg
+
+
+class BulkWriteException(Exception):
+    def __init__(self, error: dict) -> None:
+        self.error = error
+        super().__init__(f"Write failed with code {error.get('code')}: {error.get('errmsg')}")
+
+
+class _Batch:
+    __slots__ = ['documents', 'futures', 'size']
+
+    def __init__(self):
+        self.documents: List[bytes] = []
+        self.futures: List[asyncio.Future] = []
+        self.size = 0
+
+
+class BulkWriter:
+    """
+    Collects single inserts into insert commands with a document sequence of up to max_documents documents
+
+    Batch is sent once it is full by the number of documents or bytes, or linger seconds after its first document.
+    Up to max_in_flight batches wait for the reply at once, the following ones are queued.
+    Every added document gets its own future, failed with BulkWriteException by its writeErrors entry,
+    or by the writeConcernError or command error of the whole batch.
+    With ordered inserts the documents after the first failed one are not inserted and fail too.
+    """
+
+    def __init__(self, send: Callable[[MongoWireMessage], Awaitable[MongoWireMessage]], db: str, collection: str,
+                 max_documents: int = 1000, max_bytes: int = 8 * 1024 * 1024, linger: float = 0.005,
+                 max_in_flight: int = 2, ordered: bool = False, write_concern: Optional[dict] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        :param send: Sends the message and returns the reply, e.g. send_data of MongoWireProtocol or ConnectionPool
+        :param db: Database name
+        :param collection: Collection name
+        :param max_documents: Max number of documents in a batch, server limit is maxWriteBatchSize
+        :param max_bytes: Max size of the encoded documents of a batch, server limit is maxMessageSizeBytes
+        :param linger: Seconds the batch waits for more documents after the first one
+        :param max_in_flight: Max number of batches waiting for the reply
+        :param ordered: Stop inserting the batch at the first failed document
+        :param write_concern: Write concern of the inserts, server default if not set
+        :param loop: Event loop to bind to, the running one by default, required outside a running loop
+        """
+        self.send = send
+        self.db = db
+        self.collection = collection
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.max_in_flight = max_in_flight
+        self.ordered = ordered
+        self.write_concern = write_concern
+
+        self.batches = 0
+        self.documents = 0
+
+        self._loop = bind_loop(loop)
+        self._batch = _Batch()
+        self._ready: Deque[_Batch] = deque()
+        self._in_flight: Set[asyncio.Task] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._drain_waiter: Optional[asyncio.Future] = None
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of added documents not sent yet
+        """
+        return len(self._batch.documents) + sum(len(batch.documents) for batch in self._ready)
+
+    def add(self, document: Union[dict, bytes]) -> asyncio.Future:
+        """
+        Adds document to the current batch
+
+        :param document: Document, or already encoded BSON document
+        :return: Future completed with None once the document is inserted
+        :raises RuntimeError: If the writer is closed
+        """
+        if self._closed:
+            raise RuntimeError("BulkWriter is closed")
+        if not isinstance(document, (bytes, bytearray)):
+            document = get_bson_parser().encode_object(document)
+        batch = self._batch
+        if batch.documents and batch.size + len(document) > self.max_bytes:
+            self._seal()
+            batch = self._batch
+        future = self._loop.create_future()
+        batch.documents.append(document)
+        batch.futures.append(future)
+        batch.size += len(document)
+        if len(batch.documents) >= self.max_documents or batch.size >= self.max_bytes:
+            self._seal()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.linger, self._seal)
+        return future
+
+    async def drain(self):
+        """
+        Waits until there are no batches queued behind the ones in flight, to follow the server pace
+        """
+        if not self._ready:
+            return
+        if self._drain_waiter is None:
+            self._drain_waiter = self._loop.create_future()
+        await asyncio.shield(self._drain_waiter)
+
+    async def flush(self):
+        """
+        Sends the current batch right away and waits until all the batches are replied
+        """
+        self._seal()
+        while self._in_flight:
+            await asyncio.wait(list(self._in_flight))
+
+    async def close(self):
+        """
+        Flushes the added documents, no more can be added after that
+        """
+        self._closed = True
+        await self.flush()
+
+    def _seal(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._batch.documents:
+            return
+        self._ready.append(self._batch)
+        self._batch = _Batch()
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._ready and len(self._in_flight) < self.max_in_flight:
+            task = self._loop.create_task(self._write(self._ready.popleft()))
+            self._in_flight.add(task)
+            task.add_done_callback(self._written)
+        if not self._ready and self._drain_waiter is not None:
+            self._drain_waiter.set_result(None)
+            self._drain_waiter = None
+
+    def _written(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._dispatch()
+
+    def _message(self, batch: _Batch) -> MongoWireMessage:
+        body = OpMsg.Insert(self.db, self.collection)
+        body.data['ordered'] = self.ordered
+        if self.write_concern is not None:
+            body.data['writeConcern'] = self.write_concern
+        return MongoWireMessage(operation=OpMsg(sections=[body, OpMsg.RawDocument(body.identifier(),
+                                                                                  batch.documents)]))
+
+    async def _write(self, batch: _Batch):
+        self.batches += 1
+        self.documents += len(batch.documents)
+        try:
+            reply = await self.send(self._message(batch))
+        except asyncio.CancelledError:
+            # Documents are cancelled with the batch, so their awaiters do not wait forever
+            for future in batch.futures:
+                future.cancel()
+            raise
+        except Exception as exc:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        _complete(batch.futures, reply.operation.sections[0].data, self.ordered)
+
+
+def _complete(futures: List[asyncio.Future], reply: dict, ordered: bool):
+    """
+    Resolves futures of the batch documents by the insert reply
+    """
+    if reply.get('ok') != 1:
+        errors: List[Optional[dict]] = [reply] * len(futures)
+    else:
+        errors = [None] * len(futures)
+        write_errors = reply.get('writeErrors') or []
+        for error in write_errors:
+            index = error.get('index', -1)
+            if 0 <= index < len(futures):
+                errors[index] = error
+        if ordered and write_errors:
+            first = min(error.get('index', 0) for error in write_errors)
+            skipped = {'code': write_errors[0].get('code'),
+                       'errmsg': f"Not inserted after the failed document {first}"}
+            for index in range(first + 1, len(futures)):
+                if errors[index] is None:
+                    errors[index] = skipped
+        write_concern_error = reply.get('writeConcernError')
+        if write_concern_error is not None:
+            errors = [error or write_concern_error for error in errors]
+    for future, error in zip(futures, errors):
+        if future.done():
+            continue
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(BulkWriteException(error))
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Collection, Callable, Awaitable
+
+from ._base_op import BaseOp
+from ._frame import RawFrame
+from ._message import MongoWireMessage
+from ._op_msg import OpMsg
+from ._op_query import OpQuery
+from ._op_reply import OpReply
+from ._single_flight import has_open_cursor
+
+DEFAULT_CACHED_COMMANDS = frozenset({'find', 'count', 'distinct', 'hello', 'isMaster', 'ismaster'})
+
+# Query flags which make the reply depend on more than the query itself
+_UNCACHEABLE_QUERY_FLAGS = OpQuery.Flags.TAILABLE_CURSOR | OpQuery.Flags.AWAIT_DATA | OpQuery.Flags.EXHAUST
+
+
+class ReplyCache:
+    """
+    Read-through cache of the replies to idempotent commands
+
+    Cache key is the encoded operation, so only byte-identical requests share the entry.
+    Entries are kept as raw reply frames and decoded on every hit, callers never share the decoded objects.
+    Concurrent identical requests are sent to the server once, the rest wait for the first one.
+    Replies with an open cursor or an error are not cached.
+    """
+
+    def __init__(self, ttl: float = 1.0, max_bytes: int = 16 * 1024 * 1024, max_entries: int = 10000,
+                 commands: Collection[str] = DEFAULT_CACHED_COMMANDS):
+        """
+        :param ttl: Seconds to keep the entry
+        :param max_bytes: Total size of the cached replies, least recently used entries are evicted above it
+        :param max_entries: Max number of cached replies
+        :param commands: Names of the commands allowed to be cached. Legacy OP_QUERY on a collection is 'find'
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.commands = frozenset(commands)
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._entries: 'OrderedDict[bytes, Tuple[float, RawFrame]]' = OrderedDict()
+        self._size = 0
+        self._in_flight: Dict[bytes, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """
+        Total size of the cached replies in bytes
+        """
+        return self._size
+
+    def is_cacheable(self, operation: BaseOp) -> bool:
+        """
+        True if the reply to the operation can be cached
+        """
+        if isinstance(operation, OpMsg):
+            if operation.flag_bits or len(operation.sections) != 1:
+                return False
+            body = operation.sections[0]
+            return isinstance(body, OpMsg.Body) and next(iter(body.data), None) in self.commands
+        if isinstance(operation, OpQuery):
+            if operation.flags & _UNCACHEABLE_QUERY_FLAGS:
+                return False
+            if operation.full_collection_name.endswith('.$cmd'):
+                return next(iter(operation.query), None) in self.commands
+            return 'find' in self.commands
+        return False
+
+    def get(self, key: bytes) -> Optional[RawFrame]:
+        """
+        Returns cached reply frame, or None if it is missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, frame = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return frame
+
+    def put(self, key: bytes, frame: RawFrame):
+        """
+        Caches reply frame, evicting least recently used entries if the limits are exceeded
+        """
+        if len(frame) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, frame)
+        self._size += len(frame)
+        while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def _remove(self, key: bytes):
+        _, frame = self._entries.pop(key)
+        self._size -= len(frame)
+
+    async def send(self, data: MongoWireMessage,
+                   send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]]) -> MongoWireMessage:
+        """
+        Returns reply from the cache, or sends the message using send_frame callable and caches the reply
+        """
+        message_bytes = bytes(data)
+        key = message_bytes[12:]  # opcode and operation, request and response ids are excluded
+
+        frame = self.get(key)
+        if frame is not None:
+            self.hits += 1
+            return self._decode(frame, data)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            frame = await asyncio.shield(in_flight)
+            if frame is not None:
+                self.coalesced += 1
+                return self._decode(frame, data)
+            # Reply holds an open cursor, which cannot be shared, or the first caller was cancelled
+            self.misses += 1
+            return self._decode(await send_frame(RawFrame(message_bytes)), data)
+
+        self.misses += 1
+        in_flight = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = in_flight
+        try:
+            frame = await send_frame(RawFrame(message_bytes))
+            reply = self._decode(frame, data)
+        except asyncio.CancelledError:
+            # Waiters are not cancelled with the first caller, they send the message themselves
+            in_flight.set_result(None)
+            raise
+        except Exception as exc:
+            in_flight.set_exception(exc)
+            # Exception is delivered to this caller directly, waiters get it through the future
+            in_flight.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+        if self._is_reply_cacheable(reply.operation, data.operation):
+            self.put(key, frame)
+        in_flight.set_result(None if has_open_cursor(reply.operation) else frame)
+        return reply
+
+    @staticmethod
+    def _decode(frame: RawFrame, data: MongoWireMessage) -> MongoWireMessage:
+        reply = RawFrame(frame.data).message
+        reply.header.response_to = data.header.request_id
+        return reply
+
+    @staticmethod
+    def _is_reply_cacheable(operation: BaseOp, request: BaseOp) -> bool:
+        if isinstance(operation, OpReply):
+            if has_open_cursor(operation) or operation.response_flags & OpReply.Flags.QUERY_FAILURE:
+                return False
+            if isinstance(request, OpQuery) and request.full_collection_name.endswith('.$cmd'):
+                # Failed command replies with ok: 0, without the query failure flag
+                return bool(operation.documents) and operation.documents[0].get('ok') == 1
+            return True
+        if isinstance(operation, OpMsg):
+            body = operation.sections[0].data if operation.sections else {}
+            return body.get('ok') == 1 and not has_open_cursor(operation)
+        return False
@@ -0,0 +1,215 @@
+import asyncio
+import struct
+import time
+from enum import IntEnum
+from typing import Iterator, Optional, Union, List, Iterable, Awaitable, Callable
+
+from ._frame import RawFrame, HEADER_LENGTH
+
+_MAGIC = b'AMWCAP1\x00'
+# Record header: unix time and direction, followed by the frame itself
+_RECORD = struct.Struct('<dB')
+_INT32 = struct.Struct('<i')
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class InvalidCaptureException(Exception):
+    def __init__(self, path: str) -> None:
+        super().__init__(f"{path} is not a wire capture file")
+
+
+class Direction(IntEnum):
+    SENT = 0
+    RECEIVED = 1
+
+
+class CapturedFrame:
+    """
+    Frame read from the capture file
+    """
+    __slots__ = ['timestamp', 'direction', 'data']
+
+    def __init__(self, timestamp: float, direction: Direction, data: bytes):
+        self.timestamp = timestamp
+        self.direction = direction
+        self.data = data
+
+    def __str__(self):
+        return f"CapturedFrame: timestamp: {self.timestamp:.6f}, direction: {self.direction.name}, " \
+               f"length: {len(self.data)}"
+
+
+class CaptureWriter:
+    """
+    Writes raw frames with timestamps to the append-only capture file
+
+    File is a magic string followed by records: float64 unix time, direction byte and the frame as is.
+    Frames keep their own length, so nothing else is needed to split them.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1024 * 1024):
+        """
+        :param path: Capture file path
+        :param buffer_size: Size of the write buffer
+        """
+        self.path = path
+        self.frames = 0
+        self._file = open(path, 'ab', buffering=buffer_size)
+        if self._file.tell() == 0:
+            self._file.write(_MAGIC)
+
+    def write(self, data: Buffer, direction: Direction):
+        """
+        Appends concatenated frames, e.g. a batch written to the transport at once
+        """
+        timestamp = time.time()
+        with memoryview(data) as view:
+            offset = 0
+            while offset < len(view):
+                length = _INT32.unpack_from(view, offset)[0]
+                self._file.write(_RECORD.pack(timestamp, direction))
+                self._file.write(view[offset:offset + length])
+                offset += length
+                self.frames += 1
+
+    def sent(self, data: Buffer):
+        self.write(data, Direction.SENT)
+
+    def received(self, data: Buffer):
+        self.write(data, Direction.RECEIVED)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CaptureReader:
+    """
+    Reads frames from the capture file, without decoding them
+    """
+
+    def __init__(self, path: str, direction: Optional[Direction] = None, buffer_size: int = 1024 * 1024):
+        """
+        :param path: Capture file path
+        :param direction: Read only the frames of this direction
+        :param buffer_size: Size of the read buffer
+        """
+        self.path = path
+        self.direction = direction
+        self.buffer_size = buffer_size
+
+    def __iter__(self) -> Iterator[CapturedFrame]:
+        with open(self.path, 'rb', buffering=self.buffer_size) as file:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise InvalidCaptureException(self.path)
+            header_size = _RECORD.size + 4
+            while True:
+                header = file.read(header_size)
+                if len(header) < header_size:
+                    # Nothing more, or the last record was cut while being written
+                    return
+                timestamp, direction = _RECORD.unpack_from(header)
+                length = _INT32.unpack_from(header, _RECORD.size)[0]
+                if length < HEADER_LENGTH:
+                    raise InvalidCaptureException(self.path)
+                rest = file.read(length - 4)
+                if len(rest) < length - 4:
+                    return
+                if self.direction is None or self.direction == direction:
+                    yield CapturedFrame(timestamp, Direction(direction), header[_RECORD.size:] + rest)
+
+
+class ReplayStats:
+    """
+    Replay results, latencies are in seconds
+    """
+    __slots__ = ['sent', 'replies', 'errors', 'elapsed', 'latencies']
+
+    def __init__(self):
+        self.sent = 0
+        self.replies = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.latencies: List[float] = []
+
+    def percentile(self, percent: float) -> float:
+        """
+        Latency percentile, e.g. 99 for p99
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def __str__(self):
+        rate = self.sent / self.elapsed if self.elapsed else 0.0
+        return f"ReplayStats: sent: {self.sent} ({rate:.0f}/s), replies: {self.replies}, errors: {self.errors}, " \
+               f"p50: {self.percentile(50) * 1000:.3f} ms, p99: {self.percentile(99) * 1000:.3f} ms"
+
+
+class Replayer:
+    """
+    Re-sends the captured requests to the target without decoding them, measuring the reply latency
+
+    Requests are sent on the captured schedule, sped up by the speed factor, without waiting for the replies,
+    so the target gets the original load shape. Without speed they are sent as fast as max_in_flight allows.
+    """
+
+    def __init__(self, frames: Iterable[CapturedFrame], speed: Optional[float] = 1.0, max_in_flight: int = 1000):
+        """
+        :param frames: Captured frames, e.g. CaptureReader. Only the sent ones are replayed
+        :param speed: Speed factor of the schedule, None to send as fast as possible
+        :param max_in_flight: Max number of requests waiting for the reply
+        """
+        self.frames = frames
+        self.speed = speed
+        self.max_in_flight = max_in_flight
+
+    async def replay(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]]) -> ReplayStats:
+        """
+        :param send_frame: Target, e.g. send_frame of MongoWireProtocol or ConnectionPool
+        """
+        loop = asyncio.get_running_loop()
+        stats = ReplayStats()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        started = loop.time()
+        first_timestamp = None
+
+        def done(future: asyncio.Future, sent_at: float):
+            pending.discard(future)
+            in_flight.release()
+            if future.cancelled() or future.exception() is not None:
+                stats.errors += 1
+            elif future.result() is not None:
+                stats.replies += 1
+                stats.latencies.append(loop.time() - sent_at)
+
+        for frame in self.frames:
+            if frame.direction != Direction.SENT:
+                continue
+            if self.speed is not None:
+                if first_timestamp is None:
+                    first_timestamp = frame.timestamp
+                delay = started + (frame.timestamp - first_timestamp) / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await in_flight.acquire()
+            sent_at = loop.time()
+            try:
+                future = asyncio.ensure_future(send_frame(RawFrame(frame.data)))
+            except Exception:
+                in_flight.release()
+                stats.errors += 1
+                continue
+            stats.sent += 1
+            pending.add(future)
+            future.add_done_callback(lambda f, sent_at=sent_at: done(f, sent_at))
+
+        if pending:
+            await asyncio.wait(list(pending))
+        stats.elapsed = loop.time() - started
+        return stats
@@ -0,0 +1,125 @@
+import os
+import struct
+from typing import Union, Tuple, List, Optional
+
+Buffer = Union[bytes, bytearray, memoryview]
+Bounds = List[Tuple[int, int]]
+
+HEADER_LENGTH = 16
+
+_HEADER = struct.Struct('<iiii')
+_INT32 = struct.Struct('<i')
+_REPLY = struct.Struct('<iqii')
+
+
+def _append_document(documents: Bounds, data: Buffer, offset: int, end: int) -> int:
+    if end - offset < 4:
+        raise ValueError(f"Document length at offset {offset} is out of bounds")
+    length = _INT32.unpack_from(data, offset)[0]
+    if length < 5 or length > end - offset:
+        raise ValueError(f"Invalid document length {length} at offset {offset}")
+    documents.append((offset, offset + length))
+    return offset + length
+
+
+def _check_bounds(data: Buffer, offset: int, end: int):
+    if offset < 0 or end < offset or end > len(data):
+        raise ValueError("Offsets are out of the buffer bounds")
+
+
+def unpack_header_python(data: Buffer, offset: int = 0) -> Tuple[int, int, int, int]:
+    """
+    Standard message header at the offset
+
+    :return: (message length, request id, response to, op code)
+    """
+    if offset < 0 or len(data) - offset < HEADER_LENGTH:
+        raise ValueError("Buffer is too short for the message header")
+    return _HEADER.unpack_from(data, offset)
+
+
+def pack_header_python(message_length: int, request_id: int, response_to: int, op_code: int) -> bytes:
+    """
+    Encoded standard message header
+    """
+    try:
+        return _HEADER.pack(message_length, request_id, response_to, op_code)
+    except struct.error as exc:
+        raise OverflowError(str(exc)) from None
+
+
+def walk_sections_python(data: Buffer, offset: int, end: int) -> List[Tuple[int, int, Optional[str], Bounds]]:
+    """
+    OP_MSG sections between the offsets, documents are not decoded
+
+    :return: List of (payload type, size, identifier, documents bounds in the buffer).
+        Identifier is None for the body section
+    """
+    _check_bounds(data, offset, end)
+    sections = []
+    while offset < end:
+        payload_type = data[offset]
+        offset += 1
+        if end - offset < 4:
+            raise ValueError("Section size is out of the message bounds")
+        size = _INT32.unpack_from(data, offset)[0]
+        if size < 4 or size > end - offset:
+            raise ValueError(f"Invalid section size {size} at offset {offset}")
+        section_end = offset + size
+        documents = []
+        if payload_type == 0:
+            _append_document(documents, data, offset, section_end)
+            identifier = None
+        elif payload_type == 1:
+            identifier_end = offset + 4
+            while identifier_end < section_end and data[identifier_end]:
+                identifier_end += 1
+            if identifier_end == section_end:
+                raise ValueError(f"Section identifier at offset {offset} is not terminated")
+            identifier = bytes(data[offset + 4:identifier_end]).decode()
+            position = identifier_end + 1
+            while position < section_end:
+                position = _append_document(documents, data, position, section_end)
+        else:
+            raise ValueError(f"Unknown section type for OpMsg: {payload_type}")
+        sections.append((payload_type, size, identifier, documents))
+        offset = section_end
+    return sections
+
+
+def unpack_reply_python(data: Buffer, offset: int, end: int) -> Tuple[int, int, int, int, Bounds]:
+    """
+    OP_REPLY fields following the header, documents are not decoded
+
+    :return: (response flags, cursor id, starting from, number returned, documents bounds in the buffer)
+    """
+    _check_bounds(data, offset, end)
+    if end - offset < _REPLY.size:
+        raise ValueError("Buffer is too short for OP_REPLY")
+    response_flags, cursor_id, starting_from, number_returned = _REPLY.unpack_from(data, offset)
+    documents = []
+    position = offset + _REPLY.size
+    for _ in range(number_returned):
+        position = _append_document(documents, data, position, end)
+    return response_flags, cursor_id, starting_from, number_returned, documents
+
+
+# AIOMONGOWIRE_NO_EXTENSIONS=1 forces the pure Python implementation, e.g. to compare the two
+if os.environ.get('AIOMONGOWIRE_NO_EXTENSIONS'):
+    _speedups = None
+else:
+    try:
+        from . import _speedups
+    except ImportError:
+        _speedups = None
+
+if _speedups is not None:
+    unpack_header = _speedups.unpack_header
+    pack_header = _speedups.pack_header
+    walk_sections = _speedups.walk_sections
+    unpack_reply = _speedups.unpack_reply
+else:
+    unpack_header = unpack_header_python
+    pack_header = pack_header_python
+    walk_sections = walk_sections_python
+    unpack_reply = unpack_reply_python
@@ -0,0 +1,271 @@
+import struct
+from typing import Dict, List, Tuple, Union, Optional
+
+from . import _bson_scanner as scanner
+from ._frame import RawFrame, HEADER_LENGTH
+from ._lazy import is_installed, LazyModule
+from ._op_code import OpCode
+from ._op_msg import OpMsg
+
+# Importing NumPy is slow, it is done on the first batch
+numpy = LazyModule('numpy') if is_installed('numpy') else None
+
+_DOUBLE = struct.Struct('<d')
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+
+# Schema type name: BSON type, column dtype, dtype of the raw value in the buffer
+_TYPES = {
+    'double': (scanner.DOUBLE, 'f8', '<f8'),
+    'int32': (scanner.INT32, 'i4', '<i4'),
+    'int64': (scanner.INT64, 'i8', '<i8'),
+    'bool': (scanner.BOOLEAN, '?', '?'),
+    'date': (scanner.DATETIME, 'datetime64[ms]', '<i8'),
+    'timestamp': (scanner.TIMESTAMP, 'u8', '<u8'),
+    # Void, unlike bytes dtype, keeps the trailing zero bytes
+    'objectId': (scanner.OBJECT_ID, 'V12', 'V12'),
+    'string': (scanner.STRING, 'O', None),
+}
+
+_NUMERIC_TYPES = {scanner.DOUBLE: _DOUBLE, scanner.INT32: _INT32, scanner.INT64: _INT64}
+_INT64_RANGE = (-(1 << 63), (1 << 63) - 1)
+
+# OP_REPLY documents follow flags, cursor id, starting from and number returned
+_OP_REPLY_DOCUMENTS_OFFSET = HEADER_LENGTH + 20
+
+
+class _Column:
+    """
+    Values of a single field. Mask is True where the document has no value of the column type
+    """
+    __slots__ = ['name', 'type_name', 'bson_type', 'values', 'mask', '_raw_dtype', '_rows', '_offsets', '_converted']
+
+    def __init__(self, name: str, type_name: str, capacity: int):
+        self.name = name
+        self.type_name = type_name
+        self.bson_type, dtype, self._raw_dtype = _TYPES[type_name]
+        self.values = numpy.zeros(capacity, dtype=dtype)
+        self.mask = numpy.ones(capacity, dtype=bool)
+        # Values of the current batch: rows and buffer offsets of the exact type, (row, value) pairs of the rest
+        self._rows: List[int] = []
+        self._offsets: List[int] = []
+        self._converted: List[Tuple[int, object]] = []
+
+    def _add(self, data: Union[bytes, bytearray], element_type: int, offset: int, row: int):
+        if element_type == self.bson_type and self._raw_dtype is not None:
+            self._rows.append(row)
+            self._offsets.append(offset)
+        elif element_type == scanner.STRING and self.bson_type == scanner.STRING:
+            length = _INT32.unpack_from(data, offset)[0]
+            self._converted.append((row, bytes(data[offset + 4:offset + 3 + length]).decode()))
+        elif element_type in _NUMERIC_TYPES and self.bson_type in _NUMERIC_TYPES:
+            self._converted.append((row, _NUMERIC_TYPES[element_type].unpack_from(data, offset)[0]))
+
+    def _grow(self, capacity: int):
+        size = len(self.values)
+        if capacity <= size:
+            return
+        while size < capacity:
+            size *= 2
+        values = numpy.zeros(size, dtype=self.values.dtype)
+        values[:len(self.values)] = self.values
+        mask = numpy.ones(size, dtype=bool)
+        mask[:len(self.mask)] = self.mask
+        self.values, self.mask = values, mask
+
+    def _fits(self, value) -> bool:
+        """
+        Checks if the converted value is stored in the column exactly
+        """
+        dtype = self.values.dtype
+        if dtype.kind == 'O' or type(value) is str:
+            return True
+        if dtype.kind == 'f':
+            return type(value) is float or float(value) == value
+        if type(value) is float:
+            return False
+        info = numpy.iinfo(dtype)
+        return info.min <= value <= info.max
+
+    def _widen(self, value):
+        """
+        Widens integer column to int64 for the larger integer, to object column for anything else not fitting,
+        e.g. a fractional or NaN double, so no value is changed
+        """
+        if self.values.dtype.kind == 'i' and type(value) is int and _INT64_RANGE[0] <= value <= _INT64_RANGE[1]:
+            dtype = numpy.dtype('i8')
+        else:
+            dtype = numpy.dtype(object)
+        self.values = self.values.astype(dtype)
+
+    def _flush(self, data: Union[bytes, bytearray]):
+        """
+        Copies values of the batch from the buffer into the column, all at once
+        """
+        try:
+            if self._rows:
+                rows = numpy.array(self._rows, dtype=numpy.intp)
+                dtype = numpy.dtype(self._raw_dtype)
+                offsets = numpy.array(self._offsets, dtype=numpy.intp)
+                raw = numpy.frombuffer(data, dtype=numpy.uint8)
+                values = raw[offsets[:, None] + numpy.arange(dtype.itemsize)].view(dtype).reshape(-1)
+                if self.values.dtype.kind == 'M':
+                    values = values.view(self.values.dtype)
+                elif self.values.dtype.kind == 'O':
+                    values = values.tolist()
+                self.values[rows] = values
+                self.mask[rows] = False
+            for row, value in self._converted:
+                if not self._fits(value):
+                    self._widen(value)
+                self.values[row] = value
+                self.mask[row] = False
+        finally:
+            # Pending values belong to this batch only, even if it has failed
+            self._rows.clear()
+            self._offsets.clear()
+            self._converted.clear()
+
+
+class ColumnarBatch:
+    """
+    Decodes documents straight into NumPy column arrays, without building a dict for every document
+
+    Schema maps dotted field paths to the column types: double, int32, int64, bool, date, timestamp, objectId, string.
+    Only the fields of the schema are read, everything else is skipped by its size.
+    Numeric values of the other numeric types are converted to the column type, values of the other types are masked.
+    Integer column is widened to int64 for a larger integer, numeric column becomes an object one for a value
+    it can not hold exactly, e.g. a fractional double in an integer column.
+    Arrays of the columns grow as batches are added.
+    """
+
+    def __init__(self, schema: Dict[str, str], capacity: int = 1024):
+        """
+        :param schema: Field path to the column type
+        :param capacity: Initial number of rows of the column arrays
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for the columnar decoding")
+        self._length = 0
+        self._capacity = max(capacity, 1)
+        self._columns: Dict[str, _Column] = {}
+        # Field names tree, leaves are the columns
+        self._fields: Dict[bytes, Union[dict, _Column]] = {}
+        for path, type_name in schema.items():
+            if type_name not in _TYPES:
+                raise ValueError(f"Unknown column type {type_name} for {path}, expected one of {list(_TYPES)}")
+            column = _Column(path, type_name, self._capacity)
+            self._columns[path] = column
+            node = self._fields
+            *parents, leaf = path.encode().split(b'.')
+            for parent in parents:
+                node = node.setdefault(parent, {})
+                if isinstance(node, _Column):
+                    raise ValueError(f"Field {path} is inside the column {node.name}")
+            if leaf in node:
+                raise ValueError(f"Field {path} overlaps with another column")
+            node[leaf] = column
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self) -> Dict[str, 'numpy.ma.MaskedArray']:
+        """
+        Columns as masked arrays, masked where the document has no value of the column type.
+        Arrays are views of the column buffers, no data is copied
+        """
+        return {path: numpy.ma.MaskedArray(column.values[:self._length], mask=column.mask[:self._length])
+                for path, column in self._columns.items()}
+
+    def add_documents(self, data: Union[bytes, bytearray], offset: int = 0, end: Optional[int] = None) -> int:
+        """
+        Adds concatenated BSON documents, e.g. OP_REPLY documents
+
+        :return: Number of added documents
+        """
+        data = bytes(data)
+        end = len(data) if end is None else end
+        row = self._length
+        while offset < end:
+            self._scan(data, offset, self._fields, row)
+            offset += _INT32.unpack_from(data, offset)[0]
+            row += 1
+        return self._finish_batch(data, row)
+
+    def add_array(self, data: Union[bytes, bytearray], offset: int) -> int:
+        """
+        Adds documents of the BSON array, e.g. cursor batch of the command reply
+
+        :return: Number of added documents
+        """
+        data = bytes(data)
+        row = self._length
+        for element_type, _, value_offset, _ in scanner.iter_elements(data, offset):
+            if element_type == scanner.DOCUMENT:
+                self._scan(data, value_offset, self._fields, row)
+            row += 1
+        return self._finish_batch(data, row)
+
+    def add_frame(self, frame: RawFrame) -> int:
+        """
+        Adds documents of the undecoded OP_REPLY, or OP_MSG reply to find, aggregate or getMore
+
+        :return: Cursor id of the reply, 0 if the cursor is exhausted
+        """
+        data = bytes(frame.data)  # field names are looked up by slices, bytearray ones are not hashable
+        if frame.op_code == OpCode.OP_REPLY:
+            self.add_documents(data, _OP_REPLY_DOCUMENTS_OFFSET, frame.message_length)
+            return _INT64.unpack_from(data, HEADER_LENGTH + 4)[0]
+        if frame.op_code != OpCode.OP_MSG:
+            raise ValueError(f"Expected OP_REPLY or OP_MSG, got op code {frame.op_code}")
+        body_offset = HEADER_LENGTH + 4
+        if data[body_offset] != OpMsg.PayloadType.BODY:
+            raise ValueError("OP_MSG reply should start with the body section")
+        cursor = scanner.find_element(data, b'cursor', body_offset + 1)
+        if cursor is None or cursor[0] != scanner.DOCUMENT:
+            raise ValueError("Reply has no cursor")
+        cursor_id = 0
+        for element_type, name, value_offset, _ in scanner.iter_elements(data, cursor[1]):
+            if name == b'id':
+                cursor_id = scanner.read_int(data, element_type, value_offset) or 0
+            elif name in (b'firstBatch', b'nextBatch') and element_type == scanner.ARRAY:
+                self.add_array(data, value_offset)
+        return cursor_id
+
+    def _scan(self, data: bytes, offset: int, fields: dict, row: int):
+        unpack_int32 = _INT32.unpack_from
+        fixed_sizes = scanner.FIXED_SIZES
+        index = data.index
+        end = offset + unpack_int32(data, offset)[0] - 1
+        position = offset + 4
+        remaining = len(fields)
+        while position < end:
+            element_type = data[position]
+            name_end = index(0, position + 1)
+            field = fields.get(data[position + 1:name_end])
+            position = name_end + 1
+            if field is not None:
+                if type(field) is _Column:
+                    field._add(data, element_type, position, row)
+                elif element_type == scanner.DOCUMENT:
+                    self._scan(data, position, field, row)
+                remaining -= 1
+                if not remaining:
+                    # Nothing else is needed from this document
+                    return
+            size = fixed_sizes.get(element_type)
+            if size is None:
+                size = scanner.value_size(data, element_type, position)
+            position += size
+
+    def _finish_batch(self, data: Union[bytes, bytearray], length: int) -> int:
+        added = length - self._length
+        if length > self._capacity:
+            while self._capacity < length:
+                self._capacity *= 2
+        for column in self._columns.values():
+            column._grow(self._capacity)
+            column._flush(data)
+        self._length = length
+        return added
@@ -1,6 +1,11 @@
 import abc
+import threading
 import zlib
-from typing import Dict, Type, Set
+from typing import Dict, Type, Set, Union
+
+from ._lazy import is_installed, LazyModule
+
+Buffer = Union[bytes, bytearray, memoryview]
 
 _COMPRESSORS_BY_NAME: Dict[str, Type['Compressor']] = {}
 _COMPRESSORS_BY_ID: Dict[int, Type['Compressor']] = {}
@@ -35,6 +40,14 @@ class Compressor(abc.ABC):
         """Decompress method"""
         pass
 
+    @classmethod
+    def decompress_sized(cls, data: Buffer, uncompressed_size: int) -> bytes:
+        """
+        Decompress data of the known uncompressed size, e.g. from OP_COMPRESSED header.
+        Accepts memoryview, compressors which can allocate the output once override it
+        """
+        return cls.decompress(data)
+
     @classmethod
     def compressor_names(cls) -> Set[str]:
         return set(_COMPRESSORS_BY_NAME.keys())
@@ -43,14 +56,25 @@ class Compressor(abc.ABC):
     def by_id(cls, _id: int) -> Type['Compressor']:
         return _COMPRESSORS_BY_ID[_id]
 
+    @classmethod
+    def by_name(cls, name: str) -> Type['Compressor']:
+        return _COMPRESSORS_BY_NAME[name]
+
+    @classmethod
+    def warm_up(cls):
+        """
+        Loads the compression library and creates its contexts, so the first message does not pay for it
+        """
+        cls.decompress(cls.compress(b''))
+
     def __init_subclass__(cls) -> None:
         super().__init_subclass__()
         _COMPRESSORS_BY_ID[cls.id()] = cls
         _COMPRESSORS_BY_NAME[cls.name()] = cls
 
 
-try:
-    import snappy
+if is_installed('snappy'):
+    snappy = LazyModule('snappy')
 
 
     class CompressorSnappy(Compressor):
@@ -70,9 +94,6 @@ try:
         def decompress(cls, data: bytes) -> bytes:
             return snappy.decompress(data)
 
-except ImportError:
-    pass
-
 
 class CompressorZlib(Compressor):
     @classmethod
@@ -91,9 +112,14 @@ class CompressorZlib(Compressor):
     def decompress(cls, data: bytes) -> bytes:
         return zlib.decompress(data)
 
+    @classmethod
+    def decompress_sized(cls, data: Buffer, uncompressed_size: int) -> bytes:
+        return zlib.decompress(data, bufsize=max(uncompressed_size, 1))
+
 
-try:
-    import zstandard
+if is_installed('zstandard'):
+    zstandard = LazyModule('zstandard')
+    _zstd_contexts = threading.local()
 
 
     class CompressorZstd(Compressor):
@@ -107,11 +133,24 @@ try:
 
         @classmethod
         def compress(cls, data: bytes) -> bytes:
-            return zstandard.compress(data)
+            return cls._contexts().compressor.compress(data)
 
         @classmethod
         def decompress(cls, data: bytes) -> bytes:
-            return zstandard.decompress(data)
+            return cls._contexts().decompressor.decompress(data)
 
-except ImportError:
-    pass
+        @classmethod
+        def decompress_sized(cls, data: Buffer, uncompressed_size: int) -> bytes:
+            return cls._contexts().decompressor.decompress(data, max_output_size=uncompressed_size)
+
+        @classmethod
+        def _contexts(cls) -> threading.local:
+            """
+            Reused compression contexts, creating them costs more than compressing a small message.
+            Contexts can't be shared between threads
+            """
+            contexts = _zstd_contexts
+            if not hasattr(contexts, 'compressor'):
+                contexts.compressor = zstandard.ZstdCompressor()
+                contexts.decompressor = zstandard.ZstdDecompressor()
+            return contexts
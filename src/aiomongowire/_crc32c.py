@@ -0,0 +1,69 @@
+import struct
+from typing import Union, List
+
+from ._lazy import is_installed, LazyModule
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+_POLYNOMIAL = 0x82F63B78  # Castagnoli, reversed
+
+
+class InvalidChecksumException(Exception):
+    def __init__(self, expected: int, actual: int) -> None:
+        super().__init__(f"Invalid CRC-32C checksum: expected {expected:#010x}, got {actual:#010x}")
+
+
+def _make_tables() -> List[List[int]]:
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ _POLYNOMIAL if crc & 1 else crc >> 1
+        table.append(crc)
+    tables = [table]
+    for _ in range(7):
+        previous = tables[-1]
+        tables.append([(previous[i] >> 8) ^ table[previous[i] & 0xFF] for i in range(256)])
+    return tables
+
+
+_TABLES = _make_tables()
+_EIGHT_BYTES = struct.Struct('<II')
+
+
+def crc32c_python(data: Buffer, crc: int = 0) -> int:
+    """
+    Table-driven slicing-by-8 CRC-32C. Reads the buffer in place, memoryviews are not copied
+
+    :param data: Data to checksum
+    :param crc: Checksum of the preceding data, to continue the calculation
+    """
+    t0, t1, t2, t3, t4, t5, t6, t7 = _TABLES
+    view = memoryview(data).cast('B')
+    aligned = len(view) & ~7
+    crc ^= 0xFFFFFFFF
+    for low, high in _EIGHT_BYTES.iter_unpack(view[:aligned]):
+        low ^= crc
+        crc = (t7[low & 0xFF] ^ t6[(low >> 8) & 0xFF] ^ t5[(low >> 16) & 0xFF] ^ t4[low >> 24] ^
+               t3[high & 0xFF] ^ t2[(high >> 8) & 0xFF] ^ t1[(high >> 16) & 0xFF] ^ t0[high >> 24])
+    for byte in view[aligned:]:
+        crc = t0[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+if is_installed('crc32c'):
+    # Importing the package is slow, it is done on the first checksum
+    _crc32c_ext = LazyModule('crc32c')
+
+
+    def crc32c_accelerated(data: Buffer, crc: int = 0) -> int:
+        """
+        CRC-32C from the crc32c package, hardware-accelerated where the CPU supports it
+        """
+        return _crc32c_ext.crc32c(data, crc)
+
+
+    crc32c = crc32c_accelerated
+else:
+    crc32c_accelerated = None
+    crc32c = crc32c_python
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import weakref
+from collections import deque
+from typing import Callable, Awaitable, Optional, Dict, List, Set, Tuple, Deque
+
+from ._loop import bind_loop
+from ._message import MongoWireMessage
+from ._op_kill_cursors import OpKillCursors
+from ._op_msg import OpMsg
+from ._op_reply import OpReply
+
+# Namespace of the cursors from OP_REPLY, killed with OP_KILL_CURSORS which does not need one
+LEGACY_NAMESPACE = ''
+
+
+def reply_cursor(reply: MongoWireMessage) -> Tuple[int, str]:
+    """
+    Cursor id and namespace of the reply, id is 0 if the reply has no open cursor
+
+    :return: (cursor id, namespace), namespace is LEGACY_NAMESPACE for OP_REPLY
+    """
+    operation = reply.operation
+    if isinstance(operation, OpReply):
+        return operation.cursor_id, LEGACY_NAMESPACE
+    if isinstance(operation, OpMsg) and operation.sections:
+        cursor = getattr(operation.sections[0], 'data', {}).get('cursor')
+        if isinstance(cursor, dict) and cursor.get('id'):
+            return cursor['id'], cursor.get('ns', LEGACY_NAMESPACE)
+    return 0, LEGACY_NAMESPACE
+
+
+class Cursor:
+    """
+    Handle of an open server cursor. The cursor is killed once the handle is closed,
+    or garbage collected while the cursor is still open, e.g. with the iterator abandoned by the caller
+    """
+    __slots__ = ['cursor_id', 'namespace', '_registry', '_finalizer', '__weakref__']
+
+    def __init__(self, registry: 'CursorRegistry', cursor_id: int, namespace: str):
+        self.cursor_id = cursor_id
+        self.namespace = namespace
+        self._registry = registry
+        self._finalizer = weakref.finalize(self, registry.kill, cursor_id, namespace)
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.cursor_id)
+
+    def update(self, reply: MongoWireMessage):
+        """
+        Takes the cursor id from the getMore reply, the cursor is forgotten once the server has exhausted it
+        """
+        cursor_id, _ = reply_cursor(reply)
+        if not cursor_id:
+            self._finalizer.detach()
+            self._registry.forget(self.cursor_id)
+            self.cursor_id = 0
+
+    def close(self):
+        """
+        Kills the cursor with the next batch of kills, if it is still open
+        """
+        if self.cursor_id:
+            self._finalizer()
+            self.cursor_id = 0
+
+    def __str__(self):
+        return f"Cursor: id: {self.cursor_id}, namespace: {self.namespace}"
+
+
+class CursorRegistry:
+    """
+    Open cursors of a connection, the abandoned ones are killed in batches
+
+    Kills are collected for flush_interval seconds, or up to max_batch cursors, and then sent together:
+    cursors from OP_MSG replies with a killCursors command per namespace, legacy OP_REPLY ones with
+    a single OP_KILL_CURSORS. Kill replies are not waited for by the caller, failed kills are logged,
+    cursors are reaped by the server timeout then
+    """
+
+    def __init__(self, send: Callable[[MongoWireMessage], Awaitable[Optional[MongoWireMessage]]],
+                 flush_interval: float = 0.1, max_batch: int = 1000,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        :param send: Sends the message and returns the reply, e.g. send_data of MongoWireProtocol
+        :param flush_interval: Seconds the kills wait for more kills to be sent with
+        :param max_batch: Number of the waiting kills at which they are sent right away
+        :param loop: Event loop to bind to, the running one by default, required outside a running loop
+        """
+        self.send = send
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.killed = 0
+        self.kill_messages = 0
+
+        self._loop = bind_loop(loop)
+        self._live: Dict[int, str] = {}  # cursor id: namespace
+        self._handles: 'weakref.WeakValueDictionary[int, Cursor]' = weakref.WeakValueDictionary()
+        # Finalizers may run in any thread, at any point of the garbage collection, even with a lock held
+        # by the interrupted code. Appends to deque are atomic, so kills need no lock
+        self._kills: Deque[Tuple[str, int]] = deque()  # namespace, cursor id
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Set[asyncio.Task] = set()
+        self._logger = logging.getLogger('aiomongowire')
+
+    @property
+    def live(self) -> int:
+        """
+        Number of the tracked open cursors
+        """
+        return len(self._live)
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of the cursors waiting to be killed
+        """
+        return len(self._kills)
+
+    def track(self, reply: MongoWireMessage) -> Optional[Cursor]:
+        """
+        Starts tracking the cursor of the find, aggregate or OP_QUERY reply
+
+        :return: Cursor handle the caller should keep while iterating, None if the reply has no open cursor
+        """
+        cursor_id, namespace = reply_cursor(reply)
+        if not cursor_id:
+            return None
+        self._live[cursor_id] = namespace
+        cursor = self._handles[cursor_id] = Cursor(self, cursor_id, namespace)
+        return cursor
+
+    def forget(self, cursor_id: int):
+        """
+        Stops tracking the cursor closed by the server
+        """
+        self._live.pop(cursor_id, None)
+
+    def kill(self, cursor_id: int, namespace: str = LEGACY_NAMESPACE):
+        """
+        Adds the cursor to the next batch of kills. Safe to call from any thread
+        """
+        self._live.pop(cursor_id, None)
+        self._kills.append((namespace, cursor_id))
+        try:
+            self._loop.call_soon_threadsafe(self._schedule)
+        except RuntimeError:
+            # Loop is closed, the server reaps the cursor by its timeout
+            pass
+
+    def _schedule(self):
+        if len(self._kills) >= self.max_batch:
+            self._flush_soon()
+        elif self._timer is None and self._kills:
+            self._timer = self._loop.call_later(self.flush_interval, self._flush_soon)
+
+    def _flush_soon(self):
+        task = self._loop.create_task(self.flush())
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def flush(self):
+        """
+        Sends the waiting kills right away
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending: Dict[str, List[int]] = {}
+        while self._kills:
+            namespace, cursor_id = self._kills.popleft()
+            pending.setdefault(namespace, []).append(cursor_id)
+        for namespace, cursor_ids in pending.items():
+            self.killed += len(cursor_ids)
+            self.kill_messages += 1
+            try:
+                await self.send(kill_message(namespace, cursor_ids))
+            except Exception as exc:
+                self._logger.warning(f"Failed to kill {len(cursor_ids)} cursors of {namespace or 'OP_REPLY'}: {exc}")
+
+    async def close(self):
+        """
+        Kills all the tracked cursors, their handles are closed, so they are not killed again once collected
+        """
+        for cursor_id, namespace in list(self._live.items()):
+            cursor = self._handles.get(cursor_id)
+            if cursor is not None:
+                cursor.close()
+            else:
+                self.kill(cursor_id, namespace)
+        await self.flush()
+        if self._flushing:
+            await asyncio.wait(list(self._flushing))
+
+
+def kill_message(namespace: str, cursor_ids: List[int]) -> MongoWireMessage:
+    """
+    killCursors command for the cursors of the namespace, OP_KILL_CURSORS for the legacy ones
+    """
+    if namespace == LEGACY_NAMESPACE:
+        return MongoWireMessage(operation=OpKillCursors(len(cursor_ids), cursor_ids))
+    db, collection = namespace.split('.', 1)
+    return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'killCursors': collection, 'cursors': cursor_ids,
+                                                                  '$db': db})]))
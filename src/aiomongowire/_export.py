@@ -0,0 +1,262 @@
+import abc
+import asyncio
+import functools
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Awaitable, Optional, Tuple
+
+from . import _bson_scanner as scanner
+from ._batch_tuner import BatchSizeTuner, cursor_namespace
+from ._bson import get_bson_parser
+from ._cursors import CursorRegistry, LEGACY_NAMESPACE
+from ._frame import RawFrame, HEADER_LENGTH
+from ._lazy import is_installed
+from ._loop import bind_loop
+from ._message import MongoWireMessage
+from ._op_code import OpCode
+from ._op_get_more import OpGetMore
+from ._op_msg import OpMsg
+from ._op_query import OpQuery
+from ._op_reply import OpReply
+
+# responseFlags, cursorID, startingFrom, numberReturned
+_REPLY = struct.Struct('<iqii')
+_INT32 = struct.Struct('<i')
+
+
+class ExportException(Exception):
+    def __init__(self, reply: dict) -> None:
+        super().__init__(f"Export failed: {reply.get('errmsg', reply)}")
+        self.reply = reply
+
+
+def cursor_batch(frame: RawFrame) -> Tuple[bytes, int, int]:
+    """
+    Documents of the undecoded cursor reply, OP_REPLY or OP_MSG with firstBatch or nextBatch,
+    concatenated as they are in the reply. Documents are not decoded
+
+    :return: (concatenated documents, number of documents, cursor id)
+    """
+    data = frame.data
+    if frame.op_code == OpCode.OP_REPLY:
+        flags, cursor_id, _, number_returned = _REPLY.unpack_from(data, HEADER_LENGTH)
+        if flags & (OpReply.Flags.QUERY_FAILURE | OpReply.Flags.CURSOR_NOT_FOUND):
+            raise ExportException(frame.message.operation.documents[0] if number_returned else
+                                  {'errmsg': 'cursor not found'})
+        return bytes(data[HEADER_LENGTH + _REPLY.size:]), number_returned, cursor_id
+    if frame.op_code != OpCode.OP_MSG or data[HEADER_LENGTH + 4] != OpMsg.PayloadType.BODY:
+        raise ExportException({'errmsg': f"unexpected reply op code {frame.op_code}"})
+    cursor = scanner.find_element(data, b'cursor', HEADER_LENGTH + 5)
+    if cursor is None or cursor[0] != scanner.DOCUMENT:
+        raise ExportException(frame.message.operation.sections[0].data)
+    view = memoryview(data)
+    documents = []
+    cursor_id = 0
+    for element_type, name, value_offset, _ in scanner.iter_elements(data, cursor[1]):
+        if name == b'id':
+            cursor_id = scanner.read_int(data, element_type, value_offset) or 0
+        elif name in (b'firstBatch', b'nextBatch') and element_type == scanner.ARRAY:
+            documents = [view[offset:offset + size] for _, _, offset, size in scanner.iter_elements(data, value_offset)]
+    return b''.join(documents), len(documents), cursor_id
+
+
+class FileSink(abc.ABC):
+    """
+    Writes cursor batches to a file in a writer thread
+
+    Batches waiting for the writer are limited by max_pending bytes, write waits once there are more,
+    so a slow disk slows down the cursor instead of filling the memory.
+    Batches are written in order, the first failed write is raised by the next write, drain or close
+    """
+
+    def __init__(self, path: str, max_pending: int = 8 * 1024 * 1024, buffer_size: int = 1024 * 1024,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        :param path: Output file path, overwritten
+        :param max_pending: Bytes of the batches waiting for the writer at which write waits
+        :param buffer_size: Size of the file write buffer
+        :param loop: Event loop to bind to, the running one by default, required outside a running loop
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.documents = 0
+        self.batches = 0
+
+        self._loop = bind_loop(loop)
+        self._file = open(path, 'wb', buffering=buffer_size)
+        # Single writer keeps the batches in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='aiomongowire-sink')
+        self._pending = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def pending(self) -> int:
+        """
+        Bytes of the batches waiting for the writer
+        """
+        return self._pending
+
+    async def write(self, documents: bytes, count: int):
+        """
+        Queues concatenated BSON documents for writing, waits while the writer is behind
+
+        :param documents: Concatenated documents
+        :param count: Number of the documents
+        """
+        # One batch always goes, even if it is larger than max_pending
+        while self._pending >= self.max_pending:
+            self._drained.clear()
+            await self._drained.wait()
+        self._raise_error()
+        self._pending += len(documents)
+        self.documents += count
+        self.batches += 1
+        future = self._loop.run_in_executor(self._executor, self._write_documents, documents)
+        future.add_done_callback(functools.partial(self._written, len(documents)))
+
+    async def write_frame(self, frame: RawFrame) -> int:
+        """
+        Queues the documents of the undecoded cursor reply, see cursor_batch
+
+        :return: Cursor id of the reply
+        """
+        documents, count, cursor_id = cursor_batch(frame)
+        await self.write(documents, count)
+        return cursor_id
+
+    def _written(self, size: int, future: asyncio.Future):
+        self._pending -= size
+        if self._error is None and not future.cancelled() and future.exception() is not None:
+            self._error = future.exception()
+        if self._pending < self.max_pending:
+            self._drained.set()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    @abc.abstractmethod
+    def _write_documents(self, documents: bytes):
+        """
+        Writes the documents, runs in the writer thread
+        """
+        pass
+
+    async def drain(self):
+        """
+        Waits for all the queued batches to be written
+        """
+        while self._pending:
+            self._drained.clear()
+            # Set by every write done below max_pending, check for the rest
+            await self._drained.wait()
+        self._raise_error()
+
+    async def close(self):
+        """
+        Writes the queued batches and closes the file
+        """
+        try:
+            await self.drain()
+        finally:
+            await self._loop.run_in_executor(self._executor, self._file.close)
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> 'FileSink':
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+class BsonFileSink(FileSink):
+    """
+    Writes documents as they came from the server, the file is the same as mongodump .bson one
+    """
+
+    def _write_documents(self, documents: bytes):
+        self._file.write(documents)
+
+
+def _default_dumps() -> Callable[[dict], str]:
+    """
+    Relaxed Extended JSON, as mongoexport writes, if pymongo is installed, plain JSON with str for the rest otherwise
+    """
+    if is_installed('pymongo'):
+        from bson import json_util
+        return functools.partial(json_util.dumps, json_options=json_util.RELAXED_JSON_OPTIONS)
+    return functools.partial(json.dumps, default=str)
+
+
+class JsonLinesSink(FileSink):
+    """
+    Writes a JSON document per line. Documents are decoded and converted in the writer thread
+    """
+
+    def __init__(self, path: str, dumps: Optional[Callable[[dict], str]] = None, **kwargs):
+        """
+        :param path: Output file path, overwritten
+        :param dumps: Converts the decoded document to JSON, Relaxed Extended JSON by default if pymongo is installed
+        :param kwargs: See FileSink
+        """
+        super().__init__(path, **kwargs)
+        self.dumps = dumps or _default_dumps()
+
+    def _write_documents(self, documents: bytes):
+        parser = get_bson_parser()
+        lines = []
+        offset = 0
+        while offset < len(documents):
+            size = _INT32.unpack_from(documents, offset)[0]
+            lines.append(self.dumps(parser.decode_object(documents[offset:offset + size])))
+            lines.append('\n')
+            offset += size
+        self._file.write(''.join(lines).encode())
+
+
+def _get_more(operation, namespace: str, cursor_id: int) -> MongoWireMessage:
+    if isinstance(operation, (OpQuery, OpGetMore)):
+        return MongoWireMessage(operation=OpGetMore(namespace, operation.number_to_return, cursor_id))
+    db, collection = namespace.split('.', 1)
+    return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'getMore': cursor_id, 'collection': collection,
+                                                                  '$db': db})]))
+
+
+async def export(send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]], message: MongoWireMessage,
+                 sink: FileSink, tuner: Optional[BatchSizeTuner] = None,
+                 cursors: Optional[CursorRegistry] = None) -> int:
+    """
+    Runs find, aggregate or OP_QUERY and writes all of its batches to the sink, without decoding the replies.
+    Next batch is requested once the sink has taken the previous one, so the cursor goes as fast as the disk
+
+    :param send_frame: Sends undecoded frame, e.g. send_frame of MongoWireProtocol or ConnectionPool
+    :param message: Cursor request
+    :param sink: Sink to write to, left open
+    :param tuner: Picks the batch sizes if set
+    :param cursors: Registry to kill the cursor with if the export fails, e.g. protocol.cursors
+    :return: Number of the exported documents
+    """
+    namespace = cursor_namespace(message.operation)
+    if namespace is None:
+        raise ExportException({'errmsg': 'not a cursor request'})
+    started = sink.documents
+    cursor_id = 0
+    try:
+        while True:
+            if tuner is not None:
+                reply = await tuner.send(send_frame, message, namespace)
+            else:
+                reply = await send_frame(RawFrame(bytes(message)))
+            # Cursor id is taken before the write, so that a failed write still kills the cursor
+            documents, count, cursor_id = cursor_batch(reply)
+            await sink.write(documents, count)
+            if not cursor_id:
+                return sink.documents - started
+            message = _get_more(message.operation, namespace, cursor_id)
+    except BaseException:
+        if cursor_id and cursors is not None:
+            cursors.kill(cursor_id, LEGACY_NAMESPACE if isinstance(message.operation, OpGetMore) else namespace)
+        raise
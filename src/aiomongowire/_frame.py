@@ -0,0 +1,232 @@
+import io
+import struct
+from typing import List, Union, Optional, Callable, TYPE_CHECKING
+
+from ._message import MongoWireMessage
+from ._op_code import OpCode
+from ._spill import SpillFile, BufferReader
+
+if TYPE_CHECKING:
+    from ._incremental import IncrementalReply
+
+HEADER_LENGTH = 16
+DEFAULT_MAX_MESSAGE_SIZE = 48 * 1000 * 1000
+
+_HEADER = struct.Struct('<iiii')
+_INT32 = struct.Struct('<i')
+_UINT32 = struct.Struct('<I')
+
+# Legacy write opcodes never get a reply from the server
+_NO_REPLY_OP_CODES = {OpCode.OP_UPDATE, OpCode.OP_INSERT, OpCode.OP_DELETE, OpCode.OP_KILL_CURSORS}
+_OP_MSG_MORE_TO_COME = 1 << 1
+
+
+class InvalidFrameException(Exception):
+    def __init__(self, message_length: int) -> None:
+        super().__init__(f"Invalid message length: {message_length}")
+
+
+class RawFrame:
+    """
+    Undecoded wire protocol message
+
+    Only the standard header is parsed, the rest of the frame is kept as is and decoded on demand.
+    Request id and response id can be changed in place without touching the rest of the frame.
+    Data is either a bytearray or a writable memoryview, e.g. of a spilled frame.
+    """
+    __slots__ = ['data', '_message']
+
+    def __init__(self, data: Union[bytearray, bytes, memoryview]):
+        self.data = data if isinstance(data, (bytearray, memoryview)) else bytearray(data)
+        self._message: Optional[MongoWireMessage] = None
+
+    @property
+    def message_length(self) -> int:
+        return _INT32.unpack_from(self.data, 0)[0]
+
+    @property
+    def request_id(self) -> int:
+        return _INT32.unpack_from(self.data, 4)[0]
+
+    @request_id.setter
+    def request_id(self, value: int):
+        _INT32.pack_into(self.data, 4, value)
+
+    @property
+    def response_to(self) -> int:
+        return _INT32.unpack_from(self.data, 8)[0]
+
+    @response_to.setter
+    def response_to(self, value: int):
+        _INT32.pack_into(self.data, 8, value)
+
+    @property
+    def op_code(self) -> int:
+        """
+        Raw opcode value. Not converted to OpCode so unknown opcodes can be passed through
+        """
+        return _INT32.unpack_from(self.data, 12)[0]
+
+    @property
+    def flag_bits(self) -> int:
+        """
+        OP_MSG flag bits, 0 for other opcodes
+        """
+        if self.op_code != OpCode.OP_MSG:
+            return 0
+        return _UINT32.unpack_from(self.data, HEADER_LENGTH)[0]
+
+    @property
+    def has_reply(self) -> bool:
+        """
+        True if the server is expected to reply to this frame
+        """
+        op_code = self.op_code
+        if op_code in _NO_REPLY_OP_CODES:
+            return False
+        if op_code == OpCode.OP_MSG:
+            return not self.flag_bits & _OP_MSG_MORE_TO_COME
+        return True
+
+    @property
+    def message(self) -> MongoWireMessage:
+        """
+        Decoded message. Decoding happens on the first access
+
+        :raises UnknownOpcodeException: If operation has unknown OpCode
+        """
+        if self._message is None:
+            with self.reader() as data:
+                self._message = MongoWireMessage.from_data(data)
+        return self._message
+
+    def reader(self) -> Union[io.BytesIO, BufferReader]:
+        """
+        File-like object over the frame data, spilled frames are not loaded into memory as a whole
+        """
+        if isinstance(self.data, memoryview):
+            return BufferReader(self.data)
+        return io.BytesIO(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __str__(self):
+        return f"RawFrame: request_id: {self.request_id}, response_to: {self.response_to}, " \
+               f"op_code: {self.op_code}, length: {len(self.data)}"
+
+
+class FrameBuffer:
+    """
+    Accumulates stream data and splits it into complete wire protocol messages
+
+    Frames the incremental factory returns a parser for are not buffered. Their data is passed to the parser
+    as it arrives instead, so they are never returned by feed.
+    Frames of spill_threshold bytes or more are written to a temporary file as they arrive,
+    such frames hold mmap-backed memoryview instead of the bytearray.
+    """
+    __slots__ = ['max_message_size', 'incremental_factory', 'spill_threshold', 'spill_directory',
+                 '_buffer', '_incremental', '_spill', '_spill_remaining']
+
+    def __init__(self, max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE,
+                 incremental_factory: Optional[Callable[[int, int], Optional['IncrementalReply']]] = None,
+                 spill_threshold: Optional[int] = None, spill_directory: Optional[str] = None):
+        """
+        :param max_message_size: Max frame length
+        :param incremental_factory: Called with response id and length of every frame,
+            returns incremental parser for the frame or None to buffer it
+        :param spill_threshold: Frame length from which frames are buffered on disk, never if not set
+        :param spill_directory: Directory for the spilled frames, system temporary directory if not set
+        """
+        self.max_message_size = max_message_size
+        self.incremental_factory = incremental_factory
+        self.spill_threshold = spill_threshold
+        self.spill_directory = spill_directory
+        self._buffer = bytearray()
+        self._incremental: Optional['IncrementalReply'] = None
+        self._spill: Optional[SpillFile] = None
+        self._spill_remaining = 0
+
+    def feed(self, data: bytes) -> List[RawFrame]:
+        """
+        Adds received data to the buffer and returns all frames completed by it
+
+        :raises InvalidFrameException: If message length in the header is out of bounds
+        """
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        offset = 0
+        buffer_len = len(buffer)
+        while True:
+            if self._incremental is not None:
+                chunk_len = min(self._incremental.remaining, buffer_len - offset)
+                # Chunk is released before the buffer is trimmed, whatever the parser does
+                with memoryview(buffer) as view, view[offset:offset + chunk_len] as chunk:
+                    try:
+                        self._incremental.feed(chunk)
+                    except Exception as exc:
+                        # Failure of a single reply, the framing is intact and the connection goes on
+                        self._incremental.fail(exc)
+                offset += chunk_len
+                if self._incremental.remaining:
+                    break
+                self._incremental = None
+                continue
+            if self._spill is not None:
+                chunk_len = min(self._spill_remaining, buffer_len - offset)
+                with memoryview(buffer) as view, view[offset:offset + chunk_len] as chunk:
+                    self._spill.write(chunk)
+                offset += chunk_len
+                self._spill_remaining -= chunk_len
+                if self._spill_remaining:
+                    break
+                frames.append(RawFrame(self._spill.view(0, self._spill.size)))
+                self._spill.close()
+                self._spill = None
+                continue
+            if buffer_len - offset < 4:
+                break
+            message_length = _INT32.unpack_from(buffer, offset)[0]
+            if message_length < HEADER_LENGTH or message_length > self.max_message_size:
+                raise InvalidFrameException(message_length)
+            if self.incremental_factory is not None and buffer_len - offset >= HEADER_LENGTH:
+                self._incremental = self.incremental_factory(_INT32.unpack_from(buffer, offset + 8)[0],
+                                                             message_length)
+                if self._incremental is not None:
+                    continue
+            if buffer_len - offset < message_length:
+                if self.spill_threshold is not None and message_length >= self.spill_threshold:
+                    self._spill = SpillFile(self.spill_directory)
+                    self._spill_remaining = message_length
+                    continue
+                break
+            frames.append(RawFrame(buffer[offset:offset + message_length]))
+            offset += message_length
+        if offset:
+            del buffer[:offset]
+        return frames
+
+    @property
+    def incremental(self) -> Optional['IncrementalReply']:
+        """
+        Parser of the frame being received, if the frame is parsed incrementally
+        """
+        return self._incremental
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of buffered bytes not yet forming a complete frame, spilled ones excluded
+        """
+        return len(self._buffer)
+
+    def clear(self):
+        self._buffer.clear()
+        self._incremental = None
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
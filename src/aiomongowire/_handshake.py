@@ -0,0 +1,102 @@
+import sys
+from typing import Optional, Type, Collection, Dict, Any
+
+from ._base_op import BaseOp
+from ._compressor import Compressor
+from ._op_code import OpCode
+from ._op_msg import OpMsg
+from ._op_query import OpQuery
+
+DRIVER_NAME = 'aiomongowire'
+DRIVER_VERSION = '0.0.1'
+
+# Commands which must never be compressed, see "Messages not allowed to be compressed" in
+# https://github.com/mongodb/specifications/blob/master/source/compression/OP_COMPRESSED.rst
+UNCOMPRESSED_COMMANDS = frozenset({'hello', 'isMaster', 'ismaster', 'saslStart', 'saslContinue', 'getnonce',
+                                   'authenticate', 'createUser', 'updateUser', 'copydbSaslStart', 'copydbgetnonce',
+                                   'copydb'})
+
+
+class HandshakeException(Exception):
+    def __init__(self, reply: dict) -> None:
+        self.reply = reply
+        super().__init__(f"Handshake failed with code {reply.get('code')}: {reply.get('errmsg')}")
+
+
+class ConnectionSettings:
+    """
+    Server limits and the compressor agreed on by the handshake
+    """
+    __slots__ = ['hello', 'min_wire_version', 'max_wire_version', 'max_bson_object_size', 'max_message_size_bytes',
+                 'max_write_batch_size', 'logical_session_timeout_minutes', 'compressor']
+
+    def __init__(self, hello: dict, compressors: Collection[str] = ()):
+        """
+        :param hello: Hello reply
+        :param compressors: Compressors offered by the client, in the order of preference
+        """
+        self.hello = hello
+        self.min_wire_version: int = hello.get('minWireVersion', 0)
+        self.max_wire_version: int = hello.get('maxWireVersion', 0)
+        self.max_bson_object_size: int = hello.get('maxBsonObjectSize', 16 * 1024 * 1024)
+        self.max_message_size_bytes: int = hello.get('maxMessageSizeBytes', 48 * 1000 * 1000)
+        self.max_write_batch_size: int = hello.get('maxWriteBatchSize', 100000)
+        self.logical_session_timeout_minutes: Optional[int] = hello.get('logicalSessionTimeoutMinutes')
+        # Server replies with the offered compressors it supports, the first one is used
+        agreed = [name for name in hello.get('compression', []) if name in compressors]
+        self.compressor: Optional[Type[Compressor]] = Compressor.by_name(agreed[0]) if agreed else None
+
+    def __str__(self):
+        compressor = self.compressor.name() if self.compressor is not None else None
+        return f"ConnectionSettings: wire version: {self.min_wire_version}-{self.max_wire_version}, " \
+               f"compressor: {compressor}, max message size: {self.max_message_size_bytes}"
+
+
+def client_metadata(app_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Client document of the handshake
+    https://github.com/mongodb/specifications/blob/master/source/mongodb-handshake/handshake.rst#client
+    """
+    import platform
+    metadata = {
+        'driver': {'name': DRIVER_NAME, 'version': DRIVER_VERSION},
+        'os': {'type': platform.system(), 'architecture': platform.machine()},
+        'platform': f"{platform.python_implementation()} {sys.version.split()[0]}",
+    }
+    if app_name is not None:
+        metadata['application'] = {'name': app_name}
+    return metadata
+
+
+def hello_operation(compressors: Collection[str] = (), app_name: Optional[str] = None) -> OpQuery:
+    """
+    Initial hello, sent as OP_QUERY isMaster as the server version is not known yet
+    """
+    query = {'isMaster': 1, 'helloOk': True, 'client': client_metadata(app_name)}
+    if compressors:
+        query['compression'] = list(compressors)
+    return OpQuery(full_collection_name='admin.$cmd', query=query, number_to_return=1)
+
+
+def command_name(operation: BaseOp) -> Optional[str]:
+    """
+    Name of the OP_MSG or OP_QUERY command, None for the other ops
+    """
+    if operation.op_code == OpCode.OP_MSG:
+        body = operation.sections[0]
+        if type(body) is OpMsg.RawBody:
+            # First element name, without decoding the document
+            return bytes(body.raw[5:body.raw.index(0, 5)]).decode()
+        return next(iter(body.data), None)
+    if operation.op_code == OpCode.OP_QUERY:
+        return next(iter(operation.query), None)
+    return None
+
+
+def is_compressible(operation: BaseOp) -> bool:
+    if operation.op_code == OpCode.OP_COMPRESSED:
+        return False
+    if operation.op_code == OpCode.OP_MSG and operation.flag_bits & OpMsg.Flags.CHECKSUM_PRESENT:
+        # OP_COMPRESSED has no room for the checksum, checksummed messages are sent as is
+        return False
+    return command_name(operation) not in UNCOMPRESSED_COMMANDS
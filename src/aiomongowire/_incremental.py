@@ -0,0 +1,352 @@
+import asyncio
+import struct
+from collections import deque
+from typing import Optional, Union, Callable, List, Tuple, Deque
+
+from . import _bson_scanner as scanner
+from ._bson import get_bson_parser
+from ._crc32c import crc32c, InvalidChecksumException
+from ._frame import HEADER_LENGTH
+from ._op_code import OpCode
+from ._op_msg import OpMsg
+from ._spill import SpillFile
+
+_INT32 = struct.Struct('<i')
+_UINT32 = struct.Struct('<I')
+_INT64 = struct.Struct('<q')
+
+# Containers of the reply the parser descends into
+_SECTIONS = 'sections'
+_DOCUMENTS = 'documents'
+_BODY = 'body'
+_CURSOR = 'cursor'
+_BATCH = 'batch'
+
+# (container, element name, element type) entered instead of being decoded as a whole
+_STREAMED_PATH = {
+    (_BODY, b'cursor', scanner.DOCUMENT): _CURSOR,
+    (_CURSOR, b'firstBatch', scanner.ARRAY): _BATCH,
+    (_CURSOR, b'nextBatch', scanner.ARRAY): _BATCH,
+}
+
+
+class DocumentStream:
+    """
+    Documents of a single reply, handed out as soon as each one is received, before the rest of the reply arrives
+
+    Streamed are OP_REPLY documents, OP_MSG document sequences and cursor batches of OP_MSG body.
+    The rest of the reply is decoded into the reply dict, complete once the iteration is over.
+    If the consumer falls behind by max_pending documents, reading from the connection is paused,
+    or with spilling enabled the rest of the documents are written to a temporary file and read back through mmap.
+    Consumer that stops before the end closes the stream, so the rest of the reply does not hold the connection.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, raw: bool = False, max_pending: int = 1024,
+                 spill: bool = False, spill_directory: Optional[str] = None):
+        """
+        :param loop: Event loop of the connection
+        :param raw: Hand out documents as undecoded BSON, bytes or mmap-backed memoryview for the spilled ones
+        :param max_pending: Number of received documents kept in memory, at which reading is paused or spilling starts
+        :param spill: Spill documents to disk instead of pausing reading
+        :param spill_directory: Directory for the spilled documents, system temporary directory if not set
+        """
+        self.raw = raw
+        self.max_pending = max_pending
+        self.spill = spill
+        self.spill_directory = spill_directory
+        self.cursor_id = 0
+        self.reply: dict = {}
+        self.received = 0
+        self.pause_reading: Optional[Callable[[], None]] = None
+        self.resume_reading: Optional[Callable[[], None]] = None
+
+        self._loop = loop
+        self._documents: Deque[Union[bytes, Tuple[int, int]]] = deque()  # document or its spill file offset and size
+        self._in_memory = 0
+        self._spill_file: Optional[SpillFile] = None
+        self._done = False
+        self._exception: Optional[Exception] = None
+        self._waiter: Optional[asyncio.Future] = None
+        self._paused = False
+        self._closed = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __aiter__(self) -> 'DocumentStream':
+        return self
+
+    async def __anext__(self) -> Union[dict, bytes]:
+        while not self._documents:
+            if self._exception is not None:
+                raise self._exception
+            if self._done:
+                raise StopAsyncIteration
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        document = self._documents.popleft()
+        if isinstance(document, tuple):
+            document = self._spill_file.view(*document)
+            if not self._documents:
+                # Nothing else is spilled, the file is freed once the views handed out are released
+                self._spill_file.close()
+                self._spill_file = None
+        else:
+            self._in_memory -= 1
+        if self._in_memory <= self.max_pending // 2:
+            self._resume()
+        return document if self.raw else get_bson_parser().decode_object(document)
+
+    def _wake_up(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _resume(self):
+        if self._paused:
+            self._paused = False
+            if self.resume_reading is not None:
+                self.resume_reading()
+
+    def close(self):
+        """
+        Stops the iteration, documents not consumed yet and the rest of the reply are discarded.
+        Reading from the connection is resumed if the stream has paused it
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._done = True
+        self._documents.clear()
+        self._in_memory = 0
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._resume()
+        self._wake_up()
+
+    async def aclose(self):
+        self.close()
+
+    def feed(self, document: bytes):
+        self.received += 1
+        if self._closed:
+            return
+        if self.spill and (self._in_memory >= self.max_pending or self._spill_file is not None):
+            # Once spilling started documents go to the file until it is drained, to keep them in order
+            if self._spill_file is None:
+                self._spill_file = SpillFile(self.spill_directory)
+            self._documents.append((self._spill_file.write(document), len(document)))
+        else:
+            self._documents.append(document)
+            self._in_memory += 1
+            if not self._paused and not self.spill and self._in_memory >= self.max_pending:
+                self._paused = True
+                if self.pause_reading is not None:
+                    self.pause_reading()
+        self._wake_up()
+
+    def finish(self):
+        self._done = True
+        self._wake_up()
+
+    def set_exception(self, exc: Exception):
+        self._exception = exc
+        self._done = True
+        self._resume()
+        self._wake_up()
+
+
+class IncrementalReply:
+    """
+    Incremental parser of a single OP_REPLY or OP_MSG frame
+
+    Frame data is fed in chunks as it arrives. Only the data of the document being received is kept,
+    complete documents are passed to the stream and dropped from the window right away.
+    """
+
+    def __init__(self, stream: DocumentStream, message_length: int):
+        self.stream = stream
+        self.remaining = message_length  # frame bytes not fed yet
+        self._message_length = message_length
+        self._window = bytearray()
+        self._base = 0  # frame offset of the window start
+        self._offset = 0  # frame offset of the parser
+        self._stack: List[Tuple[str, int]] = []  # (container, frame offset of its end)
+        self._started = False
+        self._checksum = False
+        self._crc = 0
+        self._failed = False
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]):
+        """
+        Adds the next chunk of the frame, no more than the remaining bytes
+        """
+        self.remaining -= len(data)
+        if self._failed:
+            return
+        if self.stream.closed:
+            # Nobody reads the stream, the rest of the frame is skipped
+            self._failed = True
+            self._window.clear()
+            return
+        try:
+            self._window += data
+            self._parse()
+            if not self.remaining:
+                self._finish()
+        except Exception as exc:
+            self.fail(exc)
+
+    def fail(self, exc: Exception):
+        """
+        Fails the stream, the rest of the frame is skipped
+        """
+        self._failed = True
+        self._window.clear()
+        if not self.stream.done:
+            self.stream.set_exception(exc)
+
+    def _available(self, size: int) -> bool:
+        return self._offset + size <= self._base + len(self._window)
+
+    def _parse(self):
+        while self._step():
+            pass
+        consumed = self._offset - self._base
+        if consumed:
+            if self._checksum:
+                self._crc = crc32c(memoryview(self._window)[:consumed], self._crc)
+            del self._window[:consumed]
+            self._base = self._offset
+
+    def _step(self) -> bool:
+        """
+        Parses the next item of the frame
+
+        :return: False if more data is needed
+        """
+        window = self._window
+        position = self._offset - self._base
+        if not self._started:
+            return self._start(window, position)
+        if not self._stack:
+            return False
+
+        container, end = self._stack[-1]
+        if container in (_SECTIONS, _DOCUMENTS):
+            if self._offset == end:
+                self._stack.pop()
+                return True
+            if container == _SECTIONS:
+                return self._section(window, position)
+            if not self._available(4):
+                return False
+            length = _INT32.unpack_from(window, position)[0]
+            if not self._available(length):
+                return False
+            self.stream.feed(bytes(window[position:position + length]))
+            self._offset += length
+            return True
+
+        # Document, the trailing zero is its last byte
+        if self._offset == end - 1:
+            if not self._available(1):
+                return False
+            self._stack.pop()
+            self._offset += 1
+            return True
+        try:
+            name_end = window.index(0, position + 1)
+        except ValueError:
+            return False
+        element_type = window[position]
+        name = bytes(window[position + 1:name_end])
+        value_position = name_end + 1
+        value_offset = self._base + value_position
+
+        nested = _STREAMED_PATH.get((container, name, element_type))
+        if nested is not None:
+            if not self._available(value_position - position + 4):
+                return False
+            self._stack.append((nested, value_offset + _INT32.unpack_from(window, value_position)[0]))
+            self._offset = value_offset + 4
+            return True
+
+        try:
+            size = scanner.value_size(window, element_type, value_position)
+        except (struct.error, ValueError):
+            return False  # length of the value is not received yet
+        if not self._available(value_position - position + size):
+            return False
+        self._offset = value_offset + size
+        if container == _BATCH:
+            if element_type == scanner.DOCUMENT:
+                self.stream.feed(bytes(window[value_position:value_position + size]))
+            return True
+
+        element = window[position:value_position + size]
+        value = get_bson_parser().decode_object(_INT32.pack(len(element) + 5) + element + b'\x00')
+        if container == _CURSOR:
+            self.stream.reply.setdefault('cursor', {}).update(value)
+            if name == b'id':
+                self.stream.cursor_id = scanner.read_int(window, element_type, value_position) or 0
+        else:
+            self.stream.reply.update(value)
+        return True
+
+    def _start(self, window: bytearray, position: int) -> bool:
+        if not self._available(HEADER_LENGTH + 4):
+            return False
+        op_code = _INT32.unpack_from(window, position + 12)[0]
+        if op_code == OpCode.OP_REPLY:
+            if not self._available(HEADER_LENGTH + 20):
+                return False
+            self.stream.cursor_id = _INT64.unpack_from(window, position + HEADER_LENGTH + 4)[0]
+            self._stack.append((_DOCUMENTS, self._message_length))
+            self._offset += HEADER_LENGTH + 20
+        elif op_code == OpCode.OP_MSG:
+            flag_bits = _UINT32.unpack_from(window, position + HEADER_LENGTH)[0]
+            self._checksum = bool(flag_bits & OpMsg.Flags.CHECKSUM_PRESENT)
+            self._stack.append((_SECTIONS, self._message_length - 4 if self._checksum else self._message_length))
+            self._offset += HEADER_LENGTH + 4
+        else:
+            raise ValueError(f"Expected OP_REPLY or OP_MSG reply, got op code {op_code}")
+        self._started = True
+        return True
+
+    def _section(self, window: bytearray, position: int) -> bool:
+        if not self._available(5):
+            return False
+        payload_type = window[position]
+        size = _INT32.unpack_from(window, position + 1)[0]
+        if payload_type == OpMsg.PayloadType.BODY:
+            self._stack.append((_BODY, self._offset + 1 + size))
+            self._offset += 5
+        elif payload_type == OpMsg.PayloadType.DOCUMENTS:
+            try:
+                identifier_end = window.index(0, position + 5)
+            except ValueError:
+                return False
+            self._stack.append((_DOCUMENTS, self._offset + 1 + size))
+            self._offset = self._base + identifier_end + 1
+        else:
+            raise ValueError(f"Unknown section type for OpMsg: {payload_type}")
+        return True
+
+    def _finish(self):
+        if self._stack or not self._started:
+            raise ValueError("Reply ended before its content")
+        if self._checksum:
+            expected = _UINT32.unpack_from(self._window, 0)[0]
+            if expected != self._crc:
+                raise InvalidChecksumException(expected, self._crc)
+        self._window.clear()
+        self.stream.finish()
@@ -0,0 +1,30 @@
+import importlib
+import importlib.util
+from types import ModuleType
+from typing import Optional
+
+
+def is_installed(name: str) -> bool:
+    """
+    True if the top level module can be imported, without importing it
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """
+    Module imported on the first attribute access, for optional dependencies which are slow to import
+    """
+    __slots__ = ['_name', '_module']
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, item: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, item)
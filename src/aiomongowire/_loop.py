@@ -0,0 +1,18 @@
+import asyncio
+from typing import Optional
+
+
+def bind_loop(loop: Optional[asyncio.AbstractEventLoop] = None) -> asyncio.AbstractEventLoop:
+    """
+    Event loop for an object to bind to: the given one, or the running one.
+    get_event_loop is not used, outside a running loop it is deprecated and may return another loop
+    than the one running the object later
+
+    :raises RuntimeError: If no loop is given outside a running loop
+    """
+    if loop is not None:
+        return loop
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        raise RuntimeError("No running event loop, pass the loop to bind to") from None
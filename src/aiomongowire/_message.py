@@ -1,8 +1,18 @@
 import io
+import struct
 
 from ._base_op import BaseOp, parse_op
+from ._codec import unpack_header, pack_header, HEADER_LENGTH
+from ._crc32c import crc32c, InvalidChecksumException
 from ._message_header import MessageHeader
 from ._op_code import OpCode, UnknownOpcodeException
+from ._op_msg import OpMsg
+from ._spill import reader_view, BufferReader
+
+_UINT32 = struct.Struct('<I')
+_CHECKSUM_PRESENT = int(OpMsg.Flags.CHECKSUM_PRESENT)
+# Plain dict lookup, calling the enum is slow for every message
+_OP_CODES = {op_code.value: op_code for op_code in OpCode}
 
 
 class MongoWireMessage:
@@ -19,24 +29,59 @@ class MongoWireMessage:
         self.operation = operation
 
     @classmethod
-    def from_data(cls, data: io.BytesIO) -> 'MongoWireMessage':
+    def from_data(cls, data: io.BytesIO, verify_checksum: bool = True) -> 'MongoWireMessage':
         """
         Deserialize message from bytes
 
+        :param data: Message data, starting from the message length
+        :param verify_checksum: Verify OP_MSG CRC-32C checksum if it is present
         :raises UnknownOpcodeException: If operation has unknown OpCode
+        :raises InvalidChecksumException: If OP_MSG checksum does not match the message
         """
-        message_length = int.from_bytes(data.read(4), byteorder='little', signed=True)
-        header = MessageHeader.from_data(data)
-        op_code_value = int.from_bytes(data.read(4), byteorder='little', signed=True)
-        try:
-            op_code = OpCode(op_code_value)
-        except ValueError:
-            raise UnknownOpcodeException(op_code_value)
-        operation = parse_op(op_code, data)
+        start = data.tell()
+        with reader_view(data) as buffer:
+            message_length, request_id, response_to, op_code_value = unpack_header(buffer, start)
+            op_code = _OP_CODES.get(op_code_value)
+            if op_code is None:
+                raise UnknownOpcodeException(op_code_value)
+            if verify_checksum and op_code == OpCode.OP_MSG:
+                cls._verify_checksum(buffer, start, message_length)
+            end = start + message_length
+            followed = len(buffer) > end
+        header = MessageHeader(request_id=request_id, response_to=response_to)
+        if not followed:
+            data.seek(start + HEADER_LENGTH)
+            return cls(header=header, operation=parse_op(op_code, data))
+        # Ops are read up to the end of the data, the data after the message belongs to the next one
+        reader = BufferReader(reader_view(data)[:end])
+        reader.seek(start + HEADER_LENGTH)
+        operation = parse_op(op_code, reader)
+        data.seek(end)
         return cls(header=header, operation=operation)
 
+    @staticmethod
+    def _verify_checksum(buffer: memoryview, start: int, message_length: int):
+        """
+        Verifies OP_MSG checksum before decoding anything, if the message has one
+        """
+        flag_bits = _UINT32.unpack_from(buffer, start + HEADER_LENGTH)[0]
+        if not flag_bits & _CHECKSUM_PRESENT:
+            return
+        end = start + message_length
+        expected = _UINT32.unpack_from(buffer, end - 4)[0]
+        actual = crc32c(buffer[start:end - 4])
+        if actual != expected:
+            raise InvalidChecksumException(expected, actual)
+
     def __bytes__(self):
         operation_bytes = bytes(self.operation)
+        with_checksum = self.operation.op_code == OpCode.OP_MSG and self.operation.flag_bits & _CHECKSUM_PRESENT
         message_len = len(operation_bytes) + 16
-        message_len = message_len.to_bytes(length=4, byteorder='little', signed=False)
-        return message_len + bytes(self.header) + bytes(self.operation.op_code) + operation_bytes
+        if with_checksum:
+            message_len += 4
+        header = pack_header(message_len, self.header.request_id, self.header.response_to, self.operation.op_code)
+        data = header + operation_bytes
+        if with_checksum:
+            self.operation.checksum = crc32c(data)
+            data += self.operation.checksum.to_bytes(length=4, byteorder='little', signed=False)
+        return data
@@ -1,42 +1,94 @@
 import io
-from typing import Type, ClassVar
+import struct
+from typing import Type, ClassVar, Optional, Union
 
 from ._base_op import BaseOp, parse_op
 from ._compressor import Compressor
 from ._op_code import OpCode
+from ._spill import BufferReader, reader_view
+
+_PREFIX = struct.Struct('<iiB')  # original opcode, uncompressed size, compressor id
 
 
 class OpCompressed(BaseOp):
     """
-    OP_COMPRESSED wraps other opcodes to provide compression
+    OP_COMPRESSED wraps other opcodes to provide compression.
+    Decoded message keeps the compressed payload as a view of the received data, the wrapped op is decompressed and
+    parsed on the first access to original_msg. Until then the message is re-encoded with the payload untouched,
+    so proxies and caches can pass it through without decompressing
     """
-    __slots__ = ['compressor', 'original_msg']
+    __slots__ = ['compressor', '_original_msg', 'compressed', 'original_op_code', 'uncompressed_size']
 
     op_code: ClassVar[OpCode] = OpCode.OP_COMPRESSED
 
-    def __init__(self, compressor: Type[Compressor], original_msg: BaseOp):
+    def __init__(self, compressor: Type[Compressor], original_msg: Optional[BaseOp] = None,
+                 compressed: Optional[memoryview] = None, original_op_code: Optional[OpCode] = None,
+                 uncompressed_size: Optional[int] = None):
+        """
+        :param compressor: Compressor of the payload
+        :param original_msg: Wrapped op, None if it is given by the compressed payload
+        :param compressed: Compressed payload of the wrapped op, not decoded yet
+        :param original_op_code: OpCode of the compressed op
+        :param uncompressed_size: Size of the compressed op once decompressed
+        """
+        if original_msg is None and compressed is None:
+            raise ValueError("Either original message or compressed payload is required")
         self.compressor = compressor
-        self.original_msg = original_msg
+        self._original_msg = original_msg
+        self.compressed = compressed
+        self.original_op_code = original_msg.op_code if original_msg is not None else original_op_code
+        self.uncompressed_size = uncompressed_size
+
+    @property
+    def original_msg(self) -> BaseOp:
+        """
+        Wrapped op. Decompressing and parsing happen on the first access
+        """
+        if self._original_msg is None:
+            decompressed = self.compressor.decompress_sized(self.compressed, self.uncompressed_size)
+            if len(decompressed) != self.uncompressed_size:
+                raise ValueError(f"Decompressed {len(decompressed)} bytes, "
+                                 f"but OP_COMPRESSED declares {self.uncompressed_size}")
+            # BufferReader hands out the decompressed bytes as is, BytesIO.getbuffer would copy them
+            self._original_msg = parse_op(self.original_op_code, BufferReader(memoryview(decompressed)))
+            self.compressed = None
+        return self._original_msg
+
+    @original_msg.setter
+    def original_msg(self, original_msg: BaseOp):
+        self._original_msg = original_msg
+        self.original_op_code = original_msg.op_code
+        self.compressed = None
+
+    @property
+    def is_parsed(self) -> bool:
+        return self._original_msg is not None
 
     @property
     def has_reply(self) -> bool:
         return self.original_msg.has_reply
 
     @classmethod
-    def from_data(cls, data: io.BytesIO):
-        original_opcode = OpCode(int.from_bytes(data.read(4), byteorder='little', signed=False))
-        original_len = data.read(4)
-        compressor = Compressor.by_id(int.from_bytes(data.read(1), byteorder='little', signed=False))
-        compressed = data.read()
-        decompressed = compressor.decompress(compressed)
-        return cls(compressor=compressor, original_msg=parse_op(original_opcode, io.BytesIO(decompressed)))
+    def from_data(cls, data: Union[io.BytesIO, BufferReader]):
+        buffer = reader_view(data)
+        offset = data.tell()
+        if len(buffer) - offset < _PREFIX.size:
+            raise ValueError("Buffer is too short for OP_COMPRESSED")
+        original_opcode, uncompressed_size, compressor_id = _PREFIX.unpack_from(buffer, offset)
+        data.seek(0, io.SEEK_END)
+        return cls(compressor=Compressor.by_id(compressor_id), compressed=buffer[offset + _PREFIX.size:],
+                   original_op_code=OpCode(original_opcode), uncompressed_size=uncompressed_size)
 
     def __bytes__(self):
-        original_bytes = bytes(self.original_msg)
-        compressed = self.compressor.compress(original_bytes)
-        with io.BytesIO() as data:
-            data.write(int.to_bytes(self.original_msg.op_code, length=4, byteorder='little'))
-            data.write(int.to_bytes(len(original_bytes), length=4, byteorder='little'))
-            data.write(int.to_bytes(int(self.compressor.id()), length=1, byteorder='little', signed=False))
-            data.write(compressed)
-            return data.getvalue()
+        if self._original_msg is None:
+            compressed = self.compressed
+            original_len = self.uncompressed_size
+        else:
+            original_bytes = bytes(self._original_msg)
+            compressed = self.compressor.compress(original_bytes)
+            original_len = len(original_bytes)
+        return _PREFIX.pack(self.original_op_code, original_len, int(self.compressor.id())) + compressed
+
+    def __str__(self):
+        return f"OP_COMPRESSED: compressor: {self.compressor.name()}, op: {self.original_op_code!r}, " \
+               f"size: {self.uncompressed_size}"
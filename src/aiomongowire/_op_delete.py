@@ -33,7 +33,7 @@ class OpDelete(BaseOp):
         bson_parser = get_bson_parser()
         data.seek(4, io.SEEK_CUR)  # 0 - reserved for future use
         full_collection_name = bson_parser.decode_cstring(data)  # "dbname.collectionname"
-        flags = int(data.read(4))  # bit vector
+        flags = int.from_bytes(data.read(4), byteorder='little', signed=False)  # bit vector
         selector = bson_parser.decode_object(data)  # query object.
         return cls(full_collection_name=full_collection_name, flags=flags, selector=selector)
 
@@ -27,14 +27,16 @@ class OpGetMore(BaseOp):
     def from_data(cls, data: io.BytesIO) -> 'OpGetMore':
         data.seek(4, io.SEEK_CUR)  # 0 - reserved for future use
         full_collection_name = get_bson_parser().decode_cstring(data)  # "dbname.collectionname"
-        number_to_return = int(data.read(4))  # number of documents to return
-        cursor_id = int(data.read(8))  # cursorID from the OP_REPLY
+        # number of documents to return
+        number_to_return = int.from_bytes(data.read(4), byteorder='little', signed=True)
+        # cursorID from the OP_REPLY
+        cursor_id = int.from_bytes(data.read(8), byteorder='little', signed=True)
         return cls(full_collection_name=full_collection_name, number_to_return=number_to_return, cursor_id=cursor_id)
 
     def __bytes__(self):
         with io.BytesIO() as data:
             data.write(int.to_bytes(0, length=4, byteorder='little'))
             data.write(get_bson_parser().encode_cstring(self.full_collection_name))
-            data.write(int.to_bytes(self.number_to_return, length=4, byteorder='little', signed=False))
-            data.write(int.to_bytes(self.cursor_id, length=8, byteorder='little', signed=False))
+            data.write(int.to_bytes(self.number_to_return, length=4, byteorder='little', signed=True))
+            data.write(int.to_bytes(self.cursor_id, length=8, byteorder='little', signed=True))
             return data.getvalue()
@@ -3,7 +3,7 @@ from enum import IntFlag
 from typing import ClassVar
 
 from ._base_op import BaseOp
-from ._bson import get_bson_parser
+from ._bson import get_bson_parser, read_document
 from ._op_code import OpCode
 
 
@@ -33,8 +33,13 @@ class OpInsert(BaseOp):
     @classmethod
     def from_data(cls, data: io.BytesIO):
         flags = int.from_bytes(data.read(4), byteorder='little', signed=True)  # bit vector
-        full_collection_name = get_bson_parser().decode_cstring(data)  # "dbname.collectionname"
-        documents = get_bson_parser().decode_object(data)  # one or more documents to insert into the collection
+        parser = get_bson_parser()
+        full_collection_name = parser.decode_cstring(data)  # "dbname.collectionname"
+        # one or more documents to insert into the collection, up to the message end
+        documents = []
+        while data.read(1):
+            data.seek(-1, io.SEEK_CUR)
+            documents.append(parser.decode_object(read_document(data)))
         return cls(flags=flags, full_collection_name=full_collection_name, documents=documents)
 
     def __bytes__(self):
@@ -1,4 +1,5 @@
 import io
+import struct
 from typing import List, ClassVar
 
 from ._base_op import BaseOp
@@ -26,9 +27,12 @@ class OpKillCursors(BaseOp):
         data.seek(4, io.SEEK_CUR)  # 0 - reserved for future use
         # number of cursorIDs in message
         number_of_cursor_ids = int.from_bytes(data.read(4), byteorder='little', signed=True)
-        # sequence of cursorIDs to close
-        cursor_ids = [int.from_bytes(data.read(8), byteorder='little', signed=True)
-                      for _ in range(number_of_cursor_ids)]
+        # sequence of cursorIDs to close, the count is checked against the data so corrupt one fails fast
+        cursor_ids_data = data.read(8 * number_of_cursor_ids) if number_of_cursor_ids > 0 else b''
+        if number_of_cursor_ids < 0 or len(cursor_ids_data) != 8 * number_of_cursor_ids:
+            raise ValueError(f"OP_KILL_CURSORS declares {number_of_cursor_ids} cursors, "
+                             f"but has data for {len(cursor_ids_data) // 8}")
+        cursor_ids = list(struct.unpack(f'<{number_of_cursor_ids}q', cursor_ids_data))
         return cls(number_of_cursor_ids=number_of_cursor_ids, cursor_ids=cursor_ids)
 
     def __bytes__(self):
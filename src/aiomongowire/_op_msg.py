@@ -1,10 +1,12 @@
 import io
 from enum import IntEnum, IntFlag
-from typing import SupportsBytes, List, ClassVar
+from typing import SupportsBytes, List, ClassVar, Union
 
 from ._base_op import BaseOp
 from ._bson import get_bson_parser
+from ._codec import walk_sections
 from ._op_code import OpCode
+from ._spill import reader_view
 
 
 class OpMsg(BaseOp):
@@ -26,6 +28,7 @@ class OpMsg(BaseOp):
         """
         Generic section
         """
+        __slots__ = ['payload_type']
 
         def __init__(self, payload_type: 'OpMsg.PayloadType'):
             self.payload_type = payload_type
@@ -37,6 +40,7 @@ class OpMsg(BaseOp):
         """
         Body section. Should contain a single document with op name, db name and write concert
         """
+        __slots__ = ['data']
 
         def __init__(self, data: dict):
             super().__init__(OpMsg.PayloadType.BODY)
@@ -63,10 +67,42 @@ class OpMsg(BaseOp):
         def __str__(self):
             return str(self.data)
 
+    class RawBody(Body):
+        """
+        Body section holding already encoded document. Document is decoded only when data is accessed
+        """
+        __slots__ = ['raw', '_data']
+
+        def __init__(self, raw: Union[bytes, bytearray]):
+            self.payload_type = OpMsg.PayloadType.BODY
+            self.raw = raw
+            self._data = None
+
+        @property
+        def data(self) -> dict:
+            if self._data is None:
+                self._data = get_bson_parser().decode_object(bytes(self.raw))
+            return self._data
+
+        @data.setter
+        def data(self, value: dict):
+            self.raw = get_bson_parser().encode_object(value)
+            self._data = value
+
+        def __bytes__(self) -> bytes:
+            return b'\x00' + self.raw  # payload type 0
+
+        @classmethod
+        def from_data(cls, data: io.BytesIO) -> 'OpMsg.RawBody':
+            len_bytes = data.read(4)
+            data_len = int.from_bytes(len_bytes, byteorder='little')
+            return cls(len_bytes + data.read(data_len - 4))
+
     class Insert(Body):
         """
         Insert op body
         """
+        __slots__ = ()
 
         def __init__(self, db: str, collection: str):
             super().__init__({"insert": collection, "$db": db})
@@ -79,6 +115,7 @@ class OpMsg(BaseOp):
         """
         Update op body
         """
+        __slots__ = ()
 
         def __init__(self, db: str, collection: str):
             super().__init__({"update": collection, "$db": db})
@@ -91,6 +128,7 @@ class OpMsg(BaseOp):
         """
         Delete op body
         """
+        __slots__ = ()
 
         def __init__(self, db: str, collection: str):
             super().__init__({"delete": collection, "$db": db})
@@ -112,57 +150,107 @@ class OpMsg(BaseOp):
             self.documents = documents or []
 
         def __bytes__(self):
-            with io.BytesIO() as data:
-                data.write(get_bson_parser().encode_cstring(self.identifier))
-                for doc in self.documents:
-                    data.write(get_bson_parser().encode_object(doc))
-                data = data.getvalue()
-                self.size = len(data) + 4
+            parser = get_bson_parser()
+            data = [parser.encode_cstring(self.identifier)]
+            data.extend(parser.encode_object(doc) for doc in self.documents)
+            self.size = sum(len(chunk) for chunk in data) + 4
+
+            payload_type = int.to_bytes(self.payload_type, length=1, byteorder='little')
+            size = self.size.to_bytes(length=4, byteorder='little', signed=True)
+            return b''.join([payload_type, size] + data)
 
-                payload_type = int.to_bytes(self.payload_type, length=1, byteorder='little')
-                size = self.size.to_bytes(length=4, byteorder='little', signed=True)
-                return payload_type + size + data
+        @classmethod
+        def from_data(cls, data: io.BytesIO) -> 'OpMsg.Document':
+            size = int.from_bytes(data.read(4), byteorder='little', signed=True)
+            payload = data.read(size - 4)
+            identifier_end = payload.index(b'\x00')
+            identifier = payload[:identifier_end].decode()
+            documents = []
+            offset = identifier_end + 1
+            while offset < len(payload):
+                doc_len = int.from_bytes(payload[offset:offset + 4], byteorder='little', signed=True)
+                documents.append(get_bson_parser().decode_object(payload[offset:offset + doc_len]))
+                offset += doc_len
+            return cls(size=size, identifier=identifier, documents=documents)
 
         def __str__(self):
             return f"Identifier: {self.identifier}, Data: {str(self.documents)}"
 
+    class RawDocument(Document):
+        """
+        Documents section holding already encoded documents. Documents are decoded only when accessed
+        """
+        __slots__ = ['raw']
+
+        def __init__(self, identifier: str, raw: List[Union[bytes, bytearray]]):
+            self.payload_type = OpMsg.PayloadType.DOCUMENTS
+            self.identifier = identifier
+            self.raw = raw
+            self.size = 0
+
+        @property
+        def documents(self) -> List[dict]:
+            parser = get_bson_parser()
+            return [parser.decode_object(bytes(document)) for document in self.raw]
+
+        def __bytes__(self):
+            identifier = get_bson_parser().encode_cstring(self.identifier)
+            self.size = sum(len(document) for document in self.raw) + len(identifier) + 4
+            return b''.join([b'\x01', self.size.to_bytes(length=4, byteorder='little', signed=True), identifier]
+                            + self.raw)  # payload type 1
+
     class Flags(IntFlag):
         CHECKSUM_PRESENT = 1 << 0  # The message ends with 4 bytes containing a CRC-32C checksum
         MORE_TO_COME = 1 << 1  # Another message will follow this one without further action from the receiver
         EXHAUST_ALLOWED = 1 << 16  # The client is prepared for multiple replies to this request using the moreToCome
 
     def __init__(self, sections: List[Section], checksum: int = None, flag_bits: int = 0):
+        """
+        :param sections: Message sections, body first
+        :param checksum: CRC-32C checksum, only used if CHECKSUM_PRESENT flag is set.
+            It covers the whole message, so it is calculated and written by MongoWireMessage
+        :param flag_bits: Message flags
+        """
         self.flag_bits = flag_bits
         self.sections = sections
         self.checksum = checksum
 
     @property
     def has_reply(self) -> bool:
-        return True
+        return not self.flag_bits & OpMsg.Flags.MORE_TO_COME
 
     @classmethod
     def from_data(cls, data: io.BytesIO):
         flag_bits = int.from_bytes(data.read(4), byteorder='little', signed=False)  # uint32, message flags
-
-        sections = {}
-        next_section = int.from_bytes(data.read(1), byteorder='little', signed=True)
-        if next_section == OpMsg.PayloadType.BODY:
-            sections[OpMsg.PayloadType.BODY] = OpMsg.Body.from_data(data)
-        elif next_section == OpMsg.PayloadType.DOCUMENTS:
-            sections[OpMsg.PayloadType.DOCUMENTS] = OpMsg.Document.from_data(data)
-        else:
-            raise ValueError(f"Unknown section type for OpMsg: {next_section}")
-        checksum = int.from_bytes(data.read(4), byteorder='little', signed=False)  # optional CRC-32C checksum
-        return cls(flag_bits=flag_bits, sections=list(sections.values()), checksum=checksum)
+        parser = get_bson_parser()
+        sections = []
+        has_checksum = flag_bits & _CHECKSUM_PRESENT
+        with reader_view(data) as buffer:
+            sections_end = len(buffer)
+            if has_checksum:
+                sections_end -= 4
+            for payload_type, size, identifier, documents in walk_sections(buffer, data.tell(), sections_end):
+                if payload_type == OpMsg.PayloadType.BODY:
+                    start, end = documents[0]
+                    sections.append(OpMsg.Body(parser.decode_object(bytes(buffer[start:end]))))
+                else:
+                    sections.append(OpMsg.Document(size=size, identifier=identifier, documents=[
+                        parser.decode_object(bytes(buffer[start:end])) for start, end in documents]))
+        data.seek(sections_end)
+
+        checksum = None
+        if has_checksum:
+            checksum = int.from_bytes(data.read(4), byteorder='little', signed=False)  # CRC-32C checksum
+        return cls(flag_bits=flag_bits, sections=sections, checksum=checksum)
 
     def __bytes__(self):
-        with io.BytesIO() as data:
-            data.write(self.flag_bits.to_bytes(length=4, byteorder='little', signed=False))
-            for section in self.sections:
-                data.write(bytes(section))
-            if self.checksum:
-                data.write(self.checksum.to_bytes(length=4, byteorder='little', signed=False))
-            return data.getvalue()
+        data = [self.flag_bits.to_bytes(length=4, byteorder='little', signed=False)]
+        data.extend(bytes(section) for section in self.sections)
+        return b''.join(data)
 
     def __str__(self):
         return f"{[str(s) for s in self.sections]}"
+
+
+# Plain int, bitwise operations with the flag enum are slow
+_CHECKSUM_PRESENT = int(OpMsg.Flags.CHECKSUM_PRESENT)
@@ -53,10 +53,10 @@ class OpQuery(BaseOp):
         # query object
         query = get_bson_parser().decode_object(data)
 
-        data_left = data.getvalue()
-        if data_left:
+        if data.read(1):
             # Optional. Selector indicating the fields to return.
-            return_fields_selector = get_bson_parser().decode_object(data_left)
+            data.seek(-1, io.SEEK_CUR)
+            return_fields_selector = get_bson_parser().decode_object(data)
         else:
             return_fields_selector = None
 
@@ -71,6 +71,6 @@ class OpQuery(BaseOp):
             data.write(int.to_bytes(self.number_to_skip, length=4, byteorder='little', signed=True))
             data.write(int.to_bytes(self.number_to_return, length=4, byteorder='little', signed=True))
             data.write(get_bson_parser().encode_object(self.query))
-            if self.return_fields_selector:
+            if self.return_fields_selector is not None:
                 data.write(get_bson_parser().encode_object(self.return_fields_selector))
             return data.getvalue()
@@ -4,7 +4,9 @@ from typing import List, ClassVar
 
 from ._base_op import BaseOp
 from ._bson import get_bson_parser
+from ._codec import unpack_reply
 from ._op_code import OpCode
+from ._spill import reader_view
 
 
 class OpReply(BaseOp):
@@ -37,19 +39,14 @@ class OpReply(BaseOp):
 
     @classmethod
     def from_data(cls, data: io.BytesIO):
-        response_flags = OpReply.Flags(int.from_bytes(data.read(4), byteorder='little', signed=True))  # bit vector
-        # cursor id if client needs to do get more's
-        cursor_id = int.from_bytes(data.read(8), byteorder='little', signed=True)
-        # where in the cursor this reply is starting
-        starting_from = int.from_bytes(data.read(4), byteorder='little', signed=True)
-        # number of documents in the reply
-        number_returned = int.from_bytes(data.read(4), byteorder='little', signed=True)
-
-        documents = []
-        for _ in range(number_returned):
-            len_bytes = data.read(4)
-            doc_len = int.from_bytes(len_bytes, byteorder='little', signed=False)
-            documents.append(get_bson_parser().decode_object(len_bytes + data.read(doc_len - 4)))
+        offset = data.tell()
+        with reader_view(data) as buffer:
+            response_flags, cursor_id, starting_from, number_returned, bounds = unpack_reply(buffer, offset,
+                                                                                             len(buffer))
+            parser = get_bson_parser()
+            documents = [parser.decode_object(bytes(buffer[start:end])) for start, end in bounds]
+        data.seek(bounds[-1][1] if bounds else offset + 20)
+        response_flags = OpReply.Flags(response_flags)  # bit vector
         return cls(
             response_flags=response_flags,
             cursor_id=cursor_id,
@@ -62,4 +59,11 @@ class OpReply(BaseOp):
         return f"OP_REPLY: flags: {self.response_flags}, cursor id: {self.cursor_id}, documents: {self.documents}"
 
     def __bytes__(self):
-        raise NotImplementedError()
+        with io.BytesIO() as data:
+            data.write(int.to_bytes(self.response_flags, length=4, byteorder='little', signed=True))
+            data.write(int.to_bytes(self.cursor_id, length=8, byteorder='little', signed=True))
+            data.write(int.to_bytes(self.starting_from, length=4, byteorder='little', signed=True))
+            data.write(int.to_bytes(len(self.documents), length=4, byteorder='little', signed=True))
+            for doc in self.documents:
+                data.write(get_bson_parser().encode_object(doc))
+            return data.getvalue()
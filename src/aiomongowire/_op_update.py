@@ -33,7 +33,7 @@ class OpUpdate(BaseOp):
     def from_data(cls, data: io.BytesIO) -> 'OpUpdate':
         data.seek(4, io.SEEK_CUR)  # 0 - reserved for future use
         full_collection_name = get_bson_parser().decode_cstring(data)  # "dbname.collectionname"
-        flags = int(data.read(4))  # bit vector
+        flags = int.from_bytes(data.read(4), byteorder='little', signed=False)  # bit vector
         selector = get_bson_parser().decode_object(data)  # the query to select the document
         update = get_bson_parser().decode_object(data)  # specification of the update to perform
 
@@ -0,0 +1,99 @@
+import asyncio
+from typing import List, Callable, Optional, Awaitable, Collection
+
+from ._frame import RawFrame
+from ._message import MongoWireMessage
+from ._protocol import MongoWireProtocol
+from ._scheduler import DEFAULT_LANE
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of connections to a single host
+
+    Requests are not bound to the connection, each one goes to the connection with the least pending requests
+    """
+
+    def __init__(self, host: str, port: int = 27017, size: int = 4,
+                 protocol_factory: Callable[[], MongoWireProtocol] = MongoWireProtocol, handshake: bool = False,
+                 compressors: Collection[str] = (), app_name: Optional[str] = None, **connection_kwargs):
+        """
+        :param host: Server host
+        :param port: Server port
+        :param size: Number of connections
+        :param protocol_factory: Factory for the connections
+        :param handshake: Do the handshake on every new connection before it is used, see MongoWireProtocol.handshake
+        :param compressors: Compressors to negotiate in the handshake, in the order of preference
+        :param app_name: Application name sent in the handshake
+        :param connection_kwargs: Passed to loop.create_connection
+        """
+        self.host = host
+        self.port = port
+        self.size = size
+        self.handshake = handshake or bool(compressors)
+        self.compressors = compressors
+        self.app_name = app_name
+        self._protocol_factory = protocol_factory
+        self._connection_kwargs = connection_kwargs
+        self._transports: List[asyncio.BaseTransport] = []
+        self._protocols: List[MongoWireProtocol] = []
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def connected(self) -> bool:
+        return any(protocol.connected for protocol in self._protocols)
+
+    async def connect(self):
+        """
+        Opens missing connections and replaces the lost ones
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            alive = [(t, p) for t, p in zip(self._transports, self._protocols) if p.connected]
+            self._transports = [t for t, _ in alive]
+            self._protocols = [p for _, p in alive]
+            loop = asyncio.get_running_loop()
+            while len(self._protocols) < self.size:
+                transport, protocol = await loop.create_connection(self._protocol_factory, self.host, self.port,
+                                                                   **self._connection_kwargs)
+                if self.handshake:
+                    try:
+                        await protocol.handshake(self.compressors, self.app_name)
+                    except Exception:
+                        transport.close()
+                        raise
+                self._transports.append(transport)
+                self._protocols.append(protocol)
+
+    def get(self) -> MongoWireProtocol:
+        """
+        Returns connected protocol with the least pending requests
+
+        :raises ConnectionError: If there are no live connections
+        """
+        best = None
+        for protocol in self._protocols:
+            if protocol.connected and (best is None or protocol.pending < best.pending):
+                best = protocol
+        if best is None:
+            raise ConnectionError(f"No connections to {self.host}:{self.port}")
+        return best
+
+    def send_data(self, data: MongoWireMessage, lane: str = DEFAULT_LANE) -> Awaitable[MongoWireMessage]:
+        """
+        Sends message through the least busy connection, see MongoWireProtocol.send_data
+        """
+        return self.get().send_data(data, lane)
+
+    def send_frame(self, frame: RawFrame) -> Awaitable[Optional[RawFrame]]:
+        """
+        Sends undecoded frame through the least busy connection, see MongoWireProtocol.send_frame
+        """
+        return self.get().send_frame(frame)
+
+    def close(self):
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+        self._protocols.clear()
@@ -1,11 +1,30 @@
 import asyncio
-import io
 import logging
+import random
 import traceback
 from asyncio import transports, Future
-from typing import Optional, Dict, Awaitable
+from typing import Optional, Dict, Awaitable, List, Type, Collection
 
+from ._buffer_pool import BufferPool, MessagePool
+from ._cache import ReplyCache
+from ._capture import CaptureWriter
+from ._compressor import Compressor
+from ._cursors import CursorRegistry
+from ._frame import FrameBuffer, RawFrame, InvalidFrameException
+from ._handshake import ConnectionSettings, HandshakeException, hello_operation, is_compressible
+from ._incremental import DocumentStream, IncrementalReply
+from ._loop import bind_loop
 from ._message import MongoWireMessage
+from ._op_code import OpCode
+from ._op_compressed import OpCompressed
+from ._op_msg import OpMsg
+from ._scheduler import SendScheduler, Lane, DEFAULT_LANE, split_write, is_ordered, merge_write_replies, \
+    part_sizes
+from ._single_flight import SingleFlight
+
+
+# Size of the buffered unacknowledged writes at which they are written without waiting for the loop iteration end
+UNACKNOWLEDGED_FLUSH_SIZE = 256 * 1024
 
 
 class MongoWireProtocol(asyncio.Protocol):
@@ -15,68 +34,466 @@ class MongoWireProtocol(asyncio.Protocol):
     See https://docs.mongodb.com/manual/reference/mongodb-wire-protocol
     """
 
-    def __init__(self):
+    def __init__(self, reply_cache: Optional[ReplyCache] = None, single_flight: Optional[SingleFlight] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None, buffer_pool: Optional[BufferPool] = None,
+                 message_pool: Optional[MessagePool] = None, spill_threshold: Optional[int] = None,
+                 spill_directory: Optional[str] = None, capture: Optional[CaptureWriter] = None,
+                 lanes: Collection[Lane] = (), split_size: Optional[int] = None, max_write_size: int = 1024 * 1024):
+        """
+        :param reply_cache: Optional cache for the replies to idempotent commands, can be shared between connections
+        :param single_flight: Optional coalescing of identical concurrent read commands
+        :param loop: Event loop to bind to, the running one by default, required outside a running loop.
+            Futures and tasks are created by the loop itself, so loops like uvloop can use their own implementations
+        :param buffer_pool: Optional pool for the send buffers, can be shared between connections of the same loop
+        :param message_pool: Optional pool the sent messages are released to once encoded.
+            Messages passed to send_data then belong to the protocol and must not be reused by the caller
+        :param spill_threshold: Reply length from which replies are buffered in a temporary file instead of memory
+        :param spill_directory: Directory for the spilled replies and streams, system temporary directory if not set
+        :param capture: Optional recorder of the sent and received frames. Streamed replies are not recorded
+        :param lanes: Lanes with their priority and weight, requests are sent in their order, see SendScheduler.
+            Requests go to the default lane unless they name another one
+        :param split_size: Size of the insert, update and delete document sequences from which they are split
+            into several commands, so requests of the other lanes can be sent in between
+        :param max_write_size: Bytes of the queued messages written at once. The rest stays queued, and so can be
+            overtaken by the requests of the higher lanes, until the transport drains
+        """
         self.connected: bool = False
+        self.reply_cache = reply_cache
+        self.single_flight = single_flight
+        self.buffer_pool = buffer_pool
+        self.message_pool = message_pool
+        self.spill_directory = spill_directory
+        self.capture = capture
+        self.settings: Optional[ConnectionSettings] = None  # set by the handshake
+        self._cursors: Optional[CursorRegistry] = None
+        self.split_size = split_size
+        self.max_write_size = max_write_size
+
+        self._loop = bind_loop(loop)
+        self._send_task: Optional[asyncio.Task] = None
 
         self._transport: Optional[asyncio.Transport] = None
-        self._msg_queue: asyncio.Queue[Optional[MongoWireMessage]] = asyncio.Queue()
+        self._scheduler: SendScheduler[Optional[MongoWireMessage]] = SendScheduler(lanes, loop=self._loop)
         self._out_data: Dict[int, Future[MongoWireMessage]] = dict()
+        self._raw_out_data: Dict[int, Future[RawFrame]] = dict()
+        self._streams: Dict[int, DocumentStream] = dict()
+        self._frames = FrameBuffer(incremental_factory=self._incremental_reply, spill_threshold=spill_threshold,
+                                   spill_directory=spill_directory)
+        self._held_buffers: List[bytearray] = []  # pooled buffers possibly still referenced by the transport
+        self._last_request_id = random.randint(0, 1 << 30)
+        self._unacknowledged = bytearray()  # unacknowledged writes waiting for the flush
+        self._write_paused = False
+        self._drain_waiter: Optional[Future] = None
+        # Shared by all the requests without a reply, so they do not allocate a future each
+        self._no_reply: Future = self._loop.create_future()
+        self._no_reply.set_result(None)
         self._logger = logging.getLogger('aiomongowire')
 
-    def send_data(self, data: MongoWireMessage) -> Awaitable[MongoWireMessage]:
+    @property
+    def pending(self) -> int:
+        """
+        Number of requests waiting for the reply
+        """
+        return len(self._out_data) + len(self._raw_out_data) + len(self._streams)
+
+    @property
+    def scheduler(self) -> SendScheduler:
+        """
+        Queue of the messages to send, with the queue wait statistics by lane
+        """
+        return self._scheduler
+
+    @property
+    def cursors(self) -> CursorRegistry:
+        """
+        Open cursors of the connection, the abandoned ones are killed in batches through it
+        """
+        if self._cursors is None:
+            self._cursors = CursorRegistry(self.send_data, loop=self._loop)
+        return self._cursors
+
+    @property
+    def compressor(self) -> Optional[Type[Compressor]]:
+        """
+        Compressor agreed on by the handshake, outgoing messages are compressed with it
+        """
+        return self.settings.compressor if self.settings is not None else None
+
+    async def handshake(self, compressors: Collection[str] = (), app_name: Optional[str] = None) -> ConnectionSettings:
+        """
+        Sends the initial hello with the client metadata and the compressors to negotiate,
+        and keeps the server limits and the agreed compressor in settings.
+        The BSON package and the agreed compressor are loaded here, so the first request does not wait for them.
+        Once a compressor is agreed on, messages are sent compressed, except the ones the specification forbids,
+        and compressed replies are unwrapped
+
+        :param compressors: Compressor names in the order of preference, see Compressor.compressor_names
+        :param app_name: Application name, shown in the server logs
+        :raises HandshakeException: If the server rejects the hello
+        """
+        available = Compressor.compressor_names()
+        if not available.issuperset(compressors):
+            raise ValueError(f"Unknown compressors {sorted(set(compressors) - available)}, "
+                             f"available: {sorted(available)}")
+        reply = await self.send_data(MongoWireMessage(operation=hello_operation(compressors, app_name)))
+        hello = reply.operation.documents[0] if reply.operation.documents else {}
+        if hello.get('ok') != 1:
+            raise HandshakeException(hello)
+        settings = ConnectionSettings(hello, compressors)
+        if settings.compressor is not None:
+            settings.compressor.warm_up()
+        self._frames.max_message_size = settings.max_message_size_bytes
+        self.settings = settings
+        return settings
+
+    def send_data(self, data: MongoWireMessage, lane: str = DEFAULT_LANE) -> Awaitable[MongoWireMessage]:
         """
         Adds data to the sending queue and returns future.
         If the OP is not supposed to return anything, future is returned completed with None inside
 
         :param data: Data to send
+        :param lane: Lane of the sending queue
         :return: Response future
         """
-        future = Future()
+        if self.reply_cache is not None and self.reply_cache.is_cacheable(data.operation):
+            return self._loop.create_task(self.reply_cache.send(data, self.send_frame))
+        if self.single_flight is not None:
+            key = self.single_flight.key(data.operation)
+            if key is not None:
+                return self._loop.create_task(self.single_flight.send(key, data, lambda d: self._send_data(d, lane)))
+        if self.split_size is not None:
+            parts = split_write(data, self.split_size)
+            if parts is not None:
+                return self._loop.create_task(self._send_parts(data, parts, lane))
+        return self._send_data(data, lane)
+
+    def _send_data(self, data: MongoWireMessage, lane: str = DEFAULT_LANE) -> Awaitable[MongoWireMessage]:
         if data.operation.has_reply:
+            future = self._loop.create_future()
             self._out_data[data.header.request_id] = future
         else:
-            future.set_result(None)
-        asyncio.ensure_future(self._msg_queue.put(data))
+            future = self._no_reply
+        self._scheduler.put_nowait(data, lane)
+        return future
+
+    async def _send_parts(self, data: MongoWireMessage, parts: List[MongoWireMessage], lane: str) -> MongoWireMessage:
+        """
+        Sends the parts of the split write and merges their replies.
+        Ordered parts are sent one by one, and the ones after a failed write are not sent, as the server would skip
+        the rest of the ordered command
+        """
+        sizes = part_sizes(parts)
+        if not is_ordered(data):
+            replies = await asyncio.gather(*[self._send_data(part, lane) for part in parts])
+            return merge_write_replies(replies, sizes, data)
+        replies = []
+        for part in parts:
+            reply = await self._send_data(part, lane)
+            replies.append(reply)
+            result = reply.operation.sections[0].data
+            if result.get('ok') != 1 or result.get('writeErrors'):
+                break
+        return merge_write_replies(replies, sizes, data)
+
+    def send_unacknowledged(self, data: MongoWireMessage):
+        """
+        Writes unacknowledged write bypassing the sending queue, no future is created.
+        OP_MSG is sent with MORE_TO_COME flag so the server does not reply, and with w:0 write concern if it has none.
+        Writes made during one event loop iteration go to the transport together, or as soon as they exceed
+        UNACKNOWLEDGED_FLUSH_SIZE. They are paced only by the transport, await drain() to follow its backpressure.
+        Writes can overtake the messages still waiting in the sending queue. Writes still queued when the connection
+        is lost are dropped with a warning
+
+        :param data: Write to send, OP_MSG or legacy OP_INSERT, OP_UPDATE, OP_DELETE. It is left as is,
+            OP_MSG flags and write concern are set on a copy
+        :raises ValueError: If the operation expects a reply or its write concern is acknowledged
+        :raises ConnectionError: If not connected
+        """
+        operation = data.operation
+        if isinstance(operation, OpMsg):
+            body = operation.sections[0]
+            if body.payload_type == OpMsg.PayloadType.BODY:
+                write_concern = body.data.get('writeConcern')
+                if write_concern is None:
+                    body = OpMsg.Body(dict(body.data, writeConcern={'w': 0}))
+                elif write_concern.get('w') != 0:
+                    raise ValueError(f"Unacknowledged write can't have write concern {write_concern}")
+            operation = OpMsg(sections=[body] + operation.sections[1:], checksum=operation.checksum,
+                              flag_bits=operation.flag_bits | OpMsg.Flags.MORE_TO_COME)
+            data = MongoWireMessage(operation=operation, header=data.header)
+        elif operation.has_reply:
+            raise ValueError(f"{type(operation).__name__} is not an unacknowledged write")
+        if not self.connected:
+            raise ConnectionError("Not connected")
+        if not self._unacknowledged:
+            self._loop.call_soon(self._flush_unacknowledged)
+        self._unacknowledged += self._encode(data)
+        if len(self._unacknowledged) >= UNACKNOWLEDGED_FLUSH_SIZE:
+            self._flush_unacknowledged()
+
+    def _flush_unacknowledged(self):
+        # Writes queued when the connection was lost are dropped by connection_lost
+        if not self._unacknowledged or not self.connected:
+            return
+        data = bytes(self._unacknowledged)
+        self._unacknowledged.clear()
+        self._transport.write(data)
+        if self.capture is not None:
+            self.capture.sent(data)
+
+    async def drain(self):
+        """
+        Waits until the transport write buffer drops below its low water mark, if it is above the high one
+
+        :raises ConnectionError: If the connection is lost while waiting
+        """
+        if not self._write_paused:
+            return
+        if self._drain_waiter is None:
+            self._drain_waiter = self._loop.create_future()
+        await asyncio.shield(self._drain_waiter)
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        if self._drain_waiter is not None:
+            if not self._drain_waiter.done():
+                self._drain_waiter.set_result(None)
+            self._drain_waiter = None
+
+    def send_streaming(self, data: MongoWireMessage, raw: bool = False, max_pending: int = 1024,
+                       spill: bool = False, lane: str = DEFAULT_LANE) -> DocumentStream:
+        """
+        Adds data to the sending queue and returns stream of the reply documents.
+        Documents are handed out as soon as each one is received, while the rest of the reply is still arriving,
+        the reply itself is never buffered as a whole. Reading from the connection is paused
+        while the stream has max_pending documents not consumed yet, unless the documents are spilled to disk
+
+        :param data: Data to send, the operation should have a reply
+        :param raw: Hand out documents as undecoded BSON bytes
+        :param max_pending: Number of received documents not consumed yet, at which reading is paused
+        :param spill: Write documents above max_pending to a temporary file instead of pausing reading
+        :param lane: Lane of the sending queue
+        :return: Reply documents stream
+        """
+        if not data.operation.has_reply:
+            raise ValueError("Only operations with a reply can be streamed")
+        stream = DocumentStream(self._loop, raw=raw, max_pending=max_pending, spill=spill,
+                                spill_directory=self.spill_directory)
+        if self._transport is not None:
+            stream.pause_reading = self._transport.pause_reading
+            stream.resume_reading = self._transport.resume_reading
+        self._streams[data.header.request_id] = stream
+        self._scheduler.put_nowait(data, lane)
+        return stream
+
+    def _incremental_reply(self, response_to: int, message_length: int) -> Optional[IncrementalReply]:
+        if not self._streams:
+            return None
+        stream = self._streams.pop(response_to, None)
+        return IncrementalReply(stream, message_length) if stream is not None else None
+
+    def send_frame(self, frame: RawFrame) -> Awaitable[Optional[RawFrame]]:
+        """
+        Writes undecoded frame to the transport and returns future with the undecoded reply.
+        Request id of the frame is replaced with the one unique for this connection,
+        so frames coming from different clients can share it.
+        If the frame is not supposed to have a reply, future is returned completed with None inside
+
+        :param frame: Frame to send
+        :return: Response future
+        """
+        frame.request_id = self._next_request_id()
+        if frame.has_reply:
+            future = self._loop.create_future()
+            self._raw_out_data[frame.request_id] = future
+        else:
+            future = self._no_reply
+        try:
+            self._transport.write(frame.data)
+            if self.capture is not None:
+                self.capture.sent(frame.data)
+        except Exception as exc:
+            self._logger.error(traceback.format_exc())
+            self._raw_out_data.pop(frame.request_id, None)
+            if not future.done():
+                future.set_exception(exc)
         return future
 
+    def _next_request_id(self) -> int:
+        request_id = self._last_request_id
+        while True:
+            request_id = (request_id + 1) & 0x7fffffff
+            if request_id not in self._raw_out_data and request_id not in self._out_data \
+                    and request_id not in self._streams:
+                break
+        self._last_request_id = request_id
+        return request_id
+
     async def _send_loop(self):
         """
-        Data sending loop
+        Data sending loop. Queued messages are taken in the scheduler order and written together,
+        up to max_write_size bytes at once. While the transport is paused the loop waits for it to drain,
+        so the messages queued meanwhile are still ordered by their lanes
         """
+        scheduler = self._scheduler
         while self.connected:
             try:
-                data = await self._msg_queue.get()
+                if self._write_paused:
+                    await self.drain()
+                lane, data = await scheduler.get()
             except asyncio.CancelledError:
                 self._logger.info("AioMongoWire exiting")
                 break
+            except Exception:
+                # Connection is lost while waiting for the transport to drain
+                break
 
-            if not data:
+            chunks = []
+            request_ids = []
+            size = 0
+            while True:
                 # Data might be None when exiting
-                continue
-
+                if data:
+                    request_id = data.header.request_id
+                    try:
+                        chunk = self._encode(data)
+                    except Exception as exc:
+                        self._logger.error(traceback.format_exc())
+                        self._fail_request(request_id, exc)
+                    else:
+                        scheduler.charge(lane, len(chunk))
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        request_ids.append(request_id)
+                        if self.message_pool is not None:
+                            self.message_pool.release(data)
+                if size >= self.max_write_size or scheduler.empty():
+                    break
+                lane, data = scheduler.get_nowait()
             try:
-                self._transport.write(bytes(data))
+                if chunks:
+                    self._write(chunks)
             except Exception as exc:
                 self._logger.error(traceback.format_exc())
-                self._out_data[data.header.request_id].set_exception(exc)
-            finally:
-                self._msg_queue.task_done()
+                for request_id in request_ids:
+                    self._fail_request(request_id, exc)
+
+    def _encode(self, data: MongoWireMessage) -> bytes:
+        compressor = self.compressor
+        # Streamed replies are parsed as they arrive, so their requests are not compressed for the server
+        # to reply uncompressed
+        if compressor is not None and data.header.request_id not in self._streams and is_compressible(data.operation):
+            data = MongoWireMessage(operation=OpCompressed(compressor, data.operation), header=data.header)
+        return bytes(data)
+
+    def _write(self, chunks: List[bytes]):
+        """
+        Writes encoded messages with a single transport call, through a pooled buffer if there is a pool
+        """
+        if self.buffer_pool is None:
+            data = b''.join(chunks)
+            self._transport.write(data)
+            if self.capture is not None:
+                self.capture.sent(data)
+            return
+
+        if self._held_buffers and not self._transport.get_write_buffer_size():
+            # Transport has flushed everything, it no longer references the buffers
+            for buffer in self._held_buffers:
+                self.buffer_pool.release(buffer)
+            self._held_buffers.clear()
+
+        length = sum(len(chunk) for chunk in chunks)
+        buffer = self.buffer_pool.acquire(length)
+        view = memoryview(buffer)
+        offset = 0
+        for chunk in chunks:
+            view[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+        self._transport.write(view[:length])
+        if self.capture is not None:
+            self.capture.sent(view[:length])
+        if self._transport.get_write_buffer_size():
+            self._held_buffers.append(buffer)
+        else:
+            self.buffer_pool.release(buffer)
 
     def data_received(self, data: bytes):
         """
-        Decodes received data and tries to map it to the request future
+        Splits received data into messages and tries to map them to the request futures.
+        Replies to raw frames are returned undecoded
         """
         try:
-            with io.BytesIO(data) as recv:
+            frames = self._frames.feed(data)
+        except InvalidFrameException as exc:
+            # Stream framing is lost, nothing after this point can be trusted
+            self._logger.error(traceback.format_exc())
+            self._fail_pending(exc)
+            self._frames.clear()
+            self._transport.close()
+            return
+
+        for frame in frames:
+            if self.capture is not None:
+                self.capture.received(frame.data)
+            self._frame_received(frame)
+
+    def _frame_received(self, frame: RawFrame):
+        raw_future = self._raw_out_data.pop(frame.response_to, None)
+        if raw_future is not None:
+            if not raw_future.done():
+                raw_future.set_result(frame)
+            return
+
+        try:
+            with frame.reader() as recv:
                 msg = MongoWireMessage.from_data(recv)
-        except Exception:
+            if msg.operation.op_code == OpCode.OP_COMPRESSED and self.compressor is not None:
+                msg.operation = msg.operation.original_msg
+        except Exception as exc:
             self._logger.error(traceback.format_exc())
+            future = self._out_data.pop(frame.response_to, None)
+            if future is not None and not future.done():
+                future.set_exception(exc)
             return
 
         try:
-            self._out_data[msg.header.response_to].set_result(msg)
+            future = self._out_data.pop(msg.header.response_to)
         except KeyError:
             self._logger.error(f"Unexpected response to non-existent request {msg.header.response_to}")
+            return
+        if not future.done():
+            future.set_result(msg)
+
+    def _fail_request(self, request_id: int, exc: Exception):
+        future = self._out_data.pop(request_id, None)
+        if future is not None:
+            future.set_exception(exc)
+        stream = self._streams.pop(request_id, None)
+        if stream is not None:
+            stream.set_exception(exc)
+
+    def _fail_pending(self, exc: Exception):
+        """
+        Fails all requests still waiting for the reply, they will never get one
+        """
+        for futures in (self._out_data, self._raw_out_data):
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(exc)
+            futures.clear()
+        for stream in self._streams.values():
+            stream.set_exception(exc)
+        self._streams.clear()
+        if self._frames.incremental is not None and not self._frames.incremental.stream.done:
+            self._frames.incremental.stream.set_exception(exc)
+        if self._drain_waiter is not None:
+            if not self._drain_waiter.done():
+                self._drain_waiter.set_exception(exc)
+            self._drain_waiter = None
 
     def eof_received(self) -> Optional[bool]:
         return super().eof_received()
@@ -84,11 +501,53 @@ class MongoWireProtocol(asyncio.Protocol):
     def connection_made(self, transport: transports.BaseTransport) -> None:
         self._transport = transport
         self.connected = True
-        asyncio.ensure_future(self._send_loop())
+        self._send_task = self._loop.create_task(self._send_loop())
 
     def connection_lost(self, exc: Optional[Exception]) -> None:
         self.connected = False
-        asyncio.ensure_future(self._msg_queue.put(None))
-        asyncio.ensure_future(self._msg_queue.join())
+        if self._unacknowledged:
+            # Nobody waits for unacknowledged writes, so they are only logged
+            self._logger.warning(f"Connection lost, {len(self._unacknowledged)} bytes of unacknowledged writes "
+                                 f"are not sent")
+            self._unacknowledged.clear()
+        self._scheduler.put_nowait(None)
+        self._fail_pending(exc or ConnectionError("Connection lost"))
         if exc:
             raise exc
+
+
+class BufferedMongoWireProtocol(MongoWireProtocol, asyncio.BufferedProtocol):
+    """
+    MongoWireProtocol reading into one reused receive buffer instead of getting a new bytes object for every read.
+    Receive buffer is taken from the buffer pool if there is one
+    """
+
+    def __init__(self, *args, receive_buffer_size: int = 64 * 1024, **kwargs):
+        """
+        :param receive_buffer_size: Max number of bytes read at once
+        See MongoWireProtocol for the rest of the arguments
+        """
+        super().__init__(*args, **kwargs)
+        self._receive_buffer_size = receive_buffer_size
+        self._receive_buffer: Optional[bytearray] = None
+        self._receive_view: Optional[memoryview] = None
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._receive_view is None:
+            if self.buffer_pool is not None:
+                self._receive_buffer = self.buffer_pool.acquire(self._receive_buffer_size)
+            else:
+                self._receive_buffer = bytearray(self._receive_buffer_size)
+            self._receive_view = memoryview(self._receive_buffer)
+        return self._receive_view
+
+    def buffer_updated(self, nbytes: int):
+        self.data_received(self._receive_view[:nbytes])
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self._receive_view is not None:
+            self._receive_view.release()
+            if self.buffer_pool is not None:
+                self.buffer_pool.release(self._receive_buffer)
+            self._receive_buffer = self._receive_view = None
+        super().connection_lost(exc)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import traceback
+from asyncio import transports
+from typing import Optional, Callable, Collection
+
+from ._frame import FrameBuffer, RawFrame, InvalidFrameException
+from ._pool import ConnectionPool
+
+
+class MongoWireProxy:
+    """
+    Transparent wire protocol proxy
+
+    Client connections are multiplexed onto the upstream connection pool. Only the message header is parsed,
+    frames are forwarded as is with request ids remapped, BSON is never decoded unless the inspector asks for it.
+    Exhaust cursors are not supported, as the upstream connection is shared between the clients.
+    """
+
+    def __init__(self, upstream: ConnectionPool, inspect: Optional[Callable[[RawFrame], None]] = None,
+                 inspect_op_codes: Optional[Collection[int]] = None):
+        """
+        :param upstream: Pool of the server connections
+        :param inspect: Optional callback receiving client frames before forwarding.
+            Use RawFrame.message to decode the frame
+        :param inspect_op_codes: Opcodes passed to the inspector, all frames are passed if not set
+        """
+        self.upstream = upstream
+        self.inspect = inspect
+        self.inspect_op_codes = set(inspect_op_codes) if inspect_op_codes is not None else None
+        self._logger = logging.getLogger('aiomongowire')
+
+    def protocol_factory(self) -> '_ProxyClientProtocol':
+        return _ProxyClientProtocol(self)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 27017, **server_kwargs) -> asyncio.AbstractServer:
+        """
+        Connects to the upstream and starts accepting client connections
+        """
+        await self.upstream.connect()
+        return await asyncio.get_running_loop().create_server(self.protocol_factory, host, port, **server_kwargs)
+
+    def _inspect(self, frame: RawFrame):
+        if self.inspect is None:
+            return
+        if self.inspect_op_codes is not None and frame.op_code not in self.inspect_op_codes:
+            return
+        try:
+            self.inspect(frame)
+        except Exception:
+            self._logger.error(traceback.format_exc())
+
+    async def forward(self, frame: RawFrame, client: '_ProxyClientProtocol'):
+        """
+        Sends client frame upstream and writes the reply back to the client
+        """
+        self._inspect(frame)
+        client_request_id = frame.request_id
+        try:
+            reply = await self.upstream.send_frame(frame)
+        except Exception:
+            self._logger.error(traceback.format_exc())
+            client.close()
+            return
+        if reply is None:
+            return
+        reply.response_to = client_request_id
+        client.write(reply)
+
+
+class _ProxyClientProtocol(asyncio.Protocol):
+    """
+    Client-facing side of the proxy
+    """
+
+    def __init__(self, proxy: MongoWireProxy):
+        self._proxy = proxy
+        self._transport: Optional[asyncio.Transport] = None
+        self._frames = FrameBuffer()
+
+    def connection_made(self, transport: transports.BaseTransport) -> None:
+        self._transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            frames = self._frames.feed(data)
+        except InvalidFrameException:
+            self._proxy._logger.error(traceback.format_exc())
+            self.close()
+            return
+        for frame in frames:
+            asyncio.ensure_future(self._proxy.forward(frame, self))
+
+    def write(self, frame: RawFrame):
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.write(frame.data)
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._transport = None
+        self._frames.clear()
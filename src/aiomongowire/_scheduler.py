@@ -0,0 +1,282 @@
+import asyncio
+from collections import deque
+from typing import Collection, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from ._bson import get_bson_parser
+from ._loop import bind_loop
+from ._message import MongoWireMessage
+from ._message_header import MessageHeader
+from ._op_msg import OpMsg
+
+T = TypeVar('T')
+
+DEFAULT_LANE = 'default'
+
+# Document sequence of each write command
+_WRITE_SEQUENCES = {'insert': 'documents', 'update': 'updates', 'delete': 'deletes'}
+
+
+class LaneStats:
+    """
+    Sending statistics of a lane, queue waits are in seconds
+    """
+    __slots__ = ['sent', 'sent_bytes', 'total_wait', 'max_wait', 'waits']
+
+    def __init__(self, window: int = 1024):
+        """
+        :param window: Number of the latest queue waits kept for the percentiles
+        """
+        self.sent = 0
+        self.sent_bytes = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waits: Deque[float] = deque(maxlen=window)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Queue wait percentile over the latest waits, e.g. 99 for p99
+        """
+        if not self.waits:
+            return 0.0
+        waits = sorted(self.waits)
+        return waits[min(len(waits) - 1, int(len(waits) * percent / 100))]
+
+    def __str__(self):
+        mean = self.total_wait / self.sent if self.sent else 0.0
+        return f"LaneStats: sent: {self.sent} ({self.sent_bytes} bytes), mean wait: {mean * 1000:.3f} ms, " \
+               f"p99 wait: {self.percentile(99) * 1000:.3f} ms, max wait: {self.max_wait * 1000:.3f} ms"
+
+
+class Lane(Generic[T]):
+    """
+    Traffic class of the send scheduler, e.g. a priority class, a tenant or a label
+    """
+    __slots__ = ['name', 'priority', 'weight', 'stats', '_queue', '_deficit']
+
+    def __init__(self, name: str, priority: int = 0, weight: float = 1.0):
+        """
+        :param name: Lane name, requests refer to it
+        :param priority: Lanes of a higher priority are always served first
+        :param weight: Share of the bytes sent among the busy lanes of the same priority
+        """
+        if weight <= 0:
+            raise ValueError(f"Lane weight must be positive, got {weight}")
+        self.name = name
+        self.priority = priority
+        self.weight = weight
+        self.stats = LaneStats()
+        self._queue: Deque[Tuple[float, T]] = deque()
+        self._deficit = 0.0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __str__(self):
+        return f"Lane {self.name}: priority: {self.priority}, weight: {self.weight}, queued: {len(self._queue)}"
+
+
+class SendScheduler(Generic[T]):
+    """
+    Queue of the messages to send, split into lanes
+
+    Lanes of the highest priority having messages are served first. Lanes of the same priority share the bytes sent
+    by their weights, with deficit round robin: a lane is served while it has credit left, is charged
+    the encoded size of every message taken from it, and gets quantum * weight bytes of credit per round.
+    Messages of one lane keep their order. Unknown lanes are created on the first use with the default priority
+    and weight, so lanes can be made per tenant on the fly
+    """
+
+    def __init__(self, lanes: Collection[Lane] = (), quantum: int = 64 * 1024,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        :param lanes: Lanes with non-default priority or weight, the default lane is added if it is not given
+        :param quantum: Bytes of credit a lane of weight 1 gets per round
+        :param loop: Event loop to bind to, the running one by default, required outside a running loop
+        """
+        self.quantum = quantum
+        self._loop = bind_loop(loop)
+        self._lanes: Dict[str, Lane[T]] = {lane.name: lane for lane in lanes}
+        if DEFAULT_LANE not in self._lanes:
+            self._lanes[DEFAULT_LANE] = Lane(DEFAULT_LANE)
+        # Lanes having messages, by priority, in the round robin order
+        self._active: Dict[int, Deque[Lane[T]]] = {}
+        self._size = 0
+        self._waiter: Optional[asyncio.Future] = None
+
+    @property
+    def lanes(self) -> Dict[str, Lane[T]]:
+        return self._lanes
+
+    def stats(self) -> Dict[str, LaneStats]:
+        """
+        Sending statistics by the lane name
+        """
+        return {name: lane.stats for name, lane in self._lanes.items()}
+
+    def lane(self, name: str) -> Lane[T]:
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = self._lanes[name] = Lane(name)
+        return lane
+
+    def empty(self) -> bool:
+        return not self._size
+
+    def __len__(self):
+        return self._size
+
+    def put_nowait(self, item: T, lane: str = DEFAULT_LANE):
+        scheduled = self.lane(lane)
+        if not scheduled._queue:
+            self._active.setdefault(scheduled.priority, deque()).append(scheduled)
+        scheduled._queue.append((self._loop.time(), item))
+        self._size += 1
+        if self._waiter is not None:
+            if not self._waiter.done():
+                self._waiter.set_result(None)
+            self._waiter = None
+
+    def get_nowait(self) -> Tuple[Lane[T], T]:
+        """
+        Takes the next message. Its lane is to be charged with the encoded size once it is known, see charge
+
+        :raises asyncio.QueueEmpty: If there are no messages
+        """
+        if not self._size:
+            raise asyncio.QueueEmpty()
+        active = self._active[max(self._active)]
+        lane = active[0]
+        while lane._deficit <= 0:
+            lane._deficit += self.quantum * lane.weight
+            active.rotate(-1)
+            lane = active[0]
+        enqueued, item = lane._queue.popleft()
+        self._size -= 1
+        if not lane._queue:
+            # Idle lanes do not keep the credit, as in the classic deficit round robin
+            active.popleft()
+            lane._deficit = 0.0
+            if not active:
+                del self._active[lane.priority]
+        wait = self._loop.time() - enqueued
+        stats = lane.stats
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.waits.append(wait)
+        return lane, item
+
+    async def get(self) -> Tuple[Lane[T], T]:
+        while not self._size:
+            if self._waiter is None:
+                self._waiter = self._loop.create_future()
+            await self._waiter
+        return self.get_nowait()
+
+    @staticmethod
+    def charge(lane: Lane[T], size: int):
+        """
+        Charges the lane with the encoded size of the message taken from it
+        """
+        lane._deficit -= size
+        lane.stats.sent += 1
+        lane.stats.sent_bytes += size
+
+
+def split_write(data: MongoWireMessage, max_bytes: int) -> Optional[List[MongoWireMessage]]:
+    """
+    Splits insert, update or delete command with a document sequence of more than max_bytes into commands
+    with consecutive parts of the sequence, at the document boundaries. Documents are encoded once here
+
+    :return: Commands with the parts, or None if the command is not split
+    """
+    operation = data.operation
+    if not isinstance(operation, OpMsg) or operation.flag_bits or len(operation.sections) != 2:
+        return None
+    body, sequence = operation.sections
+    if sequence.payload_type != OpMsg.PayloadType.DOCUMENTS or \
+            _WRITE_SEQUENCES.get(next(iter(body.data), None)) != sequence.identifier:
+        return None
+    if 'txnNumber' in body.data:
+        # Retryable writes and transactions number the statements of the whole command
+        return None
+    if isinstance(sequence, OpMsg.RawDocument):
+        documents = sequence.raw
+    else:
+        parser = get_bson_parser()
+        documents = [parser.encode_object(document) for document in sequence.documents]
+    if sum(len(document) for document in documents) <= max_bytes:
+        return None
+
+    parts = []
+    part: List[bytes] = []
+    size = 0
+    for document in documents:
+        if part and size + len(document) > max_bytes:
+            parts.append(part)
+            part, size = [], 0
+        part.append(document)
+        size += len(document)
+    parts.append(part)
+    if len(parts) == 1:
+        return None
+    return [MongoWireMessage(operation=OpMsg(sections=[body, OpMsg.RawDocument(sequence.identifier, part)]))
+            for part in parts]
+
+
+def is_ordered(data: MongoWireMessage) -> bool:
+    """
+    Write commands are ordered unless they say otherwise
+    """
+    return data.operation.sections[0].data.get('ordered', True)
+
+
+def part_sizes(parts: List[MongoWireMessage]) -> List[int]:
+    """
+    Number of the documents in each part of the split command. Taken before the parts are sent,
+    as the sent messages may be released to the message pool
+    """
+    return [len(part.operation.sections[1].raw) for part in parts]
+
+
+def merge_write_replies(replies: List[MongoWireMessage], sizes: List[int],
+                        request: MongoWireMessage) -> MongoWireMessage:
+    """
+    Merges replies to the parts of the split command into the reply to the whole command.
+    Counts are summed up, writeErrors and upserted indexes are shifted to the whole sequence.
+    Command error of a part is returned with the counts and errors of the other parts: of the parts before it
+    for ordered command, of all the parts for unordered one, as its parts are all sent and applied
+
+    :param replies: Replies to the sent parts, in order
+    :param sizes: Number of the documents in each part, see part_sizes
+    :param request: Whole command
+    """
+    ordered = is_ordered(request)
+    merged: dict = {}
+    error: Optional[dict] = None
+    offset = 0
+    for reply, size in zip(replies, sizes):
+        result = reply.operation.sections[0].data
+        if result.get('ok') != 1:
+            error = error or result
+            if ordered:
+                break
+            offset += size
+            continue
+        if not merged:
+            merged = {key: value for key, value in result.items() if key not in ('writeErrors', 'upserted')}
+        else:
+            for key in ('n', 'nModified'):
+                if key in result:
+                    merged[key] = merged.get(key, 0) + result[key]
+            if 'writeConcernError' in result:
+                merged.setdefault('writeConcernError', result['writeConcernError'])
+        for key in ('writeErrors', 'upserted'):
+            for entry in result.get(key, ()):
+                merged.setdefault(key, []).append(dict(entry, index=entry.get('index', 0) + offset))
+        offset += size
+    if error is not None:
+        # Written parts are reported with the error, the caller needs their results
+        merged = dict(error, **{key: value for key, value in merged.items()
+                                if key in ('n', 'nModified', 'writeErrors', 'upserted', 'writeConcernError')})
+    header = MessageHeader(request_id=replies[-1].header.request_id, response_to=request.header.request_id)
+    return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(merged)]), header=header)
@@ -0,0 +1,430 @@
+import collections
+import struct
+import time
+import uuid
+from enum import Enum
+from typing import Callable, Awaitable, Optional, Tuple, Union, List, Deque, Dict
+
+from . import _bson_scanner as scanner
+from ._frame import RawFrame, HEADER_LENGTH
+from ._message import MongoWireMessage
+from ._op_code import OpCode
+from ._op_msg import OpMsg
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+_UINT64 = struct.Struct('<Q')
+_DOUBLE = struct.Struct('<d')
+
+_LSID = b'\x03lsid\x00'
+_TXN_NUMBER = b'\x12txnNumber\x00'
+_AFTER_CLUSTER_TIME = b'\x11afterClusterTime\x00'
+_READ_CONCERN = b'\x03readConcern\x00'
+_START_TRANSACTION = b'\x08startTransaction\x00\x01'
+_AUTOCOMMIT_FALSE = b'\x08autocommit\x00\x00'
+
+# Commands reading at the cluster time given in readConcern
+READ_COMMANDS = frozenset(['find', 'aggregate', 'count', 'distinct'])
+# Retryable write commands and their statements argument
+RETRYABLE_WRITES = {'insert': 'documents', 'update': 'updates', 'delete': 'deletes', 'findAndModify': None}
+# https://github.com/mongodb/specifications/blob/master/source/retryable-writes/retryable-writes.md
+RETRYABLE_CODES = frozenset([6, 7, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436])
+
+
+class SessionException(Exception):
+    pass
+
+
+def _splice(data: Buffer, offset: int, elements: bytes, document_offsets: Tuple[int, ...]) -> bytearray:
+    """
+    Inserts encoded elements into the encoded document at the offset, lengths of the documents starting
+    at document_offsets, the enclosing ones, are patched
+    """
+    out = bytearray().join((data[:offset], elements, data[offset:]))
+    for document_offset in document_offsets:
+        _INT32.pack_into(out, document_offset, _INT32.unpack_from(out, document_offset)[0] + len(elements))
+    return out
+
+
+def _scalar(data: Buffer, name: bytes, offset: int = 0) -> Union[None, bool, int, float]:
+    """
+    Boolean or number value of the top level element, None if there is no such element, or it is of other type
+    """
+    element = scanner.find_element(data, name, offset)
+    if element is None:
+        return None
+    element_type, value_offset, _ = element
+    if element_type == scanner.BOOLEAN:
+        return data[value_offset] == 1
+    if element_type == scanner.DOUBLE:
+        return _DOUBLE.unpack_from(data, value_offset)[0]
+    return scanner.read_int(data, element_type, value_offset)
+
+
+class ServerSession:
+    """
+    Logical session on the server, identified by the UUID. Its lsid element is encoded once
+    """
+    __slots__ = ['id', 'lsid', 'txn_number', 'last_used', 'dirty']
+
+    def __init__(self, session_id: Optional[bytes] = None):
+        """
+        :param session_id: UUID bytes, random by default
+        """
+        self.id = session_id or uuid.uuid4().bytes
+        # {'id': Binary(id, subtype 4)}
+        document = b'\x05id\x00' + _INT32.pack(16) + b'\x04' + self.id
+        self.lsid = _INT32.pack(len(document) + 5) + document + b'\x00'
+        self.txn_number = 0
+        self.last_used = time.monotonic()
+        # Network error happened while in use, the server state of the session is unknown
+        self.dirty = False
+
+    def __str__(self):
+        return f"ServerSession: id: {uuid.UUID(bytes=self.id)}, txn number: {self.txn_number}"
+
+
+class SessionPool:
+    """
+    Pool of server sessions, shared by the connections to the cluster
+
+    Most recently used sessions are given out first, sessions within a minute of the server timeout
+    and the dirty ones are dropped
+    """
+
+    def __init__(self, timeout_minutes: float = 30):
+        """
+        :param timeout_minutes: logicalSessionTimeoutMinutes of the server
+        """
+        self.timeout_minutes = timeout_minutes
+        self._sessions: Deque[ServerSession] = collections.deque()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expiring(self, session: ServerSession) -> bool:
+        return time.monotonic() - session.last_used > (self.timeout_minutes - 1) * 60
+
+    def acquire(self) -> ServerSession:
+        while self._sessions:
+            session = self._sessions.popleft()
+            if not self._expiring(session):
+                return session
+        return ServerSession()
+
+    def release(self, session: ServerSession):
+        while self._sessions and self._expiring(self._sessions[-1]):
+            self._sessions.pop()
+        if not session.dirty and not self._expiring(session):
+            self._sessions.appendleft(session)
+
+    def end_sessions(self, max_batch: int = 10000) -> List[MongoWireMessage]:
+        """
+        endSessions commands for the pooled sessions, to be sent on shutdown. The pool is emptied
+        """
+        messages = []
+        while self._sessions:
+            sessions = [self._sessions.popleft() for _ in range(min(max_batch, len(self._sessions)))]
+            array = b''.join(b'\x03' + str(i).encode() + b'\x00' + session.lsid for i, session in enumerate(sessions))
+            elements = b'\x04endSessions\x00' + _INT32.pack(len(array) + 5) + array + b'\x00' + \
+                       b'\x02$db\x00' + _INT32.pack(6) + b'admin\x00'
+            body = _INT32.pack(len(elements) + 5) + elements + b'\x00'
+            messages.append(MongoWireMessage(operation=OpMsg(sections=[OpMsg.RawBody(body)])))
+        return messages
+
+
+class ClusterClock:
+    """
+    Highest $clusterTime seen in the replies, gossiped back to the cluster with every command.
+    The element is kept encoded, signature included, as it came from the server
+    """
+    __slots__ = ['element', 'time']
+
+    def __init__(self):
+        self.element: Optional[bytes] = None
+        self.time = 0
+
+    def advance(self, data: Buffer, offset: int = 0):
+        """
+        Takes $clusterTime of the encoded reply document if it is newer
+        """
+        cluster_time = scanner.find_element(data, b'$clusterTime', offset)
+        if cluster_time is None or cluster_time[0] != scanner.DOCUMENT:
+            return
+        _, value_offset, size = cluster_time
+        timestamp = scanner.find_element(data, b'clusterTime', value_offset)
+        if timestamp is None or timestamp[0] != scanner.TIMESTAMP:
+            return
+        value = _UINT64.unpack_from(data, timestamp[1])[0]
+        if value > self.time:
+            self.time = value
+            # Element type and name precede the value
+            self.element = bytes(data[value_offset - len(b'$clusterTime') - 2:value_offset + size])
+
+
+class TransactionState(Enum):
+    NONE = 0
+    STARTING = 1
+    IN_PROGRESS = 2
+
+
+def _reply_body(frame: RawFrame) -> Optional[Tuple[Buffer, int]]:
+    """
+    Encoded body of the OP_MSG reply and its offset
+    """
+    if frame.op_code == OpCode.OP_MSG and frame.data[HEADER_LENGTH + 4] == OpMsg.PayloadType.BODY:
+        return frame.data, HEADER_LENGTH + 5
+    if frame.op_code == OpCode.OP_COMPRESSED:
+        original = frame.message.operation.original_msg
+        if isinstance(original, OpMsg):
+            return bytes(original.sections[0])[1:], 0
+    return None
+
+
+def _statement_value(statement: Union[dict, Tuple[Buffer, int]], name: str):
+    if isinstance(statement, dict):
+        return statement.get(name)
+    return _scalar(statement[0], name.encode(), statement[1])
+
+
+class Session:
+    """
+    Client session: lsid, $clusterTime, causal consistency, retryable writes and transactions
+    for the commands sent through it
+
+    Fields are spliced into the encoded command, its other elements are not touched.
+    With causal consistency reads get readConcern.afterClusterTime of the latest operation of the session.
+    Retryable writes get txnNumber and are sent again once on a network or retryable error.
+    Session is not safe for concurrent commands, as the server session is not
+    """
+
+    def __init__(self, pool: SessionPool, clock: Optional[ClusterClock] = None, causal_consistency: bool = True,
+                 retry_writes: bool = True):
+        """
+        :param pool: Pool to take the server session from
+        :param clock: Cluster clock shared by the sessions of the client, own one by default
+        :param causal_consistency: Make reads see the writes of the session
+        :param retry_writes: Retry writes once on a network or retryable error
+        """
+        self.pool = pool
+        self.clock = clock or ClusterClock()
+        self.causal_consistency = causal_consistency
+        self.retry_writes = retry_writes
+        self.operation_time: Optional[bytes] = None  # encoded Timestamp
+        self.transaction = TransactionState.NONE
+        self._server_session: Optional[ServerSession] = pool.acquire()
+
+    @property
+    def server_session(self) -> ServerSession:
+        if self._server_session is None:
+            raise SessionException("Session has ended")
+        return self._server_session
+
+    def advance_operation_time(self, data: Buffer, offset: int = 0):
+        """
+        Takes operationTime of the encoded reply document if it is newer
+        """
+        element = scanner.find_element(data, b'operationTime', offset)
+        if element is None or element[0] != scanner.TIMESTAMP:
+            return
+        value = bytes(data[element[1]:element[1] + 8])
+        if self.operation_time is None or _UINT64.unpack(value)[0] > _UINT64.unpack(self.operation_time)[0]:
+            self.operation_time = value
+
+    def observe(self, reply: RawFrame):
+        """
+        Updates the cluster time and the operation time from the undecoded reply
+        """
+        body = _reply_body(reply)
+        if body is not None:
+            self.clock.advance(*body)
+            self.advance_operation_time(*body)
+
+    def _retryable_write(self, command: str, body: Buffer, fields: Dict[bytes, Tuple[int, int, int]],
+                         sections: List[OpMsg.Section]) -> bool:
+        if not self.retry_writes or command not in RETRYABLE_WRITES:
+            return False
+        write_concern = fields.get(b'writeConcern')
+        if write_concern is not None and write_concern[0] == scanner.DOCUMENT and \
+                _scalar(body, b'w', write_concern[1]) == 0:
+            # Unacknowledged
+            return False
+        if command not in ('update', 'delete'):
+            return True
+        identifier = RETRYABLE_WRITES[command]
+        statements = []
+        array = fields.get(identifier.encode())
+        if array is not None and array[0] == scanner.ARRAY:
+            statements += [(body, offset) for _, _, offset, _ in scanner.iter_elements(body, array[1])]
+        for section in sections:
+            if section.payload_type == OpMsg.PayloadType.DOCUMENTS and section.identifier == identifier:
+                statements += [(document, 0) for document in section.raw] if isinstance(section, OpMsg.RawDocument) \
+                    else section.documents
+        # Statements changing several documents can not be retried
+        if command == 'update':
+            return not any(_statement_value(statement, 'multi') is True for statement in statements)
+        return not any(_statement_value(statement, 'limit') == 0 for statement in statements)
+
+    def _prepare(self, operation: OpMsg) -> Tuple[OpMsg, bool]:
+        body_section = operation.sections[0]
+        body = body_section.raw if isinstance(body_section, OpMsg.RawBody) else bytes(body_section)[1:]
+        # Top level elements by name, the body is scanned once
+        fields = {name: (element_type, value_offset, size)
+                  for element_type, name, value_offset, size in scanner.iter_elements(body)}
+        command = next(iter(fields)).decode()
+        server_session = self.server_session
+        server_session.last_used = time.monotonic()
+
+        elements = []
+        read_concern = None
+        retryable = False
+        if b'lsid' not in fields:
+            elements.append(_LSID + server_session.lsid)
+        if self.transaction != TransactionState.NONE:
+            elements += (_TXN_NUMBER + _INT64.pack(server_session.txn_number), _AUTOCOMMIT_FALSE)
+            if self.transaction == TransactionState.STARTING:
+                elements.append(_START_TRANSACTION)
+                read_concern = self.causal_consistency and self.operation_time is not None
+                self.transaction = TransactionState.IN_PROGRESS
+        else:
+            read_concern = self.causal_consistency and self.operation_time is not None and command in READ_COMMANDS
+            if b'txnNumber' not in fields and self._retryable_write(command, body, fields, operation.sections[1:]):
+                server_session.txn_number += 1
+                elements.append(_TXN_NUMBER + _INT64.pack(server_session.txn_number))
+                retryable = True
+        if self.clock.element is not None and b'$clusterTime' not in fields:
+            elements.append(self.clock.element)
+
+        if read_concern:
+            after_cluster_time = _AFTER_CLUSTER_TIME + self.operation_time
+            existing = fields.get(b'readConcern')
+            if existing is None:
+                elements.append(_READ_CONCERN + _INT32.pack(len(after_cluster_time) + 5) + after_cluster_time + b'\x00')
+            elif existing[0] == scanner.DOCUMENT:
+                _, value_offset, size = existing
+                if scanner.find_element(body, b'afterClusterTime', value_offset) is None:
+                    body = _splice(body, value_offset + size - 1, after_cluster_time, (0, value_offset))
+        body = _splice(body, len(body) - 1, b''.join(elements), (0,))
+        return OpMsg(sections=[OpMsg.RawBody(body)] + operation.sections[1:], flag_bits=operation.flag_bits), retryable
+
+    def prepare(self, operation: OpMsg) -> OpMsg:
+        """
+        Copy of the command with the session fields spliced into its body, the command itself is not changed
+        """
+        return self._prepare(operation)[0]
+
+    async def send(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]],
+                   message: MongoWireMessage) -> Optional[RawFrame]:
+        """
+        Sends the command in the session, retryable writes are sent again once on a network or retryable error
+
+        :param send_frame: Sends undecoded frame, e.g. send_frame of MongoWireProtocol or ConnectionPool
+        :param message: OP_MSG command
+        :return: Undecoded reply
+        """
+        operation, retryable = self._prepare(message.operation)
+        data = bytes(MongoWireMessage(operation=operation, header=message.header))
+        try:
+            reply = await send_frame(RawFrame(data))
+        except OSError:
+            self.server_session.dirty = True
+            if not retryable:
+                raise
+            return await self._send_again(send_frame, data)
+        if reply is not None:
+            self.observe(reply)
+            if retryable and _retryable_error(reply):
+                return await self._send_again(send_frame, data)
+        return reply
+
+    async def _send_again(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]],
+                          data: bytes) -> Optional[RawFrame]:
+        # Same txnNumber, the server applies the write at most once
+        reply = await send_frame(RawFrame(data))
+        if reply is not None:
+            self.observe(reply)
+        return reply
+
+    def start_transaction(self):
+        """
+        Starts a transaction, following commands of the session are sent in it
+        """
+        if self.transaction != TransactionState.NONE:
+            raise SessionException("Transaction already in progress")
+        self.server_session.txn_number += 1
+        self.transaction = TransactionState.STARTING
+
+    async def _end_transaction(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]],
+                               command: str) -> Optional[RawFrame]:
+        if self.transaction == TransactionState.NONE:
+            raise SessionException("No transaction started")
+        if self.transaction == TransactionState.STARTING:
+            # Nothing was sent, nothing to end on the server
+            self.transaction = TransactionState.NONE
+            return None
+        operation, _ = self._prepare(OpMsg(sections=[OpMsg.Body({command: 1, '$db': 'admin'})]))
+        self.transaction = TransactionState.NONE
+        data = bytes(MongoWireMessage(operation=operation))
+        try:
+            reply = await send_frame(RawFrame(data))
+        except OSError:
+            self.server_session.dirty = True
+            return await self._send_again(send_frame, data)
+        if reply is not None:
+            self.observe(reply)
+            if _retryable_error(reply):
+                return await self._send_again(send_frame, data)
+        return reply
+
+    async def commit_transaction(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]]) \
+            -> Optional[RawFrame]:
+        """
+        Commits the transaction, retried once on a network or retryable error
+
+        :return: Undecoded commitTransaction reply, None if nothing was sent in the transaction
+        """
+        return await self._end_transaction(send_frame, 'commitTransaction')
+
+    async def abort_transaction(self, send_frame: Callable[[RawFrame], Awaitable[Optional[RawFrame]]]) \
+            -> Optional[RawFrame]:
+        """
+        Aborts the transaction, retried once on a network or retryable error
+
+        :return: Undecoded abortTransaction reply, None if nothing was sent in the transaction
+        """
+        return await self._end_transaction(send_frame, 'abortTransaction')
+
+    def end(self):
+        """
+        Returns the server session to the pool. Transaction left in progress is aborted by the server
+        once the session is used with another transaction number, or times out
+        """
+        if self._server_session is not None:
+            self.pool.release(self._server_session)
+            self._server_session = None
+
+    def __enter__(self) -> 'Session':
+        return self
+
+    def __exit__(self, *args):
+        self.end()
+
+
+def _retryable_error(reply: RawFrame) -> bool:
+    """
+    Checks the undecoded reply for a retryable error, successful replies are not decoded
+    """
+    body = _reply_body(reply)
+    if body is None:
+        return False
+    data, offset = body
+    if _scalar(data, b'ok', offset) == 1 and scanner.find_element(data, b'writeConcernError', offset) is None:
+        return False
+    document = reply.message.operation
+    document = (document.original_msg if reply.op_code == OpCode.OP_COMPRESSED else document).sections[0].data
+    if 'RetryableWriteError' in document.get('errorLabels', ()):
+        return True
+    return document.get('code') in RETRYABLE_CODES or \
+        (document.get('writeConcernError') or {}).get('code') in RETRYABLE_CODES
@@ -0,0 +1,174 @@
+import asyncio
+import itertools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Awaitable, Any, List, Optional, TypeVar
+
+from ._message import MongoWireMessage
+from ._pool import ConnectionPool
+
+T = TypeVar('T')
+Job = Callable[..., Awaitable[T]]  # async def job(pool: ConnectionPool, *args)
+
+
+class _LoopThread:
+    """
+    Event loop with its own connection pool running in a separate thread
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int,
+                 loop_factory: Callable[[], asyncio.AbstractEventLoop]):
+        self.loop = loop_factory()
+        self.pool = ConnectionPool(host, port, size=pool_size)
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.pool.connect())
+        except BaseException as exc:
+            self._error = exc
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+
+        self.pool.close()
+        # Same cleanup as in asyncio.run, so connection loss is handled and no task is left pending
+        self.loop.run_until_complete(asyncio.sleep(0))
+        all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+        tasks = [task for task in all_tasks(self.loop) if not task.done()]
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    def stop(self):
+        if self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+        self.loop.close()
+
+
+class ThreadedRunner:
+    """
+    Spreads requests over worker event loops running in threads, each with its own connection pool
+
+    Objects are handed over between the loops as is, nothing is pickled. Work scales with the number of threads
+    only as far as it releases the GIL, e.g. socket I/O. Use ProcessRunner to scale BSON encoding and decoding.
+    """
+
+    def __init__(self, host: str, port: int = 27017, workers: int = None, pool_size: int = 2,
+                 loop_factory: Callable[[], asyncio.AbstractEventLoop] = asyncio.new_event_loop):
+        """
+        :param host: Server host
+        :param port: Server port
+        :param workers: Number of worker loops, CPU count by default
+        :param pool_size: Number of connections in each worker loop
+        :param loop_factory: Factory for the worker loops, e.g. uvloop.new_event_loop
+        """
+        self._workers = [_LoopThread(host, port, pool_size, loop_factory) for _ in range(workers or os.cpu_count())]
+        self._next_worker = itertools.cycle(self._workers)
+        self._started = False
+
+    def start(self):
+        """
+        Starts the worker loops and connects their pools
+
+        :raises Exception: Connection error of a worker, the workers started before it are stopped
+        """
+        started = []
+        try:
+            for worker in self._workers:
+                started.append(worker)
+                worker.start()
+        except BaseException:
+            for worker in started:
+                worker.stop()
+            raise
+        self._started = True
+
+    def submit(self, job: Job, *args) -> Awaitable[T]:
+        """
+        Runs job(pool, *args) on the next worker loop and returns its result to the calling loop
+
+        :raises RuntimeError: If the runner is not started, the job would never run
+        """
+        if not self._started:
+            raise RuntimeError("ThreadedRunner is not started")
+        worker = next(self._next_worker)
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(job(worker.pool, *args), worker.loop))
+
+    def send_data(self, data: MongoWireMessage) -> Awaitable[MongoWireMessage]:
+        """
+        Sends message through the next worker loop, encoding and decoding happen in the worker thread
+        """
+        return self.submit(_send_data, data)
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+
+
+async def _send_data(pool: ConnectionPool, data: MongoWireMessage) -> MongoWireMessage:
+    return await pool.send_data(data)
+
+
+# Worker process state, see ProcessRunner
+_PROCESS_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_PROCESS_POOL: Optional[ConnectionPool] = None
+
+
+def _init_process(host: str, port: int, pool_size: int, loop_factory: Callable[[], asyncio.AbstractEventLoop]):
+    global _PROCESS_LOOP, _PROCESS_POOL
+    _PROCESS_LOOP = loop_factory()
+    asyncio.set_event_loop(_PROCESS_LOOP)
+    _PROCESS_POOL = ConnectionPool(host, port, size=pool_size)
+
+
+def _run_in_process(job: Job, args: tuple) -> Any:
+    if not _PROCESS_POOL.connected:
+        _PROCESS_LOOP.run_until_complete(_PROCESS_POOL.connect())
+    return _PROCESS_LOOP.run_until_complete(job(_PROCESS_POOL, *args))
+
+
+class ProcessRunner:
+    """
+    Spreads jobs over worker processes, each running its own event loop and connection pool
+
+    Workers share nothing, jobs and their results are pickled, so jobs should be coarse-grained,
+    e.g. run a whole batch of requests and return a summary. Each worker runs one job at a time.
+    """
+
+    def __init__(self, host: str, port: int = 27017, workers: int = None, pool_size: int = 2,
+                 loop_factory: Callable[[], asyncio.AbstractEventLoop] = asyncio.new_event_loop):
+        """
+        :param host: Server host
+        :param port: Server port
+        :param workers: Number of worker processes, CPU count by default
+        :param pool_size: Number of connections in each worker process
+        :param loop_factory: Picklable factory for the worker loops, e.g. uvloop.new_event_loop
+        """
+        settings = (host, port, pool_size, loop_factory)
+        self._executors: List[ProcessPoolExecutor] = [
+            ProcessPoolExecutor(max_workers=1, initializer=_init_process, initargs=settings)
+            for _ in range(workers or os.cpu_count())]
+        self._next_executor = itertools.cycle(self._executors)
+
+    def submit(self, job: Job, *args) -> Awaitable[T]:
+        """
+        Runs job(pool, *args) in the next worker process. Job should be a module-level coroutine function
+        """
+        return asyncio.wrap_future(next(self._next_executor).submit(_run_in_process, job, args))
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+from typing import Optional, Dict, Collection, Callable, Awaitable
+
+from ._base_op import BaseOp
+from ._bson import get_bson_parser
+from ._message import MongoWireMessage
+from ._message_header import MessageHeader
+from ._op_msg import OpMsg
+from ._op_reply import OpReply
+
+DEFAULT_COALESCED_COMMANDS = frozenset({'find', 'aggregate', 'count', 'distinct', 'hello', 'isMaster', 'ismaster',
+                                        'listCollections', 'listIndexes', 'listDatabases', 'dbStats', 'collStats',
+                                        'buildInfo'})
+DEFAULT_IGNORED_FIELDS = frozenset({'lsid', '$clusterTime'})
+
+# Aggregation stages turning the read into a write
+_WRITE_STAGES = frozenset({'$out', '$merge'})
+
+
+def has_open_cursor(operation: BaseOp) -> bool:
+    """
+    True if the reply holds a server cursor which can be iterated only by a single client
+    """
+    if isinstance(operation, OpReply):
+        return bool(operation.cursor_id)
+    if not isinstance(operation, OpMsg) or not operation.sections:
+        return False
+    cursor = getattr(operation.sections[0], 'data', {}).get('cursor')
+    return isinstance(cursor, dict) and bool(cursor.get('id'))
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent read commands into a single round trip
+
+    Commands are compared by the hash of the encoded OP_MSG body without the session fields,
+    so the same query sent from different sessions still shares the round trip.
+    The reply operation is shared by all waiters and should not be modified.
+    If the reply holds an open cursor, waiters send their own requests, as the cursor cannot be shared.
+    """
+
+    def __init__(self, commands: Collection[str] = DEFAULT_COALESCED_COMMANDS,
+                 ignored_fields: Collection[str] = DEFAULT_IGNORED_FIELDS):
+        """
+        :param commands: Names of the read commands allowed to be coalesced
+        :param ignored_fields: Body fields excluded from the comparison
+        """
+        self.commands = frozenset(commands)
+        self.ignored_fields = frozenset(ignored_fields)
+
+        self.sent = 0
+        self.coalesced = 0
+
+        self._in_flight: Dict[bytes, asyncio.Future] = {}
+
+    def key(self, operation: BaseOp) -> Optional[bytes]:
+        """
+        Returns coalescing key of the operation, or None if it should be sent as is
+        """
+        if not isinstance(operation, OpMsg) or operation.flag_bits or len(operation.sections) != 1:
+            return None
+        body = operation.sections[0]
+        if not isinstance(body, OpMsg.Body):
+            return None
+        data = body.data
+        command = next(iter(data), None)
+        if command not in self.commands or 'txnNumber' in data:
+            return None
+        if command == 'aggregate' and any(_WRITE_STAGES.intersection(stage) for stage in data.get('pipeline', [])):
+            return None
+        filtered = {k: v for k, v in data.items() if k not in self.ignored_fields}
+        return hashlib.blake2b(get_bson_parser().encode_object(filtered), digest_size=16).digest()
+
+    async def send(self, key: bytes, data: MongoWireMessage,
+                   send: Callable[[MongoWireMessage], Awaitable[MongoWireMessage]]) -> MongoWireMessage:
+        """
+        Waits for the identical request already in flight, or sends the message using send callable
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            self.sent += 1
+            in_flight = asyncio.ensure_future(send(data))
+            self._in_flight[key] = in_flight
+            try:
+                return await asyncio.shield(in_flight)
+            finally:
+                if self._in_flight.get(key) is in_flight:
+                    del self._in_flight[key]
+
+        reply = await asyncio.shield(in_flight)
+        if has_open_cursor(reply.operation):
+            self.sent += 1
+            return await send(data)
+        self.coalesced += 1
+        header = MessageHeader(request_id=reply.header.request_id, response_to=data.header.request_id)
+        return MongoWireMessage(operation=reply.operation, header=header)
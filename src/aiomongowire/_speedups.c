@@ -0,0 +1,279 @@
+/*
+ * Optional compiled implementation of the wire protocol codec helpers.
+ * Pure Python implementation with the same behaviour is in _codec.py, which falls back to it
+ * if this module is not built.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+#include <string.h>
+
+#define HEADER_LENGTH 16
+#define MIN_DOCUMENT_LENGTH 5
+
+static int32_t read_int32(const unsigned char *p)
+{
+    return (int32_t)((uint32_t)p[0] | ((uint32_t)p[1] << 8) | ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24));
+}
+
+static int64_t read_int64(const unsigned char *p)
+{
+    return (int64_t)((uint64_t)(uint32_t)read_int32(p) | ((uint64_t)(uint32_t)read_int32(p + 4) << 32));
+}
+
+static void write_int32(unsigned char *p, int32_t value)
+{
+    uint32_t v = (uint32_t)value;
+    p[0] = (unsigned char)v;
+    p[1] = (unsigned char)(v >> 8);
+    p[2] = (unsigned char)(v >> 16);
+    p[3] = (unsigned char)(v >> 24);
+}
+
+static int check_bounds(Py_buffer *view, Py_ssize_t offset, Py_ssize_t end)
+{
+    if (offset < 0 || end < offset || end > view->len) {
+        PyErr_SetString(PyExc_ValueError, "Offsets are out of the buffer bounds");
+        return -1;
+    }
+    return 0;
+}
+
+/*
+ * Appends (start, end) bounds of the BSON document at the offset, returns the document end or -1 on error
+ */
+static Py_ssize_t append_document(PyObject *documents, const unsigned char *data, Py_ssize_t offset,
+                                  Py_ssize_t end)
+{
+    int32_t length;
+    PyObject *bounds;
+
+    if (end - offset < 4) {
+        PyErr_Format(PyExc_ValueError, "Document length at offset %zd is out of bounds", offset);
+        return -1;
+    }
+    length = read_int32(data + offset);
+    if (length < MIN_DOCUMENT_LENGTH || length > end - offset) {
+        PyErr_Format(PyExc_ValueError, "Invalid document length %d at offset %zd", (int)length, offset);
+        return -1;
+    }
+    bounds = Py_BuildValue("(nn)", offset, offset + length);
+    if (bounds == NULL) {
+        return -1;
+    }
+    if (PyList_Append(documents, bounds) < 0) {
+        Py_DECREF(bounds);
+        return -1;
+    }
+    Py_DECREF(bounds);
+    return offset + length;
+}
+
+PyDoc_STRVAR(unpack_header_doc,
+"unpack_header(buffer, offset=0)\n--\n\n"
+"Standard message header at the offset: (message length, request id, response to, op code)");
+
+static PyObject *unpack_header(PyObject *self, PyObject *args)
+{
+    Py_buffer view;
+    Py_ssize_t offset = 0;
+    const unsigned char *p;
+    PyObject *result;
+
+    if (!PyArg_ParseTuple(args, "y*|n:unpack_header", &view, &offset)) {
+        return NULL;
+    }
+    if (offset < 0 || view.len - offset < HEADER_LENGTH) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "Buffer is too short for the message header");
+        return NULL;
+    }
+    p = (const unsigned char *)view.buf + offset;
+    result = Py_BuildValue("(iiii)", (int)read_int32(p), (int)read_int32(p + 4), (int)read_int32(p + 8),
+                           (int)read_int32(p + 12));
+    PyBuffer_Release(&view);
+    return result;
+}
+
+PyDoc_STRVAR(pack_header_doc,
+"pack_header(message_length, request_id, response_to, op_code)\n--\n\n"
+"Encoded standard message header");
+
+static PyObject *pack_header(PyObject *self, PyObject *args)
+{
+    int message_length, request_id, response_to, op_code;
+    unsigned char header[HEADER_LENGTH];
+
+    if (!PyArg_ParseTuple(args, "iiii:pack_header", &message_length, &request_id, &response_to, &op_code)) {
+        return NULL;
+    }
+    write_int32(header, message_length);
+    write_int32(header + 4, request_id);
+    write_int32(header + 8, response_to);
+    write_int32(header + 12, op_code);
+    return PyBytes_FromStringAndSize((const char *)header, HEADER_LENGTH);
+}
+
+PyDoc_STRVAR(walk_sections_doc,
+"walk_sections(buffer, offset, end)\n--\n\n"
+"OP_MSG sections between the offsets: list of (payload type, size, identifier, [(start, end), ...]).\n"
+"Identifier is None for the body section, documents are given by their bounds in the buffer");
+
+static PyObject *walk_sections(PyObject *self, PyObject *args)
+{
+    Py_buffer view;
+    Py_ssize_t offset, end;
+    const unsigned char *data;
+    PyObject *sections = NULL, *documents = NULL, *identifier = NULL, *section;
+
+    if (!PyArg_ParseTuple(args, "y*nn:walk_sections", &view, &offset, &end)) {
+        return NULL;
+    }
+    if (check_bounds(&view, offset, end) < 0) {
+        goto error;
+    }
+    data = (const unsigned char *)view.buf;
+    sections = PyList_New(0);
+    if (sections == NULL) {
+        goto error;
+    }
+    while (offset < end) {
+        unsigned char payload_type = data[offset++];
+        int32_t size;
+        Py_ssize_t section_end, position;
+
+        if (end - offset < 4) {
+            PyErr_SetString(PyExc_ValueError, "Section size is out of the message bounds");
+            goto error;
+        }
+        size = read_int32(data + offset);
+        if (size < 4 || size > end - offset) {
+            PyErr_Format(PyExc_ValueError, "Invalid section size %d at offset %zd", (int)size, offset);
+            goto error;
+        }
+        section_end = offset + size;
+        documents = PyList_New(0);
+        if (documents == NULL) {
+            goto error;
+        }
+        if (payload_type == 0) {
+            if (append_document(documents, data, offset, section_end) < 0) {
+                goto error;
+            }
+            identifier = Py_None;
+            Py_INCREF(identifier);
+        }
+        else if (payload_type == 1) {
+            const unsigned char *identifier_end = memchr(data + offset + 4, 0, (size_t)(size - 4));
+            if (identifier_end == NULL) {
+                PyErr_Format(PyExc_ValueError, "Section identifier at offset %zd is not terminated", offset);
+                goto error;
+            }
+            identifier = PyUnicode_DecodeUTF8((const char *)data + offset + 4,
+                                              identifier_end - (data + offset + 4), "strict");
+            if (identifier == NULL) {
+                goto error;
+            }
+            position = identifier_end - data + 1;
+            while (position < section_end) {
+                position = append_document(documents, data, position, section_end);
+                if (position < 0) {
+                    goto error;
+                }
+            }
+        }
+        else {
+            PyErr_Format(PyExc_ValueError, "Unknown section type for OpMsg: %d", (int)payload_type);
+            goto error;
+        }
+        section = Py_BuildValue("(iiNN)", (int)payload_type, (int)size, identifier, documents);
+        identifier = NULL;
+        documents = NULL;
+        if (section == NULL) {
+            goto error;
+        }
+        if (PyList_Append(sections, section) < 0) {
+            Py_DECREF(section);
+            goto error;
+        }
+        Py_DECREF(section);
+        offset = section_end;
+    }
+    PyBuffer_Release(&view);
+    return sections;
+
+error:
+    Py_XDECREF(identifier);
+    Py_XDECREF(documents);
+    Py_XDECREF(sections);
+    PyBuffer_Release(&view);
+    return NULL;
+}
+
+PyDoc_STRVAR(unpack_reply_doc,
+"unpack_reply(buffer, offset, end)\n--\n\n"
+"OP_REPLY fields following the header: (response flags, cursor id, starting from, number returned,\n"
+"[(start, end), ...]) with the bounds of the returned documents in the buffer");
+
+static PyObject *unpack_reply(PyObject *self, PyObject *args)
+{
+    Py_buffer view;
+    Py_ssize_t offset, end, position;
+    const unsigned char *data;
+    int32_t number_returned, i;
+    PyObject *documents = NULL, *result;
+
+    if (!PyArg_ParseTuple(args, "y*nn:unpack_reply", &view, &offset, &end)) {
+        return NULL;
+    }
+    if (check_bounds(&view, offset, end) < 0) {
+        goto error;
+    }
+    if (end - offset < 20) {
+        PyErr_SetString(PyExc_ValueError, "Buffer is too short for OP_REPLY");
+        goto error;
+    }
+    data = (const unsigned char *)view.buf;
+    number_returned = read_int32(data + offset + 16);
+    documents = PyList_New(0);
+    if (documents == NULL) {
+        goto error;
+    }
+    position = offset + 20;
+    for (i = 0; i < number_returned; i++) {
+        position = append_document(documents, data, position, end);
+        if (position < 0) {
+            goto error;
+        }
+    }
+    result = Py_BuildValue("(iLiiN)", (int)read_int32(data + offset), (long long)read_int64(data + offset + 4),
+                           (int)read_int32(data + offset + 12), (int)number_returned, documents);
+    PyBuffer_Release(&view);
+    return result;
+
+error:
+    Py_XDECREF(documents);
+    PyBuffer_Release(&view);
+    return NULL;
+}
+
+static PyMethodDef speedups_methods[] = {
+    {"unpack_header", unpack_header, METH_VARARGS, unpack_header_doc},
+    {"pack_header", pack_header, METH_VARARGS, pack_header_doc},
+    {"walk_sections", walk_sections, METH_VARARGS, walk_sections_doc},
+    {"unpack_reply", unpack_reply, METH_VARARGS, unpack_reply_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT,
+    "aiomongowire._speedups",
+    "Compiled wire protocol codec helpers, see _codec.py",
+    -1,
+    speedups_methods
+};
+
+PyMODINIT_FUNC PyInit__speedups(void)
+{
+    return PyModule_Create(&speedups_module);
+}
@@ -0,0 +1,104 @@
+import io
+import mmap
+import tempfile
+from typing import Optional, Union
+
+
+class SpillFile:
+    """
+    Append-only anonymous temporary file, read back through mmap
+
+    Views are backed by the page cache instead of the Python heap. The file is unlinked right away,
+    its space is freed once the file is closed and the last view is released.
+    """
+    __slots__ = ['_file', '_map', '_size']
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        :param directory: Directory for the temporary file, system default one if not set
+        """
+        self._file = tempfile.TemporaryFile(dir=directory, buffering=0)
+        self._map: Optional[mmap.mmap] = None
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def write(self, data: Union[bytes, bytearray, memoryview]) -> int:
+        """
+        Appends data to the file
+
+        :return: Offset of the data in the file
+        """
+        offset = self._size
+        with memoryview(data) as view:
+            while view:
+                written = self._file.write(view)
+                view = view[written:]
+        self._size += len(data)
+        return offset
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        Returns writable mmap-backed view of the written data. Views stay valid after the file is closed
+        """
+        if self._map is None or offset + length > len(self._map):
+            # Old mapping stays alive as long as there are views of it
+            self._map = mmap.mmap(self._file.fileno(), self._size)
+        return memoryview(self._map)[offset:offset + length]
+
+    def close(self):
+        self._map = None
+        self._file.close()
+
+
+class BufferReader:
+    """
+    Read-only BytesIO lookalike over a memoryview, used to decode spilled frames without copying them to the heap.
+    Only the reads are copied
+    """
+    __slots__ = ['_view', '_position']
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._position
+        end = len(self._view) if size < 0 else min(start + size, len(self._view))
+        self._position = end
+        return bytes(self._view[start:end])
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = offset
+        return offset
+
+    def getbuffer(self) -> memoryview:
+        return self._view[:]
+
+    def getvalue(self) -> bytes:
+        return bytes(self._view)
+
+    def __enter__(self) -> 'BufferReader':
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def reader_view(data: Union[io.BytesIO, BufferReader]) -> memoryview:
+    """
+    Whole data of the reader as a memoryview, without copying.
+    BytesIO.getbuffer copies the bytes BytesIO was created from to unshare them, getvalue returns them as is
+    """
+    if isinstance(data, BufferReader):
+        return data.getbuffer()
+    return memoryview(data.getvalue())
@@ -0,0 +1,171 @@
+import struct
+from typing import Union, List, Tuple, Any
+
+from ._bson import get_bson_parser
+from ._op_msg import OpMsg
+
+_BSON_DOCUMENT = b'\x03'
+_BSON_ARRAY = b'\x04'
+
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+_DOUBLE = struct.Struct('<d')
+
+# Template opcodes
+_CONST = 0  # append pre-encoded bytes
+_VALUE = 1  # append encoded placeholder value
+_MARK = 2  # remember the position of the length field of the nested document written just before
+_CLOSE = 3  # terminate the current document and patch its length
+
+
+class Placeholder:
+    """
+    Variable field of the command template, value is given by name on render
+    """
+    __slots__ = ['name']
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"Placeholder({self.name!r})"
+
+
+def encode_element(name: str, key: bytes, value: Any) -> bytes:
+    """
+    Encodes single BSON element. Common scalar types are encoded directly, others go through the BSON parser
+
+    :param name: Element name
+    :param key: Element name encoded as cstring
+    :param value: Element value
+    """
+    value_type = type(value)
+    if value_type is int:
+        if -0x80000000 <= value <= 0x7fffffff:
+            return b'\x10' + key + _INT32.pack(value)
+        if -0x8000000000000000 <= value <= 0x7fffffffffffffff:
+            return b'\x12' + key + _INT64.pack(value)
+    elif value_type is str:
+        encoded = value.encode()
+        return b'\x02' + key + _INT32.pack(len(encoded) + 1) + encoded + b'\x00'
+    elif value_type is float:
+        return b'\x01' + key + _DOUBLE.pack(value)
+    elif value_type is bool:
+        return b'\x08' + key + (b'\x01' if value else b'\x00')
+    elif value is None:
+        return b'\x0a' + key
+    return get_bson_parser().encode_object({name: value})[4:-1]
+
+
+def _has_placeholder(value: Any) -> bool:
+    if isinstance(value, Placeholder):
+        return True
+    if isinstance(value, dict):
+        return any(_has_placeholder(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_placeholder(v) for v in value)
+    return False
+
+
+def _compile(document: Union[dict, list, tuple], ops: List[Tuple]):
+    """
+    Appends ops encoding document elements and its terminator. Length prefix should be written by the caller
+    """
+    if not isinstance(document, dict):
+        document = {str(i): v for i, v in enumerate(document)}
+    bson_parser = get_bson_parser()
+    for name, value in document.items():
+        key = bson_parser.encode_cstring(name)
+        if isinstance(value, Placeholder):
+            ops.append((_VALUE, name, key, value.name))
+        elif _has_placeholder(value):
+            element_type = _BSON_DOCUMENT if isinstance(value, dict) else _BSON_ARRAY
+            ops.append((_CONST, element_type + key + b'\x00\x00\x00\x00'))
+            ops.append((_MARK,))
+            _compile(value, ops)
+        else:
+            ops.append((_CONST, bson_parser.encode_object({name: value})[4:-1]))
+    ops.append((_CLOSE,))
+
+
+def _linearize(ops: List[Tuple]) -> Tuple[List[bytes], List[Tuple[str, bytes, str]], List[Tuple[int, int, int, int]]]:
+    """
+    Converts ops into constant segments interleaved with variables, and length fields to patch.
+    Length field is (offset without variables, variables before it, variables after the document end,
+    document length without variables)
+    """
+    segments = [b'']
+    variables = []
+    lengths = []
+    starts = []
+    position = 0
+    for op in ops:
+        code = op[0]
+        if code == _CONST:
+            segments[-1] += op[1]
+            position += len(op[1])
+        elif code == _VALUE:
+            variables.append(op[1:])
+            segments.append(b'')
+        elif code == _MARK:
+            starts.append((position - 4, len(variables)))
+        else:
+            segments[-1] += b'\x00'
+            position += 1
+            start, first_variable = starts.pop()
+            lengths.append((start, first_variable, len(variables), position - start))
+    return segments, variables, lengths
+
+
+class CommandTemplate:
+    """
+    OP_MSG body with pre-encoded invariant fields
+
+    Constant fields are encoded once, on render only the placeholders are encoded and spliced in,
+    with the document lengths patched in place. Placeholders can be nested in documents and arrays.
+
+    Example::
+
+        find_by_id = CommandTemplate({'find': 'coll', 'filter': {'_id': Placeholder('id')}, '$db': 'test'})
+        operation = OpMsg(sections=[find_by_id.render(id=42)])
+    """
+    __slots__ = ['_head', '_variables', '_lengths']
+
+    def __init__(self, template: dict):
+        ops = [(_CONST, b'\x00\x00\x00\x00'), (_MARK,)]
+        _compile(template, ops)
+        segments, variables, self._lengths = _linearize(ops)
+        self._head = segments[0]
+        # Each variable is followed by the constant segment
+        self._variables = [variable + (segment,) for variable, segment in zip(variables, segments[1:])]
+
+    def _encode(self, values: dict) -> bytearray:
+        parts = [self._head]
+        offsets = [0]
+        offset = 0
+        for name, key, placeholder, segment in self._variables:
+            element = encode_element(name, key, values[placeholder])
+            offset += len(element)
+            offsets.append(offset)
+            parts += (element, segment)
+        out = bytearray().join(parts)
+        for start, first_variable, end_variable, length in self._lengths:
+            before = offsets[first_variable]
+            _INT32.pack_into(out, start + before, length + offsets[end_variable] - before)
+        return out
+
+    def encode(self, **values) -> bytes:
+        """
+        Encodes the command with placeholders replaced by values
+
+        :raises KeyError: If placeholder value is missing
+        """
+        return bytes(self._encode(values))
+
+    def render(self, **values) -> OpMsg.RawBody:
+        """
+        Builds OP_MSG body section with placeholders replaced by values
+
+        :raises KeyError: If placeholder value is missing
+        """
+        return OpMsg.RawBody(self._encode(values))
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import random
+import traceback
+from enum import Enum
+from typing import List, Optional, Dict, Callable, Awaitable, Union, Tuple
+
+from ._message import MongoWireMessage
+from ._op_msg import OpMsg
+from ._op_query import OpQuery
+from ._op_reply import OpReply
+from ._pool import ConnectionPool
+from ._protocol import MongoWireProtocol
+
+# Wire version of MongoDB 3.6, the first one supporting OP_MSG
+_OP_MSG_WIRE_VERSION = 6
+
+
+class ServerSelectionException(Exception):
+    def __init__(self, read_preference: 'ReadPreference') -> None:
+        super().__init__(f"No server available for read preference {read_preference.value}")
+
+
+class ServerRole(Enum):
+    """
+    Server role as reported by hello/isMaster
+    """
+    UNKNOWN = 'unknown'
+    STANDALONE = 'standalone'
+    MONGOS = 'mongos'
+    PRIMARY = 'primary'
+    SECONDARY = 'secondary'
+    ARBITER = 'arbiter'
+    OTHER = 'other'
+
+
+class ReadPreference(Enum):
+    """
+    Read preference modes
+    https://docs.mongodb.com/manual/core/read-preference/#read-preference-modes
+    """
+    PRIMARY = 'primary'
+    PRIMARY_PREFERRED = 'primaryPreferred'
+    SECONDARY = 'secondary'
+    SECONDARY_PREFERRED = 'secondaryPreferred'
+    NEAREST = 'nearest'
+
+
+# Roles which accept writes, a single one of them is expected in the deployment
+_WRITABLE_ROLES = {ServerRole.PRIMARY, ServerRole.STANDALONE, ServerRole.MONGOS}
+
+
+class ServerDescription:
+    """
+    Monitored server state
+    """
+    __slots__ = ['host', 'port', 'role', 'round_trip_time', 'hello', 'error', 'pool', '_monitor', '_monitor_transport']
+
+    def __init__(self, host: str, port: int, pool: ConnectionPool):
+        self.host = host
+        self.port = port
+        self.pool = pool
+        self.role = ServerRole.UNKNOWN
+        self.round_trip_time: Optional[float] = None  # moving average, seconds
+        self.hello: Dict = {}
+        self.error: Optional[Exception] = None
+        self._monitor: Optional[MongoWireProtocol] = None
+        self._monitor_transport: Optional[asyncio.BaseTransport] = None
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def max_wire_version(self) -> int:
+        return self.hello.get('maxWireVersion', 0)
+
+    def update(self, hello: dict, round_trip_time: float, alpha: float):
+        """
+        Updates the role from hello reply and adds round trip time sample to the moving average
+        """
+        self.hello = hello
+        self.error = None
+        if self.round_trip_time is None:
+            self.round_trip_time = round_trip_time
+        else:
+            self.round_trip_time = alpha * round_trip_time + (1 - alpha) * self.round_trip_time
+
+        if hello.get('msg') == 'isdbgrid':
+            self.role = ServerRole.MONGOS
+        elif hello.get('isWritablePrimary') or hello.get('ismaster'):
+            self.role = ServerRole.PRIMARY if 'setName' in hello else ServerRole.STANDALONE
+        elif hello.get('secondary'):
+            self.role = ServerRole.SECONDARY
+        elif hello.get('arbiterOnly'):
+            self.role = ServerRole.ARBITER
+        else:
+            self.role = ServerRole.OTHER
+
+    def reset(self, error: Exception):
+        self.role = ServerRole.UNKNOWN
+        self.round_trip_time = None
+        self.error = error
+
+    def __str__(self):
+        return f"ServerDescription: {self.address}, role: {self.role.value}, rtt: {self.round_trip_time}"
+
+
+class Topology:
+    """
+    Client for several hosts of a deployment
+
+    Each host is monitored with periodic hello over a dedicated connection, which tracks its role
+    and the moving average of the round trip time. Every host has its own connection pool.
+    Reads go to the lowest latency eligible server within the latency window, writes go to the primary.
+    """
+
+    def __init__(self, hosts: List[Union[str, Tuple[str, int]]], pool_size: int = 4, heartbeat_interval: float = 10.0,
+                 latency_window: float = 0.015, rtt_alpha: float = 0.2,
+                 protocol_factory: Callable[[], MongoWireProtocol] = MongoWireProtocol):
+        """
+        :param hosts: Hosts as "host:port" strings or (host, port) tuples
+        :param pool_size: Number of connections to each host
+        :param heartbeat_interval: Seconds between the hello checks
+        :param latency_window: Seconds above the lowest round trip time within which servers are picked randomly
+        :param rtt_alpha: Weight of the new sample in the round trip time moving average
+        :param protocol_factory: Factory for the pool connections
+        """
+        self.heartbeat_interval = heartbeat_interval
+        self.latency_window = latency_window
+        self.rtt_alpha = rtt_alpha
+        self.servers: List[ServerDescription] = []
+        for host in hosts:
+            if isinstance(host, str):
+                name, _, port = host.partition(':')
+                host = (name, int(port or 27017))
+            pool = ConnectionPool(host[0], host[1], size=pool_size, protocol_factory=protocol_factory)
+            self.servers.append(ServerDescription(host[0], host[1], pool))
+        self._monitor_tasks: List[asyncio.Future] = []
+        self._logger = logging.getLogger('aiomongowire')
+
+    async def connect(self):
+        """
+        Checks all hosts and starts monitoring
+        """
+        await asyncio.gather(*[self.check(server) for server in self.servers])
+        self._monitor_tasks = [asyncio.ensure_future(self._monitor(server)) for server in self.servers]
+
+    async def check(self, server: ServerDescription):
+        """
+        Sends hello to the server and updates its description
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if server._monitor is None or not server._monitor.connected:
+                server._monitor_transport, server._monitor = await loop.create_connection(MongoWireProtocol,
+                                                                                          server.host, server.port)
+            started = loop.time()
+            hello = await self._hello(server)
+            round_trip_time = loop.time() - started
+            if not server.pool.connected:
+                await server.pool.connect()
+        except Exception as exc:
+            self._logger.warning(f"Server {server.address} check failed: {exc}")
+            server.reset(exc)
+            return
+        server.update(hello, round_trip_time, self.rtt_alpha)
+
+    async def _hello(self, server: ServerDescription) -> dict:
+        if server.max_wire_version >= _OP_MSG_WIRE_VERSION:
+            command = 'hello' if server.hello.get('helloOk') or 'isWritablePrimary' in server.hello else 'isMaster'
+            operation = OpMsg(sections=[OpMsg.Body({command: 1, '$db': 'admin'})])
+        else:
+            operation = OpQuery(full_collection_name='admin.$cmd', query={'isMaster': 1, 'helloOk': True},
+                                number_to_return=1)
+        result: MongoWireMessage = await server._monitor.send_data(MongoWireMessage(operation=operation))
+        if isinstance(result.operation, OpReply):
+            return result.operation.documents[0]
+        return result.operation.sections[0].data
+
+    async def _monitor(self, server: ServerDescription):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.check(server)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._logger.error(traceback.format_exc())
+
+    def select_server(self, read_preference: ReadPreference = ReadPreference.PRIMARY) -> ServerDescription:
+        """
+        Selects server for the request
+
+        :raises ServerSelectionException: If there is no suitable server
+        """
+        primaries = [s for s in self.servers if s.role in _WRITABLE_ROLES]
+        secondaries = [s for s in self.servers if s.role == ServerRole.SECONDARY]
+        if read_preference == ReadPreference.PRIMARY:
+            candidates = primaries
+        elif read_preference == ReadPreference.PRIMARY_PREFERRED:
+            candidates = primaries or secondaries
+        elif read_preference == ReadPreference.SECONDARY:
+            candidates = secondaries
+        elif read_preference == ReadPreference.SECONDARY_PREFERRED:
+            candidates = secondaries or primaries
+        else:
+            candidates = primaries + secondaries
+        if not candidates:
+            raise ServerSelectionException(read_preference)
+
+        fastest = min(server.round_trip_time for server in candidates)
+        return random.choice([server for server in candidates
+                              if server.round_trip_time <= fastest + self.latency_window])
+
+    def send_data(self, data: MongoWireMessage,
+                  read_preference: ReadPreference = ReadPreference.PRIMARY) -> Awaitable[MongoWireMessage]:
+        """
+        Sends message to the server selected by the read preference, writes should always use the primary.
+        Operation should allow secondary reads itself if needed, e.g. with OpQuery.Flags.SLAVE_OK or $readPreference
+
+        :raises ServerSelectionException: If there is no suitable server
+        """
+        return self.select_server(read_preference).pool.send_data(data)
+
+    def close(self):
+        for task in self._monitor_tasks:
+            task.cancel()
+        self._monitor_tasks.clear()
+        for server in self.servers:
+            if server._monitor_transport is not None:
+                server._monitor_transport.close()
+                server._monitor_transport = server._monitor = None
+            server.pool.close()
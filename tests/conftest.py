@@ -0,0 +1,72 @@
+import asyncio
+from typing import Callable, Optional, List, Tuple
+
+import pytest_asyncio
+
+import src.aiomongowire as aiomongowire
+from tests.fake_server import FakeMongoProtocol, echo_handler, server_port
+
+
+class FakeServer:
+    """
+    Fake server started for a test, with the client connections made to it
+    """
+
+    def __init__(self, server: asyncio.AbstractServer, protocol: Optional[asyncio.Protocol]):
+        """
+        :param server: Listening server
+        :param protocol: Protocol shared by all the server side connections, None if each gets its own
+        """
+        self.server = server
+        self.protocol = protocol
+        self.port = server_port(server)
+        self._transports: List[asyncio.BaseTransport] = []
+
+    async def connect(self, protocol_factory: Callable[[], asyncio.Protocol] = aiomongowire.MongoWireProtocol) \
+            -> Tuple[asyncio.Transport, asyncio.Protocol]:
+        """
+        Connects a client, the connection is closed on teardown
+        """
+        transport, protocol = await asyncio.get_event_loop().create_connection(protocol_factory, '127.0.0.1',
+                                                                               self.port)
+        self._transports.append(transport)
+        return transport, protocol
+
+    def close(self):
+        for transport in self._transports:
+            transport.close()
+        self.server.close()
+
+
+@pytest_asyncio.fixture
+async def fake_server():
+    """
+    Starts fake servers, they and their client connections are closed on teardown, even if the test fails.
+    Servers reply with the handler, or use the given protocol for all the connections
+
+    Example::
+
+        server = await fake_server(handler)
+        transport, protocol = await server.connect()
+    """
+    servers = []
+
+    async def start(handler: Callable[[dict], Optional[dict]] = echo_handler,
+                    protocol: Optional[asyncio.Protocol] = None, shared: bool = True) -> FakeServer:
+        """
+        :param handler: Replies to the commands
+        :param protocol: Server protocol, FakeMongoProtocol with the handler by default
+        :param shared: All the connections use the same server protocol, otherwise each gets a new one
+        """
+        loop = asyncio.get_event_loop()
+        if shared:
+            protocol = protocol or FakeMongoProtocol(handler)
+            server = await loop.create_server(lambda: protocol, '127.0.0.1', 0)
+        else:
+            server = await loop.create_server(lambda: FakeMongoProtocol(handler), '127.0.0.1', 0)
+        servers.append(FakeServer(server, protocol))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,71 @@
+import asyncio
+import io
+from typing import Optional, Callable
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, MessageHeader, FrameBuffer, RawFrame, get_bson_parser
+
+
+def echo_handler(body: dict) -> dict:
+    return {'ok': 1.0, 'echo': body}
+
+
+class FakeMongoProtocol(asyncio.Protocol):
+    """
+    Minimal server side of the wire protocol, replies to OP_MSG bodies and OP_QUERY queries using the handler.
+    Compressed OP_MSG requests get compressed replies
+    """
+
+    def __init__(self, handler: Callable[[dict], Optional[dict]] = echo_handler):
+        self.handler = handler
+        self.received = []
+        self.compressed = 0
+        self._frames = FrameBuffer()
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data: bytes):
+        for frame in self._frames.feed(data):
+            compressor = None
+            if frame.op_code == aiomongowire.OpQuery.op_code:
+                command = _parse_query(frame)
+            else:
+                with io.BytesIO(frame.data) as recv:
+                    operation = MongoWireMessage.from_data(recv).operation
+                if frame.op_code == aiomongowire.OpCompressed.op_code:
+                    # Replies are compressed with the compressor of the request
+                    compressor, operation = operation.compressor, operation.original_msg
+                    self.compressed += 1
+                if not operation.has_reply:
+                    self.received.append(None)
+                    continue
+                command = operation.sections[0].data
+            self.received.append(command)
+
+            reply = self.handler(command)
+            if reply is None:
+                continue
+            if frame.op_code == aiomongowire.OpQuery.op_code:
+                operation = aiomongowire.OpReply(cursor_id=0, starting_from=0, number_returned=1, documents=[reply])
+            else:
+                operation = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body(reply)])
+            if compressor is not None:
+                operation = aiomongowire.OpCompressed(compressor, operation)
+            header = MessageHeader(response_to=frame.request_id)
+            self._transport.write(bytes(MongoWireMessage(operation=operation, header=header)))
+
+
+def _parse_query(frame: RawFrame) -> dict:
+    """
+    Extracts query document from OP_QUERY frame
+    """
+    data = bytes(frame.data)
+    offset = data.index(b'\x00', 20) + 1 + 8  # flags, collection name, skip and return
+    length = int.from_bytes(data[offset:offset + 4], byteorder='little')
+    return get_bson_parser().decode_object(data[offset:offset + length])
+
+
+def server_port(server: asyncio.AbstractServer) -> int:
+    return server.sockets[0].getsockname()[1]
@@ -0,0 +1,40 @@
+"""
+Hypothesis strategies for the wire protocol ops, shared by the round trip and fuzz tests
+"""
+from hypothesis import strategies as st
+
+from src.aiomongowire import OpMsg, OpReply, OpQuery, OpInsert, OpUpdate, OpDelete, OpGetMore, OpKillCursors, \
+    MongoWireMessage, MessageHeader
+
+int32 = st.integers(min_value=-(1 << 31), max_value=(1 << 31) - 1)
+int64 = st.integers(min_value=-(1 << 63), max_value=(1 << 63) - 1)
+uint32 = st.integers(min_value=0, max_value=(1 << 32) - 1)
+cstrings = st.text(st.characters(blacklist_characters='\x00', blacklist_categories=('Cs',)), max_size=20)
+namespaces = st.builds(lambda db, collection: f"{db}.{collection}", cstrings.filter(bool), cstrings.filter(bool))
+
+_scalars = st.one_of(st.none(), st.booleans(), int64, st.floats(allow_nan=False), cstrings, st.binary(max_size=20))
+_values = st.recursive(_scalars, lambda children: st.one_of(
+    st.lists(children, max_size=4), st.dictionaries(cstrings, children, max_size=4)), max_leaves=10)
+documents = st.dictionaries(cstrings, _values, max_size=5)
+
+op_msgs = st.builds(
+    lambda body, sequences: OpMsg(sections=[OpMsg.Body(body)] + [
+        OpMsg.Document(0, identifier, docs) for identifier, docs in sequences]),
+    documents, st.lists(st.tuples(cstrings, st.lists(documents, max_size=3)), max_size=2))
+op_replies = st.builds(
+    lambda flags, cursor_id, starting_from, docs: OpReply(cursor_id=cursor_id, starting_from=starting_from,
+                                                           number_returned=len(docs), documents=docs,
+                                                           response_flags=flags),
+    st.integers(min_value=0, max_value=15), int64, int32, st.lists(documents, max_size=3))
+op_queries = st.builds(OpQuery, full_collection_name=namespaces, query=documents, number_to_skip=int32,
+                       number_to_return=int32, return_fields_selector=st.none() | documents, flags=uint32)
+op_inserts = st.builds(OpInsert, full_collection_name=namespaces, documents=st.lists(documents, min_size=1, max_size=3),
+                       flags=int32)
+op_updates = st.builds(OpUpdate, full_collection_name=namespaces, selector=documents, update=documents, flags=uint32)
+op_deletes = st.builds(OpDelete, full_collection_name=namespaces, selector=documents, flags=uint32)
+op_get_mores = st.builds(OpGetMore, full_collection_name=namespaces, number_to_return=int32, cursor_id=int64)
+op_kill_cursors = st.lists(int64, max_size=4).map(lambda ids: OpKillCursors(len(ids), ids))
+
+ops = st.one_of(op_msgs, op_replies, op_queries, op_inserts, op_updates, op_deletes, op_get_mores, op_kill_cursors)
+messages = st.builds(lambda operation, request_id, response_to: MongoWireMessage(
+    operation=operation, header=MessageHeader(request_id=request_id, response_to=response_to)), ops, int32, int32)
@@ -0,0 +1,90 @@
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, OpMsg, OpReply, OpQuery, OpGetMore, RawFrame, BatchSizeTuner
+from src.aiomongowire._batch_tuner import reply_batch, cursor_namespace
+from src.aiomongowire._handshake import hello_operation
+
+
+def test_batch_size_follows_document_size():
+    tuner = BatchSizeTuner(target_bytes=100000, initial_batch=100)
+    # 100 byte documents: grows by at most 2x per batch up to 1000
+    sizes = [tuner.observe('test.coll', 100, 100 * 100, 0.01) for _ in range(5)]
+    assert sizes == [200, 400, 800, 1000, 1000]
+    # Documents get larger: shrinks right away
+    assert tuner.observe('test.coll', 10, 10 * 10000, 0.01) < 1000
+    assert tuner.observe('test.coll', 0, 0, 0.01) == tuner.batch_size('test.coll')
+    assert tuner.batch_size('test.other') == 100
+
+
+def test_latency_and_hard_cap():
+    tuner = BatchSizeTuner(target_bytes=10 ** 9, target_latency=0.1, max_bytes=50000, initial_batch=1000)
+    # 1 ms per document: latency limits to 100
+    assert tuner.observe('a.b', 1000, 1000, 1.0) == 100
+    # Large documents: the cap wins over the targets
+    assert tuner.observe('a.c', 10, 10 * 10000, 0.0) == 5
+    assert BatchSizeTuner(min_batch=2).observe('a.d', 1, 10 ** 9, 0.0) == 2
+
+
+def test_apply():
+    tuner = BatchSizeTuner(initial_batch=7)
+    find = OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})])
+    aggregate = OpMsg(sections=[OpMsg.RawBody(aiomongowire.get_bson_parser().encode_object(
+        {'aggregate': 'coll', 'pipeline': [], 'cursor': {}, '$db': 'test'}))])
+    get_more = OpMsg(sections=[OpMsg.Body({'getMore': 1, 'collection': 'coll', '$db': 'test'})])
+    assert cursor_namespace(find) == cursor_namespace(get_more) == 'test.coll'
+    tuner.apply(find)
+    tuner.apply(aggregate)
+    tuner.apply(get_more)
+    assert find.sections[0].data['batchSize'] == 7 and get_more.sections[0].data['batchSize'] == 7
+    assert aiomongowire.get_bson_parser().decode_object(aggregate.sections[0].raw)['cursor'] == {'batchSize': 7}
+
+    query, single = OpQuery('test.coll', {}, number_to_return=0), OpQuery('test.coll', {}, number_to_return=-1)
+    legacy_more = OpGetMore('test.coll', 0, 5)
+    for operation in (query, single, legacy_more):
+        tuner.apply(operation)
+    assert (query.number_to_return, single.number_to_return, legacy_more.number_to_return) == (7, -1, 7)
+
+    # Query of a single document would close the cursor
+    tuner = BatchSizeTuner(initial_batch=1)
+    query, legacy_more = OpQuery('test.coll', {}, number_to_return=0), OpGetMore('test.coll', 0, 5)
+    tuner.apply(query)
+    tuner.apply(legacy_more)
+    assert (query.number_to_return, legacy_more.number_to_return) == (2, 1)
+
+    # findOne-like query and OP_QUERY commands have no cursor to tune
+    find_one = OpQuery('test.coll', {'_id': 1}, number_to_return=1)
+    hello = hello_operation()
+    tuner.apply(find_one)
+    tuner.apply(hello)
+    assert find_one.number_to_return == 1 and hello.number_to_return == 1
+    assert cursor_namespace(hello) is None and 'admin.$cmd' not in tuner._estimates
+
+    insert = OpMsg(sections=[OpMsg.Body({'insert': 'coll', '$db': 'test'})])
+    assert cursor_namespace(insert) is None and 'batchSize' not in tuner.apply(insert).sections[0].data
+
+
+def test_reply_batch():
+    reply = OpMsg(sections=[OpMsg.Body({'cursor': {'nextBatch': [{'a': i} for i in range(3)], 'id': 9,
+                                                   'ns': 'test.coll'}, 'ok': 1.0})])
+    assert reply_batch(RawFrame(bytes(MongoWireMessage(operation=reply)))) == (3, 9)
+    legacy = OpReply(cursor_id=5, starting_from=0, number_returned=2, documents=[{}, {}])
+    assert reply_batch(RawFrame(bytes(MongoWireMessage(operation=legacy)))) == (2, 5)
+    error = OpMsg(sections=[OpMsg.Body({'ok': 0.0})])
+    assert reply_batch(RawFrame(bytes(MongoWireMessage(operation=error)))) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_send_over_connection(fake_server):
+    def handler(body):
+        batch = [{'_id': i, 'pad': 'x' * 100} for i in range(body.get('batchSize', 101))]
+        return {'cursor': {'firstBatch': batch, 'id': 1, 'ns': 'test.coll'}, 'ok': 1.0}
+
+    server = await fake_server(handler)
+    _, protocol = await server.connect()
+    tuner = BatchSizeTuner(target_bytes=64 * 1024, initial_batch=10)
+    for _ in range(4):
+        message = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})]))
+        reply = await tuner.send(protocol.send_frame, message)
+        assert reply_batch(reply)[0] == message.operation.sections[0].data['batchSize']
+    assert tuner.batch_size('test.coll') == 160 and tuner.estimate('test.coll').batches == 4
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import BufferPool, MessagePool, BufferedMongoWireProtocol
+
+
+def test_buffer_pool():
+    pool = BufferPool(max_bytes=4096, min_size=1024, max_size=2048, idle_time=60)
+    buffer = pool.acquire(1500)
+    assert len(buffer) == 2048
+    pool.release(buffer)
+    assert pool.acquire(1025) is buffer
+    assert (pool.hits, pool.misses) == (1, 1)
+
+    pool.release(buffer)
+    pool.release(bytearray(2048))
+    pool.release(bytearray(2048))  # above max_bytes
+    pool.release(bytearray(4096))  # above max_size
+    pool.release(bytearray(1500))  # not a size class
+    assert pool.retained_bytes == 4096
+    assert pool.dropped == 3
+
+
+def test_buffer_pool_shrink():
+    pool = BufferPool(idle_time=60)
+    buffers = [pool.acquire(1024) for _ in range(4)]
+    for buffer in buffers:
+        pool.release(buffer)
+    pool.shrink()
+    pool.release(pool.acquire(1024))
+    pool.shrink()
+
+    assert pool.retained_bytes == 1024
+
+
+def test_message_pool():
+    pool = MessagePool(max_size=1)
+    operation = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': 1})])
+    message = pool.acquire(operation, request_id=1)
+    other = pool.acquire(operation)
+    pool.release(message)
+    pool.release(other)  # above max_size
+
+    reused = pool.acquire(operation, request_id=2, response_to=3)
+    assert reused is message
+    assert (reused.header.request_id, reused.header.response_to) == (2, 3)
+    assert reused.operation is operation
+    assert (pool.hits, pool.misses, pool.dropped) == (1, 2, 1)
+
+
+def test_section_slots():
+    body = aiomongowire.OpMsg.Insert('test', 'coll')
+    with pytest.raises(AttributeError):
+        body.extra = 1
+    assert not hasattr(aiomongowire.OpMsg.RawBody(b'\x05\x00\x00\x00\x00'), '__dict__')
+
+
+@pytest.mark.asyncio
+async def test_pooled_protocol(fake_server):
+    server = await fake_server()
+    buffer_pool = BufferPool()
+    message_pool = MessagePool()
+    transport, protocol = await server.connect(
+        lambda: BufferedMongoWireProtocol(buffer_pool=buffer_pool, message_pool=message_pool))
+
+    for i in range(5):
+        message = message_pool.acquire(aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': i})]))
+        reply = await protocol.send_data(message)
+        assert reply.operation.sections[0].data['echo'] == {'ping': i}
+    assert message_pool.hits == 4
+    assert buffer_pool.hits >= 4
+
+    transport.close()
+    await asyncio.sleep(0)
+    assert buffer_pool.retained_bytes >= 64 * 1024
@@ -0,0 +1,121 @@
+import asyncio
+import io
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, OpMsg
+
+
+class _FakeInserts:
+    """
+    Collects sent insert batches, fails documents with the bad field
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, message: MongoWireMessage) -> MongoWireMessage:
+        # Round trip through the encoding to check the document sequence
+        with io.BytesIO(bytes(message)) as data:
+            sections = MongoWireMessage.from_data(data).operation.sections
+        body, documents = sections[0].data, sections[1].documents
+        assert body['insert'] == 'coll' and sections[1].identifier == 'documents'
+        self.batches.append(documents)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        errors = [{'index': i, 'code': 11000, 'errmsg': 'duplicate key'}
+                  for i, document in enumerate(documents) if document.get('bad')]
+        reply = {'ok': 1.0, 'n': len(documents) - len(errors)}
+        if errors:
+            reply['writeErrors'] = errors
+        return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(reply)]))
+
+
+@pytest.mark.asyncio
+async def test_batching_and_write_errors():
+    inserts = _FakeInserts(delay=0.01)
+    writer = aiomongowire.BulkWriter(inserts.send, 'test', 'coll', max_documents=10, max_in_flight=2)
+    futures = [writer.add({'_id': i, 'bad': i == 13}) for i in range(45)]
+    await writer.flush()
+
+    assert [len(batch) for batch in inserts.batches] == [10, 10, 10, 10, 5]
+    assert inserts.max_in_flight == 2
+    assert [document['_id'] for batch in inserts.batches for document in batch] == list(range(45))
+    for i, future in enumerate(futures):
+        if i == 13:
+            assert isinstance(future.exception(), aiomongowire.BulkWriteException)
+            assert future.exception().error['code'] == 11000
+        else:
+            assert future.result() is None
+
+
+@pytest.mark.asyncio
+async def test_ordered_skips_rest_of_batch():
+    inserts = _FakeInserts()
+    writer = aiomongowire.BulkWriter(inserts.send, 'test', 'coll', ordered=True)
+    futures = [writer.add({'_id': i, 'bad': i == 2}) for i in range(5)]
+    await writer.close()
+    assert [future.exception() is None for future in futures] == [True, True, False, False, False]
+    with pytest.raises(RuntimeError):
+        writer.add({'_id': 5})
+
+
+@pytest.mark.asyncio
+async def test_linger_and_byte_limits():
+    inserts = _FakeInserts()
+    writer = aiomongowire.BulkWriter(inserts.send, 'test', 'coll', max_bytes=1000, linger=0.01)
+    document = aiomongowire.get_bson_parser().encode_object({'data': 'x' * 300})
+    futures = [writer.add(document) for _ in range(4)]
+    # Full batches go right away, the rest waits for the linger time
+    assert writer.pending == 1
+    await asyncio.sleep(0.05)
+    assert writer.pending == 0
+    await asyncio.gather(*futures)
+    assert [len(batch) for batch in inserts.batches] == [3, 1]
+
+
+@pytest.mark.asyncio
+async def test_send_failure_and_command_error():
+    async def fail(message):
+        raise ConnectionError("lost")
+
+    writer = aiomongowire.BulkWriter(fail, 'test', 'coll')
+    future = writer.add({'_id': 1})
+    await writer.flush()
+    assert isinstance(future.exception(), ConnectionError)
+
+    async def unauthorized(message):
+        reply = {'ok': 0.0, 'code': 13, 'errmsg': 'unauthorized'}
+        return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(reply)]))
+
+    writer = aiomongowire.BulkWriter(unauthorized, 'test', 'coll')
+    futures = [writer.add({'_id': i}) for i in range(3)]
+    await writer.flush()
+    assert all(future.exception().error['code'] == 13 for future in futures)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_batch():
+    writer = aiomongowire.BulkWriter(_FakeInserts(delay=10).send, 'test', 'coll', max_documents=2)
+    futures = [writer.add({'_id': i}) for i in range(2)]
+    await asyncio.sleep(0)
+    for task in list(writer._in_flight):
+        task.cancel()
+    await writer.flush()
+    assert all(future.cancelled() for future in futures)
+
+
+@pytest.mark.asyncio
+async def test_bulk_writer_over_connection(fake_server):
+    _, protocol = await (await fake_server()).connect()
+    writer = aiomongowire.BulkWriter(protocol.send_data, 'test', 'coll', max_documents=100)
+    futures = [writer.add({'_id': i}) for i in range(250)]
+    await writer.close()
+    await asyncio.gather(*futures)
+    assert writer.batches == 3 and writer.documents == 250
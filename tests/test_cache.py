@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, RawFrame, ReplyCache
+
+
+def _find(collection: str) -> MongoWireMessage:
+    body = aiomongowire.OpMsg.Body({'find': collection, 'filter': {'_id': 1}, '$db': 'test'})
+    return MongoWireMessage(operation=aiomongowire.OpMsg(sections=[body]))
+
+
+def test_cacheable():
+    cache = ReplyCache()
+
+    assert cache.is_cacheable(_find('coll').operation)
+    assert cache.is_cacheable(aiomongowire.OpQuery('admin.$cmd', {'isMaster': 1}))
+    assert not cache.is_cacheable(aiomongowire.OpQuery('admin.$cmd', {'shutdown': 1}))
+    assert not cache.is_cacheable(aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Insert('test', 'coll')]))
+    assert not cache.is_cacheable(aiomongowire.OpQuery('test.coll', {}, flags=aiomongowire.OpQuery.Flags.EXHAUST))
+
+
+def test_lru_eviction():
+    cache = ReplyCache(max_bytes=100)
+    frame = RawFrame(b'\x00' * 40)
+    cache.put(b'a', frame)
+    cache.put(b'b', frame)
+    cache.get(b'a')
+    cache.put(b'c', frame)
+
+    assert cache.get(b'a') is frame
+    assert cache.get(b'b') is None
+    assert cache.size == 80
+
+
+def test_ttl():
+    cache = ReplyCache(ttl=-1)
+    cache.put(b'a', RawFrame(b'\x00' * 40))
+
+    assert cache.get(b'a') is None
+    assert cache.size == 0
+
+
+@pytest.mark.asyncio
+async def test_read_through(fake_server):
+    server = await fake_server()
+    server_protocol = server.protocol
+    cache = ReplyCache()
+    _, protocol = await server.connect(lambda: aiomongowire.MongoWireProtocol(reply_cache=cache))
+
+    requests = [_find('coll') for _ in range(10)]
+    replies = await asyncio.gather(*[protocol.send_data(request) for request in requests])
+    replies.append(await protocol.send_data(requests[0]))
+
+    assert len(server_protocol.received) == 1
+    assert cache.misses == 1
+    assert cache.coalesced == 9
+    assert cache.hits == 1
+    for request, reply in zip(requests, replies):
+        assert reply.header.response_to == request.header.request_id
+        assert reply.operation.sections[0].data['echo']['find'] == 'coll'
+    assert len({id(reply.operation) for reply in replies}) == len(replies)
+
+    await protocol.send_data(_find('other'))
+    assert len(server_protocol.received) == 2
+
+
+@pytest.mark.asyncio
+async def test_command_error_not_cached(fake_server):
+    server = await fake_server(lambda command: {'ok': 0.0, 'errmsg': 'not ready'})
+    _, protocol = await server.connect(lambda: aiomongowire.MongoWireProtocol(reply_cache=ReplyCache()))
+    for _ in range(2):
+        reply = await protocol.send_data(MongoWireMessage(operation=aiomongowire.OpQuery('admin.$cmd',
+                                                                                         {'isMaster': 1})))
+        assert reply.operation.documents[0]['ok'] == 0
+    assert len(server.protocol.received) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight(fake_server):
+    server = await fake_server()
+    server_protocol = server.protocol
+    single_flight = aiomongowire.SingleFlight()
+    _, protocol = await server.connect(lambda: aiomongowire.MongoWireProtocol(single_flight=single_flight))
+
+    requests = [_find('coll') for _ in range(5)]
+    for i, request in enumerate(requests):
+        request.operation.sections[0].data['lsid'] = {'id': i}
+    replies = await asyncio.gather(*[protocol.send_data(request) for request in requests])
+
+    assert len(server_protocol.received) == 1
+    assert single_flight.coalesced == 4
+    for request, reply in zip(requests, replies):
+        assert reply.header.response_to == request.header.request_id
+        assert reply.operation.sections[0].data['echo']['find'] == 'coll'
+
+    await protocol.send_data(_find('coll'))
+    assert len(server_protocol.received) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_read_through(fake_server):
+    server = await fake_server()
+    _, protocol = await server.connect()
+    cache = ReplyCache()
+    sent = asyncio.Event()
+
+    async def send_frame(frame: RawFrame):
+        if not sent.is_set():
+            sent.set()
+            await asyncio.sleep(10)
+        return await protocol.send_frame(frame)
+
+    leader = asyncio.ensure_future(cache.send(_find('coll'), send_frame))
+    await sent.wait()
+    waiter = asyncio.ensure_future(cache.send(_find('coll'), send_frame))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    reply = await asyncio.wait_for(waiter, 5)
+    assert reply.operation.sections[0].data['echo']['find'] == 'coll'
+    assert leader.cancelled()
+    assert not cache._in_flight
+
+
+def test_single_flight_key():
+    single_flight = aiomongowire.SingleFlight()
+    write = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body(
+        {'aggregate': 'coll', 'pipeline': [{'$match': {}}, {'$out': 'other'}], '$db': 'test'})])
+
+    assert single_flight.key(_find('coll').operation) is not None
+    assert single_flight.key(write) is None
+    assert single_flight.key(aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Insert('test', 'coll')])) is None
@@ -0,0 +1,42 @@
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, CaptureWriter, CaptureReader, Direction, Replayer
+
+
+def _ping(i: int) -> MongoWireMessage:
+    return MongoWireMessage(operation=aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': i})]))
+
+
+@pytest.mark.asyncio
+async def test_capture_and_replay(tmp_path, fake_server):
+    server = await fake_server()
+    server_protocol = server.protocol
+    path = str(tmp_path / 'capture.bin')
+    capture = CaptureWriter(path)
+    _, protocol = await server.connect(lambda: aiomongowire.MongoWireProtocol(capture=capture))
+    for i in range(5):
+        await protocol.send_data(_ping(i))
+    protocol.capture = None
+    capture.close()
+
+    frames = list(CaptureReader(path))
+    assert [frame.direction for frame in frames] == [Direction.SENT, Direction.RECEIVED] * 5
+    assert [frame.timestamp for frame in frames] == sorted(frame.timestamp for frame in frames)
+    assert aiomongowire.RawFrame(frames[0].data).message.operation.sections[0].data == {'ping': 0}
+    assert len(list(CaptureReader(path, direction=Direction.RECEIVED))) == 5
+
+    server_protocol.received.clear()
+    for speed in (None, 100.0):
+        stats = await Replayer(CaptureReader(path), speed=speed, max_in_flight=2).replay(protocol.send_frame)
+        assert (stats.sent, stats.replies, stats.errors) == (5, 5, 0)
+        assert len(stats.latencies) == 5
+        assert stats.percentile(99) >= stats.percentile(50) > 0
+    assert [command['ping'] for command in server_protocol.received] == list(range(5)) * 2
+
+
+def test_invalid_capture(tmp_path):
+    path = tmp_path / 'capture.bin'
+    path.write_bytes(b'not a capture')
+    with pytest.raises(aiomongowire.InvalidCaptureException):
+        list(CaptureReader(str(path)))
@@ -0,0 +1,67 @@
+import io
+import os
+
+import pytest
+
+from src.aiomongowire import OpMsg, MongoWireMessage
+from src.aiomongowire._crc32c import crc32c_python, crc32c_accelerated, InvalidChecksumException
+
+IMPLEMENTATIONS = [crc32c_python] + ([crc32c_accelerated] if crc32c_accelerated else [])
+
+
+@pytest.mark.parametrize('crc32c', IMPLEMENTATIONS)
+def test_known_values(crc32c):
+    assert crc32c(b'') == 0
+    assert crc32c(b'123456789') == 0xE3069283
+    assert crc32c(memoryview(b'x123456789x')[1:-1]) == 0xE3069283
+    assert crc32c(b'6789', crc32c(b'12345')) == 0xE3069283
+
+
+def test_implementations_match():
+    data = os.urandom(1031)
+    assert len({crc32c(data) for crc32c in IMPLEMENTATIONS}) == 1
+
+
+def _message(flag_bits: int) -> MongoWireMessage:
+    operation = OpMsg(sections=[OpMsg.Insert('test', 'coll'), OpMsg.Document(0, 'documents', [{'a': 1}, {'b': 2}])],
+                      flag_bits=flag_bits)
+    return MongoWireMessage(operation=operation)
+
+
+def test_round_trip():
+    data = bytes(_message(OpMsg.Flags.CHECKSUM_PRESENT))
+    message = MongoWireMessage.from_data(io.BytesIO(data))
+
+    assert message.operation.checksum == int.from_bytes(data[-4:], byteorder='little')
+    assert [doc for doc in message.operation.sections[1].documents] == [{'a': 1}, {'b': 2}]
+    assert bytes(message) == data
+
+
+def test_no_checksum():
+    data = bytes(_message(0))
+    message = MongoWireMessage.from_data(io.BytesIO(data))
+
+    assert message.operation.checksum is None
+    assert len(message.operation.sections) == 2
+    assert bytes(message) == data
+
+
+def test_corrupted():
+    data = bytearray(bytes(_message(OpMsg.Flags.CHECKSUM_PRESENT)))
+    data[-1] ^= 0xFF
+
+    with pytest.raises(InvalidChecksumException):
+        MongoWireMessage.from_data(io.BytesIO(data))
+    MongoWireMessage.from_data(io.BytesIO(data), verify_checksum=False)
+
+
+@pytest.mark.parametrize('flag_bits', [0, OpMsg.Flags.CHECKSUM_PRESENT])
+def test_data_after_message(flag_bits: int):
+    first = bytes(_message(flag_bits))
+    data = io.BytesIO(first + bytes(_message(OpMsg.Flags.CHECKSUM_PRESENT)))
+    message = MongoWireMessage.from_data(data)
+
+    # Sections and checksum end where the header says, not at the end of the data
+    assert bytes(message) == first
+    assert data.tell() == len(first)
+    assert MongoWireMessage.from_data(data).operation.sections[1].documents == [{'a': 1}, {'b': 2}]
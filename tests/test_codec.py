@@ -0,0 +1,96 @@
+import io
+
+import pytest
+
+from src.aiomongowire._op_code import OpCode
+from src.aiomongowire import _codec, MongoWireMessage, MessageHeader, OpMsg, OpReply, get_bson_parser
+
+# Both implementations go through the same tests, the compiled one only if it is built
+IMPLEMENTATIONS = [pytest.param(
+    (_codec.unpack_header_python, _codec.pack_header_python, _codec.walk_sections_python,
+     _codec.unpack_reply_python), id='python')]
+if _codec._speedups is not None:
+    IMPLEMENTATIONS.append(pytest.param(
+        (_codec._speedups.unpack_header, _codec._speedups.pack_header, _codec._speedups.walk_sections,
+         _codec._speedups.unpack_reply), id='compiled'))
+
+
+def _short_document(data: bytes) -> bytes:
+    """
+    Sets length of the first document of the sequence below the minimal one
+    """
+    offset = data.index(b'documents\x00') + len('documents') + 1
+    return data[:offset] + b'\x01\x00\x00\x00' + data[offset + 4:]
+
+
+def _msg() -> bytes:
+    return bytes(MongoWireMessage(operation=OpMsg(sections=[
+        OpMsg.Body({'insert': 'coll', '$db': 'test'}),
+        OpMsg.Document(0, 'documents', [{'_id': 1}, {'_id': 2, 'x': 'y'}])]),
+        header=MessageHeader(request_id=7, response_to=-3)))
+
+
+@pytest.mark.parametrize('codec', IMPLEMENTATIONS)
+def test_header(codec):
+    unpack_header, pack_header, _, _ = codec
+    data = _msg()
+    assert unpack_header(data) == (len(data), 7, -3, OpCode.OP_MSG)
+    assert unpack_header(bytearray(b'xx' + data), 2) == unpack_header(memoryview(data))
+    assert pack_header(len(data), 7, -3, OpCode.OP_MSG) == data[:16]
+    with pytest.raises(ValueError):
+        unpack_header(data[:15])
+    with pytest.raises(OverflowError):
+        pack_header(1 << 31, 0, 0, 0)
+
+
+@pytest.mark.parametrize('codec', IMPLEMENTATIONS)
+def test_walk_sections(codec):
+    _, _, walk_sections, _ = codec
+    data = _msg()
+    sections = walk_sections(memoryview(data), 20, len(data))
+    assert [(payload_type, identifier) for payload_type, _, identifier, _ in sections] == \
+           [(0, None), (1, 'documents')]
+    parser = get_bson_parser()
+    assert parser.decode_object(data[slice(*sections[0][3][0])]) == {'insert': 'coll', '$db': 'test'}
+    assert [parser.decode_object(data[start:end]) for start, end in sections[1][3]] == [{'_id': 1},
+                                                                                        {'_id': 2, 'x': 'y'}]
+    assert sections[1][1] == len(data) - 20 - 1 - sections[0][1] - 1
+    assert walk_sections(data, 20, 20) == []
+
+
+@pytest.mark.parametrize('codec', IMPLEMENTATIONS)
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:-3],  # cut document
+    lambda data: data[:20] + b'\x05' + data[21:],  # unknown section type
+    lambda data: data[:21] + b'\xff\xff\xff\x7f' + data[25:],  # section size out of bounds
+    _short_document,
+])
+def test_walk_sections_invalid(codec, corrupt):
+    _, _, walk_sections, _ = codec
+    data = corrupt(_msg())
+    with pytest.raises(ValueError):
+        walk_sections(data, 20, len(data))
+    with pytest.raises(ValueError):
+        walk_sections(data, 20, len(data) + 1)
+
+
+@pytest.mark.parametrize('codec', IMPLEMENTATIONS)
+def test_unpack_reply(codec):
+    _, _, _, unpack_reply = codec
+    documents = [{'a': 1}, {'b': 'c'}]
+    data = bytes(OpReply(cursor_id=1 << 40, starting_from=3, number_returned=2, documents=documents,
+                         response_flags=OpReply.Flags.AWAIT_CAPABLE))
+    flags, cursor_id, starting_from, number_returned, bounds = unpack_reply(data, 0, len(data))
+    assert (flags, cursor_id, starting_from, number_returned) == (OpReply.Flags.AWAIT_CAPABLE, 1 << 40, 3, 2)
+    assert [get_bson_parser().decode_object(data[start:end]) for start, end in bounds] == documents
+    with pytest.raises(ValueError):
+        unpack_reply(data[:-1], 0, len(data) - 1)
+    with pytest.raises(ValueError):
+        unpack_reply(data[:19], 0, 19)
+
+
+def test_message_round_trip():
+    message = MongoWireMessage.from_data(io.BytesIO(_msg()))
+    assert message.header.request_id == 7 and message.header.response_to == -3
+    assert message.operation.sections[1].documents == [{'_id': 1}, {'_id': 2, 'x': 'y'}]
+    assert bytes(message) == _msg()
@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, RawFrame, get_bson_parser
+
+numpy = pytest.importorskip('numpy')
+
+SCHEMA = {'a': 'double', 'n.x': 'int64', 'n.s': 'string', 't': 'date', 'b': 'bool'}
+DOCUMENTS = [
+    {'a': 1.5, 'n': {'x': 3, 's': 'text'}, 't': datetime.datetime(2020, 1, 1), 'b': True},
+    {'a': 2, 'n': {'x': 1 << 40}, 'b': 'not a bool'},
+    {'other': 1},
+]
+
+
+def _check(columns: dict, repeat: int = 1):
+    assert columns['a'].tolist() == [1.5, 2.0, None] * repeat
+    assert columns['n.x'].tolist() == [3, 1 << 40, None] * repeat
+    assert columns['n.s'].tolist() == ['text', None, None] * repeat
+    assert columns['t'].tolist() == [datetime.datetime(2020, 1, 1), None, None] * repeat
+    assert columns['b'].tolist() == [True, None, None] * repeat
+
+
+def test_documents():
+    batch = aiomongowire.ColumnarBatch(SCHEMA, capacity=2)
+    data = b''.join(get_bson_parser().encode_object(document) for document in DOCUMENTS)
+
+    assert batch.add_documents(data) == 3
+    assert batch.add_documents(data) == 3
+    assert len(batch) == 6
+    _check(batch.columns, repeat=2)
+    assert batch.columns['a'].dtype == numpy.float64
+
+
+def test_frames():
+    batch = aiomongowire.ColumnarBatch(SCHEMA)
+    reply = aiomongowire.OpReply(cursor_id=7, starting_from=0, number_returned=3, documents=DOCUMENTS)
+    body = {'cursor': {'id': 0, 'ns': 'test.coll', 'firstBatch': DOCUMENTS}, 'ok': 1.0}
+    msg = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body(body)])
+
+    assert batch.add_frame(RawFrame(bytes(MongoWireMessage(operation=reply)))) == 7
+    assert batch.add_frame(RawFrame(bytes(MongoWireMessage(operation=msg)))) == 0
+    _check(batch.columns, repeat=2)
+
+
+def test_schema_errors():
+    with pytest.raises(ValueError):
+        aiomongowire.ColumnarBatch({'a': 'decimal'})
+    with pytest.raises(ValueError):
+        aiomongowire.ColumnarBatch({'a': 'int32', 'a.b': 'int32'})
+
+
+def test_values_not_fitting_column():
+    batch = aiomongowire.ColumnarBatch({'i': 'int32', 'n': 'int64', 'd': 'double'})
+    documents = [{'i': 1, 'n': 1, 'd': 1}, {'i': 1 << 40, 'n': 2.0, 'd': (1 << 60) + 1}]
+    batch.add_documents(b''.join(get_bson_parser().encode_object(document) for document in documents))
+    # Larger integer widens the column, double keeps its type in an object column
+    assert batch.columns['i'].dtype == numpy.int64 and batch.columns['i'].tolist() == [1, 1 << 40]
+    assert batch.columns['n'].dtype == object and batch.columns['n'].tolist() == [1, 2.0]
+    assert type(batch.columns['n'][1]) is float
+
+    documents = [{'i': 1.5, 'n': float('nan'), 'd': 2.5}, {}]
+    assert batch.add_documents(b''.join(get_bson_parser().encode_object(document) for document in documents)) == 2
+    columns = batch.columns
+    # Values the numeric column can not hold exactly turn it into an object column
+    assert columns['i'].tolist() == [1, 1 << 40, 1.5, None]
+    assert columns['n'].tolist()[:2] == [1, 2] and numpy.isnan(columns['n'].tolist()[2])
+    assert columns['d'].dtype == object and columns['d'].tolist() == [1.0, (1 << 60) + 1, 2.5, None]
+    # Nothing is left over from the previous batches
+    assert batch.add_documents(get_bson_parser().encode_object({'i': 3})) == 1
+    assert batch.columns['i'].tolist()[-1] == 3
+
+
+def test_object_id_trailing_zeros():
+    bson = pytest.importorskip('bson')
+    if not hasattr(bson, 'ObjectId'):
+        pytest.skip("bson package has no ObjectId")
+    object_id = bson.ObjectId(b'\x01' * 11 + b'\x00')
+    batch = aiomongowire.ColumnarBatch({'_id': 'objectId'})
+    batch.add_documents(get_bson_parser().encode_object({'_id': object_id}))
+    assert batch.columns['_id'].tolist() == [object_id.binary]
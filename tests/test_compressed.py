@@ -0,0 +1,52 @@
+import io
+
+import pytest
+
+from src.aiomongowire import _compressor, MongoWireMessage, MessageHeader, OpCompressed, OpMsg, OpReply
+from src.aiomongowire._op_code import OpCode
+from src.aiomongowire._spill import BufferReader
+
+# Compressors of the packages that are not installed are not defined
+COMPRESSORS = [pytest.param(_compressor.Compressor.by_name(name), id=name)
+               for name in sorted(_compressor.Compressor.compressor_names())]
+
+
+def _compressed(compressor) -> bytes:
+    documents = [{'_id': i, 'data': 'x' * 100} for i in range(50)]
+    operation = OpMsg(sections=[OpMsg.Body({'insert': 'coll', '$db': 'test'}),
+                                OpMsg.Document(0, 'documents', documents)])
+    return bytes(MongoWireMessage(operation=OpCompressed(compressor, operation), header=MessageHeader(request_id=3)))
+
+
+@pytest.mark.parametrize('compressor', COMPRESSORS)
+@pytest.mark.parametrize('reader', [io.BytesIO, lambda data: BufferReader(memoryview(data))])
+def test_lazy_round_trip(compressor, reader):
+    data = _compressed(compressor)
+    operation = MongoWireMessage.from_data(reader(data)).operation
+    assert not operation.is_parsed
+    assert operation.original_op_code == OpCode.OP_MSG and operation.compressor is compressor
+    # Pass through without decompressing
+    assert bytes(MongoWireMessage(operation=operation, header=MessageHeader(request_id=3))) == data
+    assert operation.original_msg.sections[1].documents[49] == {'_id': 49, 'data': 'x' * 100}
+    assert operation.is_parsed and operation.compressed is None
+    assert operation.has_reply
+
+
+@pytest.mark.parametrize('compressor', COMPRESSORS)
+def test_compressed_payload_is_view(compressor):
+    data = _compressed(compressor)
+    operation = MongoWireMessage.from_data(io.BytesIO(data)).operation
+    assert isinstance(operation.compressed, memoryview) and operation.compressed.obj is data
+
+
+def test_size_mismatch():
+    reply = OpReply(cursor_id=0, starting_from=0, number_returned=1, documents=[{'ok': 1.0}])
+    data = bytearray(bytes(OpCompressed(_compressor.CompressorZlib, reply)))
+    data[4] += 1  # uncompressed size
+    operation = OpCompressed.from_data(io.BytesIO(bytes(data)))
+    with pytest.raises(ValueError):
+        operation.original_msg
+    with pytest.raises(ValueError):
+        OpCompressed.from_data(io.BytesIO(bytes(data[:5])))
+    with pytest.raises(ValueError):
+        OpCompressed(_compressor.CompressorZlib)
@@ -0,0 +1,91 @@
+import asyncio
+import gc
+
+import pytest
+
+from src.aiomongowire import MongoWireMessage, OpMsg, OpReply, OpKillCursors, CursorRegistry
+
+
+def _find_reply(cursor_id: int, ns: str = 'test.coll') -> MongoWireMessage:
+    return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(
+        {'cursor': {'id': cursor_id, 'ns': ns, 'firstBatch': []}, 'ok': 1.0})]))
+
+
+def _legacy_reply(cursor_id: int) -> MongoWireMessage:
+    return MongoWireMessage(operation=OpReply(cursor_id=cursor_id, starting_from=0, number_returned=0, documents=[]))
+
+
+class _Sent:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message: MongoWireMessage):
+        self.messages.append(message.operation)
+
+
+@pytest.mark.asyncio
+async def test_abandoned_cursors_killed_in_batches():
+    sent = _Sent()
+    registry = CursorRegistry(sent.send, flush_interval=0.01)
+    cursors = [registry.track(_find_reply(i)) for i in range(1, 6)]
+    cursors.append(registry.track(_find_reply(6, 'test.other')))
+    cursors += [registry.track(_legacy_reply(i)) for i in (7, 8)]
+    assert registry.live == 8 and registry.track(_find_reply(0)) is None
+
+    del cursors
+    gc.collect()
+    assert registry.live == 0 and registry.pending == 8
+    await asyncio.sleep(0.05)
+    assert registry.pending == 0 and registry.killed == 8 and registry.kill_messages == 3
+
+    commands = {message.sections[0].data['killCursors']: sorted(message.sections[0].data['cursors'])
+                for message in sent.messages if isinstance(message, OpMsg)}
+    assert commands == {'coll': [1, 2, 3, 4, 5], 'other': [6]}
+    legacy = [message for message in sent.messages if isinstance(message, OpKillCursors)]
+    assert [sorted(message.cursor_ids) for message in legacy] == [[7, 8]]
+
+
+@pytest.mark.asyncio
+async def test_exhausted_and_closed_cursors():
+    sent = _Sent()
+    registry = CursorRegistry(sent.send, flush_interval=10, max_batch=2)
+    exhausted = registry.track(_find_reply(1))
+    exhausted.update(_find_reply(1))
+    assert exhausted.alive
+    exhausted.update(_find_reply(0))
+    assert not exhausted.alive and registry.live == 0
+    del exhausted
+    gc.collect()
+    assert registry.pending == 0
+
+    first, second = registry.track(_find_reply(2)), registry.track(_find_reply(3))
+    first.close()
+    first.close()
+    assert registry.pending == 1
+    # Full batch goes without waiting for the interval
+    second.close()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert sent.messages[0].sections[0].data['cursors'] == [2, 3]
+
+    kept = registry.track(_find_reply(4))
+    await registry.close()
+    assert sent.messages[-1].sections[0].data['cursors'] == [4]
+    assert not kept.alive and registry.live == 0
+    del kept
+    gc.collect()
+    assert registry.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_kill_over_connection(fake_server):
+    _, protocol = await (await fake_server()).connect()
+    protocol.cursors.flush_interval = 0.01
+    reply = await protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[
+        OpMsg.Body({'find': 'coll', '$db': 'test'})])))
+    assert protocol.cursors.track(reply) is None
+    cursor = protocol.cursors.track(_find_reply(42))
+    del cursor
+    gc.collect()
+    await asyncio.sleep(0.05)
+    assert protocol.cursors.kill_messages == 1
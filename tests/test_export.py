@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.aiomongowire import MongoWireMessage, OpMsg, OpReply, RawFrame, BsonFileSink, JsonLinesSink, \
+    FileSink, ExportException, export, get_bson_parser, CursorRegistry
+
+DOCUMENTS = [{'_id': i, 'name': f"user {i}"} for i in range(25)]
+
+
+def _cursor_handler(batch_size: int):
+    def handler(body):
+        if 'find' in body:
+            position, key = 0, 'firstBatch'
+        elif 'getMore' in body:
+            position, key = body['getMore'], 'nextBatch'
+        else:
+            return {'ok': 0.0, 'errmsg': 'unsupported'}
+        end = position + batch_size
+        cursor_id = end if end < len(DOCUMENTS) else 0
+        return {'cursor': {key: DOCUMENTS[position:end], 'id': cursor_id, 'ns': 'test.coll'}, 'ok': 1.0}
+    return handler
+
+
+def _frame(operation) -> RawFrame:
+    return RawFrame(bytes(MongoWireMessage(operation=operation)))
+
+
+@pytest.mark.asyncio
+async def test_export_bson_and_jsonl(tmp_path, fake_server):
+    _, protocol = await (await fake_server(_cursor_handler(10))).connect()
+    find = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})]))
+    async with BsonFileSink(str(tmp_path / 'coll.bson')) as sink:
+        assert await export(protocol.send_frame, find, sink) == 25
+        assert sink.batches == 3
+    encoded = b''.join(get_bson_parser().encode_object(document) for document in DOCUMENTS)
+    assert (tmp_path / 'coll.bson').read_bytes() == encoded
+
+    find = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})]))
+    async with JsonLinesSink(str(tmp_path / 'coll.jsonl'), dumps=json.dumps) as sink:
+        await export(protocol.send_frame, find, sink)
+    lines = (tmp_path / 'coll.jsonl').read_text().splitlines()
+    assert [json.loads(line) for line in lines] == DOCUMENTS
+
+    failing = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'count': 'coll', '$db': 'test'})]))
+    with pytest.raises(ExportException):
+        async with BsonFileSink(str(tmp_path / 'failed.bson')) as sink:
+            await export(protocol.send_frame, failing, sink)
+
+
+def test_cursor_batch_legacy_reply():
+    from src.aiomongowire._export import cursor_batch
+    documents, count, cursor_id = cursor_batch(_frame(OpReply(cursor_id=7, starting_from=0, number_returned=2,
+                                                              documents=DOCUMENTS[:2])))
+    assert (count, cursor_id) == (2, 7)
+    assert documents == b''.join(get_bson_parser().encode_object(document) for document in DOCUMENTS[:2])
+    with pytest.raises(ExportException, match='bad query'):
+        cursor_batch(_frame(OpReply(cursor_id=0, starting_from=0, number_returned=1, documents=[
+            {'$err': 'bad query', 'errmsg': 'bad query'}], response_flags=OpReply.Flags.QUERY_FAILURE)))
+
+
+class _BlockedSink(FileSink):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unblocked = threading.Event()
+
+    def _write_documents(self, documents: bytes):
+        self.unblocked.wait(5)
+        self._file.write(documents)
+
+
+@pytest.mark.asyncio
+async def test_backpressure(tmp_path):
+    sink = _BlockedSink(str(tmp_path / 'out.bson'), max_pending=100)
+    await sink.write(b'x' * 150, 1)
+    second = asyncio.ensure_future(sink.write(b'y' * 10, 1))
+    await asyncio.sleep(0.05)
+    assert not second.done() and sink.pending == 150
+    sink.unblocked.set()
+    await asyncio.wait_for(second, 5)
+    await sink.close()
+    assert (tmp_path / 'out.bson').read_bytes() == b'x' * 150 + b'y' * 10
+
+
+@pytest.mark.asyncio
+async def test_write_error_raised(tmp_path):
+    class FailingSink(FileSink):
+        def _write_documents(self, documents: bytes):
+            raise OSError('disk full')
+
+    sink = FailingSink(str(tmp_path / 'out.bson'))
+    await sink.write(b'x', 1)
+    with pytest.raises(OSError, match='disk full'):
+        await sink.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_kills_cursor(tmp_path, fake_server):
+    class FailingSink(FileSink):
+        def _write_documents(self, documents: bytes):
+            raise OSError('disk full')
+
+    _, protocol = await (await fake_server(_cursor_handler(10))).connect()
+    killed = []
+
+    async def send(message: MongoWireMessage):
+        killed.append(message.operation.sections[0].data)
+
+    cursors = CursorRegistry(send, flush_interval=10)
+    sink = FailingSink(str(tmp_path / 'out.bson'))
+    await sink.write(b'x', 1)
+    await asyncio.sleep(0.05)
+    find = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})]))
+    with pytest.raises(OSError, match='disk full'):
+        await export(protocol.send_frame, find, sink, cursors=cursors)
+    assert cursors.pending == 1
+    await cursors.flush()
+    assert killed == [{'killCursors': 'coll', 'cursors': [10], '$db': 'test'}]
+    with pytest.raises(OSError):
+        await sink.close()
@@ -0,0 +1,89 @@
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, OpMsg
+
+HELLO = {'ok': 1.0, 'isWritablePrimary': True, 'minWireVersion': 0, 'maxWireVersion': 17,
+         'maxBsonObjectSize': 16777216, 'maxMessageSizeBytes': 48000000, 'maxWriteBatchSize': 100000,
+         'logicalSessionTimeoutMinutes': 30}
+
+
+def _handler(command: dict) -> dict:
+    if 'find' in command:
+        return {'cursor': {'firstBatch': [{'_id': i} for i in range(3)], 'id': 0, 'ns': 'test.coll'}, 'ok': 1.0}
+    if 'isMaster' in command:
+        # Server keeps the offered compressors it supports, in the client order
+        return dict(HELLO, compression=[name for name in command.get('compression', []) if name != 'snappy'])
+    return {'ok': 1.0, 'echo': command}
+
+
+@pytest.mark.asyncio
+async def test_handshake_negotiates_compression(fake_server):
+    server = await fake_server(_handler)
+    server_protocol = server.protocol
+    _, protocol = await server.connect()
+
+    settings = await protocol.handshake(['snappy', 'zlib'], app_name='test')
+    assert protocol.settings is settings
+    assert settings.compressor.name() == 'zlib'
+    assert settings.max_wire_version == 17 and settings.logical_session_timeout_minutes == 30
+    hello = server_protocol.received[0]
+    assert hello['compression'] == ['snappy', 'zlib'] and hello['client']['application'] == {'name': 'test'}
+
+    # Requests are compressed, replies come back unwrapped
+    reply = await protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'ping': 1})])))
+    assert reply.operation.sections[0].data['echo'] == {'ping': 1}
+    assert server_protocol.compressed == 1
+    # Commands the specification forbids to compress are sent as is
+    await protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'hello': 1})])))
+    assert server_protocol.compressed == 1
+    # OP_COMPRESSED can not carry the checksum
+    checksummed = OpMsg(sections=[OpMsg.Body({'ping': 2})], flag_bits=OpMsg.Flags.CHECKSUM_PRESENT)
+    reply = await protocol.send_data(MongoWireMessage(operation=checksummed))
+    assert reply.operation.sections[0].data['echo'] == {'ping': 2}
+    assert server_protocol.compressed == 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_with_compression(fake_server):
+    server = await fake_server(_handler)
+    _, protocol = await server.connect()
+    await protocol.handshake(['zlib'])
+    find = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})]))
+    documents = [document async for document in protocol.send_streaming(find)]
+    assert documents == [{'_id': i} for i in range(3)]
+    # Connection is still usable, other requests are compressed
+    reply = await protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'ping': 1})])))
+    assert reply.operation.sections[0].data['echo'] == {'ping': 1}
+    assert server.protocol.compressed == 1
+
+
+@pytest.mark.asyncio
+async def test_handshake_without_compression(fake_server):
+    server = await fake_server(_handler)
+    _, protocol = await server.connect()
+    settings = await protocol.handshake()
+    assert settings.compressor is None and protocol.compressor is None
+    assert 'compression' not in server.protocol.received[0]
+    with pytest.raises(ValueError):
+        await protocol.handshake(['lz4'])
+
+
+@pytest.mark.asyncio
+async def test_handshake_failure(fake_server):
+    server = await fake_server(lambda command: {'ok': 0.0, 'code': 18, 'errmsg': 'auth failed'})
+    _, protocol = await server.connect()
+    with pytest.raises(aiomongowire.HandshakeException):
+        await protocol.handshake()
+    assert protocol.settings is None
+
+
+@pytest.mark.asyncio
+async def test_pool_handshake(fake_server):
+    server = await fake_server(_handler, shared=False)
+    pool = aiomongowire.ConnectionPool('127.0.0.1', server.port, size=2, compressors=['zlib'])
+    await pool.connect()
+    try:
+        assert all(protocol.compressor is not None for protocol in pool._protocols)
+    finally:
+        pool.close()
@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, MessageHeader, DocumentStream, IncrementalReply, FrameBuffer
+
+DOCUMENTS = [{'_id': i, 'value': 'x' * i} for i in range(20)]
+
+
+def _cursor_reply(request_id: int = 0, flag_bits: int = 0) -> bytes:
+    body = {'cursor': {'firstBatch': DOCUMENTS, 'id': 42, 'ns': 'test.coll'}, 'ok': 1.0}
+    operation = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body(body)], flag_bits=flag_bits)
+    return bytes(MongoWireMessage(operation=operation, header=MessageHeader(response_to=request_id)))
+
+
+def _parse(data: bytes, chunk_size: int) -> DocumentStream:
+    stream = DocumentStream(asyncio.new_event_loop(), raw=True, max_pending=len(DOCUMENTS) + 1)
+    parser = IncrementalReply(stream, len(data))
+    for offset in range(0, len(data), chunk_size):
+        parser.feed(data[offset:offset + chunk_size])
+    return stream
+
+
+def _documents(stream: DocumentStream) -> list:
+    return [aiomongowire.get_bson_parser().decode_object(document) for document in stream._documents]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100000])
+def test_cursor_batch(chunk_size: int):
+    stream = _parse(_cursor_reply(flag_bits=aiomongowire.OpMsg.Flags.CHECKSUM_PRESENT), chunk_size)
+
+    assert stream.done and stream._exception is None
+    assert _documents(stream) == DOCUMENTS
+    assert stream.cursor_id == 42
+    assert stream.reply == {'cursor': {'id': 42, 'ns': 'test.coll'}, 'ok': 1.0}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 100000])
+def test_op_reply_and_sequence(chunk_size: int):
+    reply = aiomongowire.OpReply(cursor_id=7, starting_from=0, number_returned=len(DOCUMENTS), documents=DOCUMENTS)
+    stream = _parse(bytes(MongoWireMessage(operation=reply)), chunk_size)
+    assert _documents(stream) == DOCUMENTS
+    assert stream.cursor_id == 7
+
+    sequence = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ok': 1.0}),
+                                            aiomongowire.OpMsg.Document(0, 'documents', DOCUMENTS)])
+    stream = _parse(bytes(MongoWireMessage(operation=sequence)), chunk_size)
+    assert _documents(stream) == DOCUMENTS
+    assert stream.reply == {'ok': 1.0}
+
+
+def test_invalid_checksum():
+    data = bytearray(_cursor_reply(flag_bits=aiomongowire.OpMsg.Flags.CHECKSUM_PRESENT))
+    data[-1] ^= 0xFF
+    stream = _parse(bytes(data), 10)
+    assert isinstance(stream._exception, aiomongowire.InvalidChecksumException)
+
+
+def test_frame_buffer():
+    stream = DocumentStream(asyncio.new_event_loop(), raw=True)
+    frames = FrameBuffer(incremental_factory=lambda response_to, length:
+                         IncrementalReply(stream, length) if response_to == 1 else None)
+    data = _cursor_reply(1) + _cursor_reply(2)
+
+    assert frames.feed(data[:50]) == []
+    assert frames.incremental is not None
+    result = frames.feed(data[50:])
+    assert [frame.response_to for frame in result] == [2]
+    assert stream.done and len(_documents(stream)) == len(DOCUMENTS)
+    assert frames.pending == 0
+
+
+def test_frame_buffer_parser_error():
+    stream = DocumentStream(asyncio.new_event_loop(), raw=True)
+    frames = FrameBuffer(incremental_factory=lambda response_to, length:
+                         IncrementalReply(stream, length) if response_to == 1 else None)
+    data = bytearray(_cursor_reply(1, flag_bits=aiomongowire.OpMsg.Flags.CHECKSUM_PRESENT))
+    data[-1] ^= 0xFF
+    data += _cursor_reply(2)
+
+    # Failed reply is skipped, the frames after it are still read
+    result = frames.feed(data[:len(data) - 10]) + frames.feed(data[len(data) - 10:])
+    assert isinstance(stream._exception, aiomongowire.InvalidChecksumException)
+    assert [frame.response_to for frame in result] == [2]
+    assert frames.pending == 0
+
+    stream = DocumentStream(asyncio.new_event_loop(), raw=True)
+    stream.close()
+    # Closed stream discards the whole reply
+    assert frames.feed(_cursor_reply(1)) == []
+    assert stream.done and stream.received == 0 and not stream._documents
+    assert frames.incremental is None
+
+
+class _ChunkedServer(asyncio.Protocol):
+    """
+    Replies with the first half of the cursor reply, the second half is sent on demand
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.rest = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        request_id = int.from_bytes(data[4:8], byteorder='little', signed=True)
+        reply = _cursor_reply(request_id)
+        self.transport.write(reply[:len(reply) // 2])
+        self.rest = reply[len(reply) // 2:]
+
+
+@pytest.mark.asyncio
+async def test_streaming(fake_server):
+    server_protocol = _ChunkedServer()
+    _, protocol = await (await fake_server(protocol=server_protocol)).connect()
+    find = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'find': 'coll', '$db': 'test'})])
+    stream = protocol.send_streaming(MongoWireMessage(operation=find))
+
+    documents = [await stream.__anext__()]
+    assert documents == DOCUMENTS[:1]
+    assert not stream.done
+
+    server_protocol.transport.write(server_protocol.rest)
+    documents += [document async for document in stream]
+    assert documents == DOCUMENTS
+    assert stream.cursor_id == 42
+    assert protocol.pending == 0
+
+
+def test_spilled_frame(tmp_path):
+    frames = FrameBuffer(spill_threshold=500, spill_directory=str(tmp_path))
+    data = _cursor_reply(1) + _cursor_reply(2)
+    frame_length = len(data) // 2
+
+    assert frames.feed(data[:100]) == []
+    assert frames.pending == 0
+    result = frames.feed(data[100:frame_length + 10]) + frames.feed(data[frame_length + 10:])
+    assert [frame.response_to for frame in result] == [1, 2]
+    assert isinstance(result[0].data, memoryview)
+    assert isinstance(result[1].data, memoryview)
+    result[0].response_to = 5
+    assert result[0].response_to == 5
+    assert result[0].message.operation.sections[0].data['cursor']['firstBatch'] == DOCUMENTS
+    assert bytes(result[1]) == data[frame_length:]
+
+
+@pytest.mark.asyncio
+async def test_spilled_stream(tmp_path):
+    stream = DocumentStream(asyncio.get_event_loop(), max_pending=5, spill=True, spill_directory=str(tmp_path))
+    data = _cursor_reply()
+    IncrementalReply(stream, len(data)).feed(data)
+
+    assert stream._in_memory == 5
+    assert [document async for document in stream] == DOCUMENTS
+    assert stream._spill_file is None
+
+
+@pytest.mark.asyncio
+async def test_stream_close(fake_server):
+    documents = [{'_id': i, 'value': 'x' * 1000} for i in range(1000)]
+
+    def handler(body: dict) -> dict:
+        if 'find' in body:
+            return {'cursor': {'firstBatch': documents, 'id': 0, 'ns': 'test.coll'}, 'ok': 1.0}
+        return {'ok': 1.0}
+
+    _, protocol = await (await fake_server(handler)).connect()
+    find = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'find': 'coll', '$db': 'test'})])
+    stream = protocol.send_streaming(MongoWireMessage(operation=find), max_pending=2)
+    assert (await stream.__anext__())['_id'] == 0
+    # Reading is paused by the documents nobody is going to consume
+    await stream.aclose()
+    assert [document async for document in stream] == []
+
+    ping = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': 1, '$db': 'admin'})])
+    reply = await asyncio.wait_for(protocol.send_data(MongoWireMessage(operation=ping)), 5)
+    assert reply.operation.sections[0].data == {'ok': 1.0}
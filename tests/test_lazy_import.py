@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def _run(code: str) -> str:
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_import_loads_no_optional_dependencies():
+    loaded = _run("import sys, src.aiomongowire; "
+                  "print(sorted({'asyncio', 'pymongo', 'bson', 'snappy', 'zstandard', 'crc32c', 'numpy'} & "
+                  "set(sys.modules)))")
+    assert loaded == '[]'
+
+
+def test_ops_are_registered_on_first_parse():
+    from src.aiomongowire import MongoWireMessage, OpReply
+    data = bytes(MongoWireMessage(operation=OpReply(cursor_id=0, starting_from=0, number_returned=1,
+                                                    documents=[{'ok': 1}])))
+    # Nothing imports the OP_REPLY module before the reply is parsed
+    result = _run("import io, sys; from src.aiomongowire._message import MongoWireMessage; "
+                  "print('src.aiomongowire._op_reply' in sys.modules, "
+                  f"MongoWireMessage.from_data(io.BytesIO(bytes.fromhex('{data.hex()}'))).operation.documents)")
+    assert result == "False [{'ok': 1}]"
+
+
+def test_lazy_names():
+    import src.aiomongowire as aiomongowire
+    assert set(aiomongowire.__all__) <= set(dir(aiomongowire))
+    assert aiomongowire.OpMsg is __import__('src.aiomongowire._op_msg', fromlist=['OpMsg']).OpMsg
+    # Private submodules, as the integration tests use them
+    assert aiomongowire._compressor.Compressor is aiomongowire.Compressor
+    with pytest.raises(AttributeError):
+        aiomongowire._missing
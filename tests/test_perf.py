@@ -0,0 +1,49 @@
+"""
+Timing gates for encoding and decoding of every op. Budgets are about 5x the times on a developer machine,
+so they catch regressions by a factor, not noise. AIOMONGOWIRE_PERF_SCALE scales them for slower machines.
+Budgets are for the pymongo BSON backend, CI runs them in a dedicated job and deselects them everywhere else
+"""
+import io
+import os
+import timeit
+
+import pytest
+
+from src.aiomongowire import MongoWireMessage, OpMsg, OpReply, OpQuery, OpInsert, OpUpdate, OpDelete, OpGetMore, \
+    OpKillCursors, get_bson_parser
+from src.aiomongowire._bson import PymongoBson
+
+SCALE = float(os.environ.get('AIOMONGOWIRE_PERF_SCALE', '1'))
+NUMBER = 500
+
+_DOCUMENT = {'_id': 1, 'name': 'x' * 20, 'tags': ['a', 'b'], 'n': 1.5}
+
+# Op, µs per encode, µs per decode
+CASES = {
+    'OpMsg': (OpMsg(sections=[OpMsg.Body({'insert': 'coll', '$db': 'test'}),
+                              OpMsg.Document(0, 'documents', [_DOCUMENT] * 10)]), 200, 250),
+    'OpReply': (OpReply(cursor_id=1, starting_from=0, number_returned=10, documents=[_DOCUMENT] * 10), 175, 225),
+    'OpQuery': (OpQuery('test.coll', _DOCUMENT, return_fields_selector={'name': 1}), 50, 85),
+    'OpInsert': (OpInsert('test.coll', [_DOCUMENT] * 10), 175, 250),
+    'OpUpdate': (OpUpdate('test.coll', _DOCUMENT, {'$set': _DOCUMENT}), 55, 80),
+    'OpDelete': (OpDelete('test.coll', _DOCUMENT), 35, 60),
+    'OpGetMore': (OpGetMore('test.coll', 10, 1 << 40), 25, 40),
+    'OpKillCursors': (OpKillCursors(3, [1, 2, 3]), 25, 40),
+}
+
+
+def _microseconds(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+@pytest.mark.perf
+@pytest.mark.skipif(not isinstance(get_bson_parser(), PymongoBson), reason="budgets are for pymongo BSON")
+@pytest.mark.parametrize('case', CASES)
+def test_codec_budget(case):
+    operation, encode_budget, decode_budget = CASES[case]
+    message = MongoWireMessage(operation=operation)
+    data = bytes(message)
+    encode = _microseconds(lambda: bytes(message))
+    decode = _microseconds(lambda: MongoWireMessage.from_data(io.BytesIO(data)))
+    assert encode <= encode_budget * SCALE, f"{case} encode takes {encode:.1f} µs, budget {encode_budget} µs"
+    assert decode <= decode_budget * SCALE, f"{case} decode takes {decode:.1f} µs, budget {decode_budget} µs"
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, MessageHeader, FrameBuffer, RawFrame, InvalidFrameException
+from tests.fake_server import server_port
+
+
+def _op_msg(body: dict, request_id: int = None) -> MongoWireMessage:
+    operation = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body(body)])
+    return MongoWireMessage(operation=operation, header=MessageHeader(request_id=request_id))
+
+
+def test_frame_buffer_split():
+    data = bytes(_op_msg({'ping': 1}, request_id=1)) + bytes(_op_msg({'ping': 2}, request_id=2))
+    frames = FrameBuffer()
+
+    assert frames.feed(data[:3]) == []
+    assert frames.feed(data[3:20]) == []
+    result = frames.feed(data[20:])
+
+    assert [frame.request_id for frame in result] == [1, 2]
+    assert result[1].message.operation.sections[0].data == {'ping': 2}
+    assert frames.pending == 0
+
+
+def test_frame_buffer_invalid_length():
+    with pytest.raises(InvalidFrameException):
+        FrameBuffer().feed(int.to_bytes(4, length=4, byteorder='little') + b'\x00' * 12)
+
+
+def test_raw_frame_remap():
+    frame = RawFrame(bytes(_op_msg({'ping': 1}, request_id=10)))
+    frame.request_id = 20
+    frame.response_to = 30
+
+    assert frame.request_id == 20
+    assert frame.response_to == 30
+    assert frame.op_code == aiomongowire.OpMsg.op_code
+    assert frame.has_reply
+    assert frame.message.header.request_id == 20
+
+
+def test_raw_frame_no_reply():
+    operation = aiomongowire.OpInsert('db.coll', [{'a': 1}])
+    assert not RawFrame(bytes(MongoWireMessage(operation=operation))).has_reply
+
+    operation = aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': 1})],
+                                   flag_bits=aiomongowire.OpMsg.Flags.MORE_TO_COME)
+    assert not RawFrame(bytes(MongoWireMessage(operation=operation))).has_reply
+
+
+@pytest.mark.asyncio
+async def test_proxy_multiplexing(fake_server):
+    upstream_server = await fake_server(shared=False)
+    upstream = aiomongowire.ConnectionPool('127.0.0.1', upstream_server.port, size=2)
+    inspected = []
+    proxy = aiomongowire.MongoWireProxy(upstream, inspect=inspected.append,
+                                        inspect_op_codes=[aiomongowire.OpMsg.op_code])
+    proxy_server = await proxy.serve('127.0.0.1', 0)
+    clients = []
+    try:
+        loop = asyncio.get_event_loop()
+        for _ in range(5):
+            clients.append(await loop.create_connection(aiomongowire.MongoWireProtocol, '127.0.0.1',
+                                                        server_port(proxy_server)))
+        requests = [_op_msg({'ping': i}) for i in range(20)]
+        replies = await asyncio.gather(*[clients[i % len(clients)][1].send_data(request)
+                                         for i, request in enumerate(requests)])
+
+        for request, reply in zip(requests, replies):
+            assert reply.header.response_to == request.header.request_id
+            assert reply.operation.sections[0].data['echo'] == request.operation.sections[0].data
+        assert sorted(frame.message.operation.sections[0].data['ping'] for frame in inspected) == list(range(20))
+    finally:
+        for transport, _ in clients:
+            transport.close()
+        proxy_server.close()
+        upstream.close()
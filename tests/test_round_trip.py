@@ -0,0 +1,75 @@
+import io
+from contextlib import suppress
+
+from hypothesis import given, settings, strategies as st
+
+from src.aiomongowire import MongoWireMessage, FrameBuffer, InvalidFrameException, OpCompressed, Compressor
+from src.aiomongowire._spill import BufferReader
+from tests import strategies
+
+
+def _state(operation) -> dict:
+    """
+    Decoded fields of the op, sections by their payload
+    """
+    if hasattr(operation, 'sections'):
+        return {'flag_bits': operation.flag_bits, 'sections': [
+            (section.identifier, section.documents) if hasattr(section, 'documents') else section.data
+            for section in operation.sections]}
+    return {name: getattr(operation, name) for name in operation.__slots__}
+
+
+@given(strategies.messages, st.booleans())
+def test_encode_decode_encode(message, spilled):
+    data = bytes(message)
+    reader = BufferReader(memoryview(data)) if spilled else io.BytesIO(data)
+    decoded = MongoWireMessage.from_data(reader)
+    assert (decoded.header.request_id, decoded.header.response_to) == \
+           (message.header.request_id, message.header.response_to)
+    assert type(decoded.operation) is type(message.operation)
+    assert _state(decoded.operation) == _state(message.operation)
+    assert bytes(decoded) == data
+
+
+@given(strategies.messages, st.sampled_from(sorted(Compressor.compressor_names())))
+def test_compressed_round_trip(message, compressor):
+    message.operation = OpCompressed(Compressor.by_name(compressor), message.operation)
+    data = bytes(message)
+    decoded = MongoWireMessage.from_data(io.BytesIO(data))
+    assert bytes(decoded) == data
+    assert _state(decoded.operation.original_msg) == _state(message.operation.original_msg)
+
+
+@settings(max_examples=50)
+@given(st.lists(strategies.messages, min_size=1, max_size=5), st.lists(st.integers(min_value=1, max_value=64)))
+def test_framing_any_chunking(messages, chunk_sizes):
+    encoded = [bytes(message) for message in messages]
+    stream = b''.join(encoded)
+    frames = FrameBuffer()
+    received = []
+    offset = 0
+    for size in chunk_sizes + [len(stream)]:
+        received.extend(bytes(frame) for frame in frames.feed(stream[offset:offset + size]))
+        offset += size
+    assert received == encoded
+    assert frames.pending == 0
+
+
+@given(st.binary(max_size=256))
+def test_framing_garbage(data):
+    frames = FrameBuffer(max_message_size=1024)
+    with suppress(InvalidFrameException):
+        for frame in frames.feed(data):
+            assert frame.message_length == len(frame.data)
+            # Decoding may reject the frame, but must not crash or hang
+            with suppress(Exception):
+                frame.message
+
+
+@given(strategies.messages, st.data())
+def test_decode_mutated(message, data):
+    encoded = bytearray(bytes(message))
+    position = data.draw(st.integers(min_value=16, max_value=len(encoded) - 1), label='position')
+    encoded[position] = data.draw(st.integers(min_value=0, max_value=255), label='value')
+    with suppress(Exception):
+        MongoWireMessage.from_data(io.BytesIO(bytes(encoded)))
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, OpMsg, Lane, SendScheduler
+from src.aiomongowire._scheduler import split_write, merge_write_replies, part_sizes
+
+
+def _take(scheduler: SendScheduler, count: int, size: int = 100) -> list:
+    taken = []
+    for _ in range(count):
+        lane, item = scheduler.get_nowait()
+        scheduler.charge(lane, size)
+        taken.append(item)
+    return taken
+
+
+def _insert(count: int, ordered: bool = True) -> MongoWireMessage:
+    body = OpMsg.Insert('test', 'coll')
+    body.data['ordered'] = ordered
+    return MongoWireMessage(operation=OpMsg(sections=[
+        body, OpMsg.Document(0, 'documents', [{'_id': i, 'data': 'x' * 100} for i in range(count)])]))
+
+
+def test_loop_binding():
+    # Outside a running loop the loop to bind to is not guessed
+    with pytest.raises(RuntimeError):
+        SendScheduler()
+    with pytest.raises(RuntimeError):
+        aiomongowire.MongoWireProtocol()
+    loop = asyncio.new_event_loop()
+    try:
+        assert aiomongowire.MongoWireProtocol(loop=loop)._loop is loop
+    finally:
+        loop.close()
+
+
+@pytest.mark.asyncio
+async def test_weighted_lanes():
+    scheduler = SendScheduler([Lane('bulk', weight=1), Lane('tenant', weight=3)], quantum=100)
+    for i in range(40):
+        scheduler.put_nowait(f'bulk {i}', 'bulk')
+        scheduler.put_nowait(f'tenant {i}', 'tenant')
+    taken = _take(scheduler, 40)
+    assert sum(item.startswith('tenant') for item in taken) == 30
+    # Lanes keep their own order
+    assert [item for item in taken if item.startswith('bulk')] == [f'bulk {i}' for i in range(10)]
+    assert len(scheduler) == 40
+
+
+@pytest.mark.asyncio
+async def test_priority_and_stats():
+    scheduler = SendScheduler([Lane('reads', priority=1)])
+    scheduler.put_nowait('insert')
+    scheduler.put_nowait('tenant', 'tenant')
+    await asyncio.sleep(0.01)
+    scheduler.put_nowait('read', 'reads')
+    assert _take(scheduler, 1) == ['read']
+    assert sorted(_take(scheduler, 2)) == ['insert', 'tenant']
+    assert scheduler.empty()
+    stats = scheduler.stats()
+    assert stats['default'].sent == 1 and stats['default'].sent_bytes == 100
+    assert stats['default'].max_wait >= 0.01 > stats['reads'].max_wait
+    assert stats['tenant'].percentile(99) == stats['tenant'].max_wait
+    with pytest.raises(asyncio.QueueEmpty):
+        scheduler.get_nowait()
+
+
+def test_split_and_merge():
+    request = _insert(10)
+    assert split_write(request, 1 << 20) is None
+    parts = split_write(request, 500)
+    sizes = part_sizes(parts)
+    assert sizes == [4, 4, 2]
+    assert parts[2].operation.sections[1].documents[0]['_id'] == 8
+    assert parts[0].operation.sections[0].data == {'insert': 'coll', '$db': 'test', 'ordered': True}
+
+    def reply(result):
+        return MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(result)]))
+
+    merged = merge_write_replies([reply({'ok': 1.0, 'n': 4}),
+                                  reply({'ok': 1.0, 'n': 3, 'writeErrors': [{'index': 1, 'code': 11000}]}),
+                                  reply({'ok': 1.0, 'n': 2})], sizes, request)
+    assert merged.header.response_to == request.header.request_id
+    assert merged.operation.sections[0].data == {'ok': 1.0, 'n': 9, 'writeErrors': [{'index': 5, 'code': 11000}]}
+
+    failed = {'ok': 0.0, 'errmsg': 'not primary', 'code': 10107}
+    merged = merge_write_replies([reply({'ok': 1.0, 'n': 3, 'writeErrors': [{'index': 2, 'code': 11000}]}),
+                                  reply(failed)], sizes, request)
+    assert merged.operation.sections[0].data == dict(failed, n=3, writeErrors=[{'index': 2, 'code': 11000}])
+    assert merge_write_replies([reply(failed)], sizes, request).operation.sections[0].data == failed
+
+    # Unordered parts after the failed one are applied too
+    replies = [reply({'ok': 1.0, 'n': 4}), reply(failed),
+               reply({'ok': 1.0, 'n': 1, 'writeErrors': [{'index': 0, 'code': 11000}]})]
+    merged = merge_write_replies(replies, sizes, _insert(10, ordered=False))
+    assert merged.operation.sections[0].data == dict(failed, n=5, writeErrors=[{'index': 8, 'code': 11000}])
+    merged = merge_write_replies(replies, sizes, request)
+    assert merged.operation.sections[0].data == dict(failed, n=4)
+
+
+@pytest.mark.asyncio
+async def test_lanes_and_split_over_connection(fake_server):
+    def handler(command):
+        if 'insert' in command:
+            inserts = sum('insert' in received for received in server_protocol.received if received)
+            if inserts == 2:
+                return {'ok': 1.0, 'n': 0, 'writeErrors': [{'index': 0, 'code': 11000}]}
+            return {'ok': 1.0, 'n': 4}
+        return {'ok': 1.0}
+
+    server = await fake_server(handler)
+    server_protocol = server.protocol
+    _, protocol = await server.connect(
+        lambda: aiomongowire.MongoWireProtocol(lanes=[Lane('reads', priority=1)], split_size=500, max_write_size=1))
+
+    insert = protocol.send_data(_insert(10, ordered=False))
+    await asyncio.sleep(0)  # the split insert queues its parts
+    find = protocol.send_data(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})])),
+                              lane='reads')
+    await find
+    reply = (await insert).operation.sections[0].data
+    assert [next(iter(command)) for command in server_protocol.received] == ['find', 'insert', 'insert', 'insert']
+    assert reply['n'] == 8 and reply['writeErrors'] == [{'index': 4, 'code': 11000}]
+    assert protocol.scheduler.stats()['default'].sent == 3
+
+    # Ordered parts are sent one by one, the ones after the failed part are not sent
+    server_protocol.received.clear()
+    reply = (await protocol.send_data(_insert(10))).operation.sections[0].data
+    assert len(server_protocol.received) == 2 and reply['writeErrors'] == [{'index': 4, 'code': 11000}]
+
+
+@pytest.mark.asyncio
+async def test_split_with_message_pool(fake_server):
+    server = await fake_server(lambda command: {'ok': 1.0, 'n': 1})
+    # Sent parts go back to the pool, the merge does not read them
+    _, protocol = await server.connect(
+        lambda: aiomongowire.MongoWireProtocol(split_size=100, message_pool=aiomongowire.MessagePool()))
+    reply = (await protocol.send_data(_insert(6))).operation.sections[0].data
+    assert len(server.protocol.received) > 1 and reply == {'ok': 1.0, 'n': len(server.protocol.received)}
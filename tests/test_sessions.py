@@ -0,0 +1,115 @@
+import pytest
+
+from src.aiomongowire import MongoWireMessage, OpMsg, RawFrame, Session, SessionPool, ClusterClock, \
+    SessionException, get_bson_parser
+
+# Replies are decoded with Timestamp and Binary, py-bson has neither
+pytest.importorskip('pymongo')
+from bson import Timestamp, Binary  # noqa: E402
+
+
+def _body(operation: OpMsg) -> dict:
+    return get_bson_parser().decode_object(bytes(operation.sections[0].raw))
+
+
+def _reply(document: dict) -> RawFrame:
+    return RawFrame(bytes(MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body(document)]))))
+
+
+def test_prepare_splices_session_fields():
+    session = Session(SessionPool())
+    find = OpMsg(sections=[OpMsg.Body({'find': 'coll', 'filter': {'a': 1}, '$db': 'test'})])
+    body = _body(session.prepare(find))
+    assert body['lsid'] == {'id': Binary(session.server_session.id, 4)}
+    assert 'readConcern' not in body and '$clusterTime' not in body and 'lsid' not in find.sections[0].data
+
+    session.observe(_reply({'ok': 1.0, 'operationTime': Timestamp(10, 1),
+                            '$clusterTime': {'clusterTime': Timestamp(10, 2), 'signature': {'keyId': 0}}}))
+    session.observe(_reply({'ok': 1.0, 'operationTime': Timestamp(9, 1),
+                            '$clusterTime': {'clusterTime': Timestamp(9, 2), 'signature': {'keyId': 0}}}))
+    body = _body(session.prepare(find))
+    assert body['filter'] == {'a': 1} and list(body)[0] == 'find'
+    assert body['readConcern'] == {'afterClusterTime': Timestamp(10, 1)}
+    assert body['$clusterTime'] == {'clusterTime': Timestamp(10, 2), 'signature': {'keyId': 0}}
+
+    majority = OpMsg(sections=[OpMsg.Body({'aggregate': 'coll', 'pipeline': [], 'readConcern': {'level': 'majority'},
+                                           '$db': 'test'})])
+    body = _body(session.prepare(majority))
+    assert body['readConcern'] == {'level': 'majority', 'afterClusterTime': Timestamp(10, 1)}
+    # Not a read
+    assert 'readConcern' not in _body(session.prepare(OpMsg(sections=[OpMsg.Body({'ping': 1, '$db': 'admin'})])))
+
+
+def test_retryable_write_numbering():
+    session = Session(SessionPool(), causal_consistency=False)
+    insert = OpMsg(sections=[OpMsg.Body({'insert': 'coll', '$db': 'test'}), OpMsg.Document(0, 'documents', [{}])])
+    assert [_body(session.prepare(insert))['txnNumber'] for _ in range(2)] == [1, 2]
+    multi = OpMsg(sections=[OpMsg.Body({'update': 'coll', 'updates': [{'q': {}, 'u': {}, 'multi': True}],
+                                        '$db': 'test'})])
+    delete_all = OpMsg(sections=[OpMsg.Body({'delete': 'coll', '$db': 'test'}), OpMsg.RawDocument(
+        'deletes', [get_bson_parser().encode_object({'q': {}, 'limit': 0})])])
+    unacknowledged = OpMsg(sections=[OpMsg.Body({'insert': 'coll', 'documents': [{}], 'writeConcern': {'w': 0},
+                                                 '$db': 'test'})])
+    for operation in (multi, delete_all, unacknowledged):
+        assert 'txnNumber' not in _body(session.prepare(operation))
+    session.retry_writes = False
+    assert 'txnNumber' not in _body(session.prepare(insert))
+
+
+def test_pool():
+    pool = SessionPool()
+    first, second = pool.acquire(), pool.acquire()
+    assert first.id != second.id
+    pool.release(first)
+    second.dirty = True
+    pool.release(second)
+    assert len(pool) == 1 and pool.acquire() is first
+    with Session(pool) as session:
+        server_session = session.server_session
+    assert pool.acquire() is server_session
+    with pytest.raises(SessionException):
+        session.server_session
+
+    pool.release(server_session)
+    pool.release(first)
+    messages = pool.end_sessions(max_batch=1)
+    assert len(messages) == 2 and len(pool) == 0
+    body = get_bson_parser().decode_object(bytes(messages[0].operation.sections[0].raw))
+    assert body == {'endSessions': [{'id': Binary(first.id, 4)}], '$db': 'admin'}
+
+
+@pytest.mark.asyncio
+async def test_retry_and_transaction(fake_server):
+    errors = [{'ok': 0.0, 'code': 10107, 'errmsg': 'not primary'}]
+
+    def handler(body):
+        received.append(body)
+        if 'insert' in body and errors:
+            return errors.pop()
+        return {'ok': 1.0, 'operationTime': Timestamp(5, 1),
+                '$clusterTime': {'clusterTime': Timestamp(5, 1), 'signature': {}}}
+
+    received = []
+    _, protocol = await (await fake_server(handler)).connect()
+    session = Session(SessionPool(), ClusterClock())
+    insert = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'insert': 'coll', 'documents': [{'a': 1}],
+                                                                    '$db': 'test'})]))
+    reply = await session.send(protocol.send_frame, insert)
+    assert reply.message.operation.sections[0].data['ok'] == 1.0
+    assert [body['txnNumber'] for body in received] == [1, 1]
+    assert session.clock.time == (5 << 32) | 1
+
+    session.start_transaction()
+    with pytest.raises(SessionException):
+        session.start_transaction()
+    find = MongoWireMessage(operation=OpMsg(sections=[OpMsg.Body({'find': 'coll', '$db': 'test'})]))
+    await session.send(protocol.send_frame, find)
+    await session.send(protocol.send_frame, find)
+    await session.commit_transaction(protocol.send_frame)
+    first, second, commit = received[2:]
+    assert first['startTransaction'] is True and first['autocommit'] is False and first['txnNumber'] == 2
+    assert first['readConcern'] == {'afterClusterTime': Timestamp(5, 1)}
+    assert 'startTransaction' not in second and 'readConcern' not in second and second['txnNumber'] == 2
+    assert commit['commitTransaction'] == 1 and commit['txnNumber'] == 2 and commit['lsid'] == first['lsid']
+    with pytest.raises(SessionException):
+        await session.abort_transaction(protocol.send_frame)
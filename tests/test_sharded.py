@@ -0,0 +1,56 @@
+import asyncio
+import socket
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, ThreadedRunner, ProcessRunner, ConnectionPool
+
+
+def _ping(value: int) -> MongoWireMessage:
+    return MongoWireMessage(operation=aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': value})]))
+
+
+async def _ping_job(pool: ConnectionPool, value: int) -> int:
+    reply = await pool.send_data(_ping(value))
+    return reply.operation.sections[0].data['echo']['ping']
+
+
+@pytest.mark.asyncio
+async def test_threaded_runner(fake_server):
+    server = await fake_server(shared=False)
+    runner = ThreadedRunner('127.0.0.1', server.port, workers=2, pool_size=1)
+    with pytest.raises(RuntimeError):
+        runner.send_data(_ping(0))
+    runner.start()
+    try:
+        messages = [_ping(i) for i in range(10)]
+        for i, message in enumerate(messages):
+            result = await runner.send_data(message)
+            assert result.operation.sections[0].data['echo']['ping'] == i
+    finally:
+        runner.close()
+
+
+@pytest.mark.asyncio
+async def test_threaded_runner_failed_start(fake_server):
+    server = await fake_server(shared=False)
+    runner = ThreadedRunner('127.0.0.1', server.port, workers=2, pool_size=1)
+    with socket.socket() as unused:
+        unused.bind(('127.0.0.1', 0))
+        runner._workers[1].pool.port = unused.getsockname()[1]
+    with pytest.raises(OSError):
+        runner.start()
+    # First worker has connected, it is stopped with the failed one
+    assert not any(worker._thread.is_alive() for worker in runner._workers)
+    assert all(worker.loop.is_closed() for worker in runner._workers)
+
+
+@pytest.mark.asyncio
+async def test_process_runner(fake_server):
+    server = await fake_server(shared=False)
+    runner = ProcessRunner('127.0.0.1', server.port, workers=2, pool_size=1)
+    try:
+        assert await asyncio.gather(*[runner.submit(_ping_job, i) for i in range(6)]) == list(range(6))
+    finally:
+        runner.close()
@@ -0,0 +1,32 @@
+import datetime
+
+import pytest
+
+from src.aiomongowire import OpMsg, CommandTemplate, Placeholder, get_bson_parser
+
+
+@pytest.mark.parametrize('value', [42, -1, 1 << 40, 1.5, 'string', 'юникод', True, None, {'a': [1, 2]},
+                                   datetime.datetime(2020, 1, 1)])
+def test_render_matches_dict(value):
+    template = CommandTemplate({'find': 'coll', 'filter': {'_id': Placeholder('id'), 'x': 1}, 'limit': 1,
+                                '$db': 'test'})
+    expected = OpMsg.Body({'find': 'coll', 'filter': {'_id': value, 'x': 1}, 'limit': 1, '$db': 'test'})
+
+    assert bytes(template.render(id=value)) == bytes(expected)
+
+
+def test_nested_placeholders():
+    template = CommandTemplate({'update': Placeholder('collection'),
+                                'updates': [{'q': {'_id': Placeholder('id')}, 'u': {'$set': Placeholder('set')}}],
+                                'ordered': True, '$db': 'test'})
+    values = {'collection': 'coll', 'id': 'abc', 'set': {'a': 1, 'b': 'x'}}
+    expected = {'update': 'coll', 'updates': [{'q': {'_id': 'abc'}, 'u': {'$set': {'a': 1, 'b': 'x'}}}],
+                'ordered': True, '$db': 'test'}
+
+    assert template.encode(**values) == get_bson_parser().encode_object(expected)
+    assert template.render(**values).data == expected
+
+
+def test_missing_value():
+    with pytest.raises(KeyError):
+        CommandTemplate({'find': Placeholder('collection')}).encode()
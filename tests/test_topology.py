@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage, Topology, ReadPreference, ServerRole, ServerSelectionException
+from tests.fake_server import FakeMongoProtocol
+
+
+def _handler(hello: dict):
+    def handle(command: dict) -> dict:
+        if 'isMaster' in command or 'hello' in command:
+            return dict(hello, ok=1.0, maxWireVersion=13)
+        return {'ok': 1.0}
+
+    return handle
+
+
+def _ping() -> MongoWireMessage:
+    return MongoWireMessage(operation=aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.Body({'ping': 1})]))
+
+
+@pytest.mark.asyncio
+async def test_routing(fake_server):
+    primary = FakeMongoProtocol(_handler({'isWritablePrimary': True, 'setName': 'rs'}))
+    secondary = FakeMongoProtocol(_handler({'secondary': True, 'setName': 'rs'}))
+    servers = [await fake_server(protocol=protocol) for protocol in (primary, secondary)]
+    topology = Topology([('127.0.0.1', server.port) for server in servers], pool_size=1, heartbeat_interval=0.01)
+    try:
+        await _check_routing(topology, primary, secondary)
+    finally:
+        topology.close()
+
+
+async def _check_routing(topology: Topology, primary: FakeMongoProtocol, secondary: FakeMongoProtocol):
+    await topology.connect()
+    await asyncio.sleep(0.05)
+
+    assert [server.role for server in topology.servers] == [ServerRole.PRIMARY, ServerRole.SECONDARY]
+    assert all(server.round_trip_time is not None for server in topology.servers)
+    assert [c for c in primary.received if 'hello' in c]
+
+    primary.received.clear()
+    secondary.received.clear()
+    await topology.send_data(_ping())
+    await topology.send_data(_ping(), read_preference=ReadPreference.SECONDARY)
+    assert [c for c in primary.received if 'ping' in c] == [{'ping': 1}]
+    assert [c for c in secondary.received if 'ping' in c] == [{'ping': 1}]
+
+
+def test_nearest():
+    topology = Topology(['a:1', 'b:2', 'c:3'], latency_window=0.01)
+    for server, role, round_trip_time in zip(topology.servers,
+                                             [ServerRole.PRIMARY, ServerRole.SECONDARY, ServerRole.SECONDARY],
+                                             [0.1, 0.02, 0.025]):
+        server.role = role
+        server.round_trip_time = round_trip_time
+
+    selected = {topology.select_server(ReadPreference.NEAREST).address for _ in range(50)}
+    assert selected == {'b:2', 'c:3'}
+    assert topology.select_server(ReadPreference.PRIMARY).address == 'a:1'
+
+    topology.servers[0].role = ServerRole.UNKNOWN
+    assert topology.select_server(ReadPreference.PRIMARY_PREFERRED).role == ServerRole.SECONDARY
+    with pytest.raises(ServerSelectionException):
+        topology.select_server(ReadPreference.PRIMARY)
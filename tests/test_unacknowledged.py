@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import src.aiomongowire as aiomongowire
+from src.aiomongowire import MongoWireMessage
+
+
+def _insert(document: dict, write_concern: dict = None) -> MongoWireMessage:
+    body = aiomongowire.OpMsg.Insert('test', 'coll')
+    if write_concern is not None:
+        body.data['writeConcern'] = write_concern
+    return MongoWireMessage(operation=aiomongowire.OpMsg(
+        sections=[body, aiomongowire.OpMsg.Document(0, 'documents', [document])]))
+
+
+@pytest.mark.asyncio
+async def test_unacknowledged_writes(fake_server):
+    server = await fake_server()
+    server_protocol = server.protocol
+    _, protocol = await server.connect()
+    for i in range(100):
+        protocol.send_unacknowledged(_insert({'_id': i}))
+        await protocol.drain()
+    assert protocol.pending == 0
+    # Acknowledged request after them gets its reply, nothing else was replied to
+    reply = await protocol.send_data(MongoWireMessage(operation=aiomongowire.OpMsg(
+        sections=[aiomongowire.OpMsg.Body({'ping': 1})])))
+    assert reply.operation.sections[0].data['echo'] == {'ping': 1}
+    assert server_protocol.received[:100] == [None] * 100
+
+    with pytest.raises(ValueError):
+        protocol.send_unacknowledged(_insert({'_id': 0}, write_concern={'w': 1}))
+    with pytest.raises(ValueError):
+        protocol.send_unacknowledged(MongoWireMessage(operation=aiomongowire.OpQuery('test.coll', {})))
+
+
+@pytest.mark.asyncio
+async def test_unacknowledged_copy(fake_server):
+    server = await fake_server()
+    server_protocol = server.protocol
+    transport, protocol = await server.connect()
+    message = _insert({'_id': 1})
+    protocol.send_unacknowledged(message)
+    # Caller's message is left as is
+    assert message.operation.has_reply and 'writeConcern' not in message.operation.sections[0].data
+
+    body = aiomongowire.get_bson_parser().encode_object({'insert': 'coll', '$db': 'test'})
+    raw = MongoWireMessage(operation=aiomongowire.OpMsg(sections=[aiomongowire.OpMsg.RawBody(body)]))
+    protocol.send_unacknowledged(raw)
+    await protocol.send_data(MongoWireMessage(operation=aiomongowire.OpMsg(
+        sections=[aiomongowire.OpMsg.Body({'ping': 1})])))
+    assert server_protocol.received[:2] == [None, None]
+
+    acknowledged = aiomongowire.get_bson_parser().encode_object({'insert': 'coll', 'writeConcern': {'w': 1}})
+    with pytest.raises(ValueError):
+        protocol.send_unacknowledged(MongoWireMessage(operation=aiomongowire.OpMsg(
+            sections=[aiomongowire.OpMsg.RawBody(acknowledged)])))
+
+    transport.close()
+    await asyncio.sleep(0)
+    with pytest.raises(ConnectionError):
+        protocol.send_unacknowledged(_insert({'_id': 2}))
+
+
+@pytest.mark.asyncio
+async def test_unacknowledged_connection_lost(fake_server, caplog):
+    _, protocol = await (await fake_server()).connect()
+    errors = []
+    asyncio.get_event_loop().set_exception_handler(lambda loop, context: errors.append(context))
+    protocol.send_unacknowledged(_insert({'_id': 1}))
+    protocol.connection_lost(None)
+    # Queued write is dropped and logged, the scheduled flush has nothing to raise
+    await asyncio.sleep(0)
+    assert not protocol._unacknowledged and not errors
+    assert 'unacknowledged writes are not sent' in caplog.text
+
+
+def test_more_to_come_has_no_reply():
+    message = _insert({'_id': 1})
+    assert message.operation.has_reply
+    message.operation.flag_bits |= aiomongowire.OpMsg.Flags.MORE_TO_COME
+    assert not message.operation.has_reply
+    assert not aiomongowire.RawFrame(bytes(message)).has_reply
+
+
+@pytest.mark.asyncio
+async def test_drain():
+    protocol = aiomongowire.MongoWireProtocol()
+    await protocol.drain()
+
+    protocol.pause_writing()
+    drains = [asyncio.ensure_future(protocol.drain()) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert not any(drain.done() for drain in drains)
+    protocol.resume_writing()
+    await asyncio.gather(*drains)
+
+    protocol.pause_writing()
+    drain = asyncio.ensure_future(protocol.drain())
+    await asyncio.sleep(0)
+    protocol.connection_lost(None)
+    with pytest.raises(ConnectionError):
+        await drain